@@ -12,6 +12,7 @@ class Settings(BaseSettings):
 
     # Gemini
     GEMINI_API_KEY: str = ""
+    GEMINI_EMBEDDING_DIMENSION: int = 768  # Matryoshka: 128-3072, must match the vector index
 
     # Groq
     GROQ_API_KEY: str = ""
@@ -22,6 +23,103 @@ class Settings(BaseSettings):
     # Pinecone
     PINECONE_API_KEY: str = ""
     PINECONE_INDEX_NAME: str = "ai-learning-assistant"
+    # Write visibility is confirmed by polling the last written ids
+    PINECONE_VISIBILITY_TIMEOUT: float = 30.0
+    PINECONE_VISIBILITY_INITIAL_DELAY: float = 0.02
+    PINECONE_VISIBILITY_MAX_DELAY: float = 1.0
+    # Chunk metadata carries offsets into the document store under DATA_DIR.
+    # Enable to also keep each chunk's text in Pinecone, for deployments where
+    # readers don't share that DATA_DIR.
+    PINECONE_METADATA_TEXT: bool = False
+
+    # Vector Store ("pinecone" or "local" for the embedded NumPy index)
+    VECTOR_STORE_BACKEND: str = "pinecone"
+
+    # Local storage for embedded backends (vector index, caches, ...)
+    DATA_DIR: str = ".data"
+
+    # Local vector store first-pass search: "float32", "float16" or "int8" vectors,
+    # optionally truncated to their first LOCAL_VECTOR_SEARCH_DIM dimensions
+    # (Matryoshka models only, 0 = all). The shortlist of top_k * RESCORE_FACTOR
+    # is re-scored exactly with the float32 vectors (0 = no re-scoring).
+    # int8 scans at about float32 speed; NumPy widens float16 slowly, so it
+    # only saves memory.
+    LOCAL_VECTOR_PRECISION: str = "float32"
+    LOCAL_VECTOR_SEARCH_DIM: int = 0
+    LOCAL_VECTOR_RESCORE_FACTOR: int = 4
+
+    # Provider I/O (shared connection pool + thread pool for blocking calls)
+    PROVIDER_TIMEOUT: float = 60.0
+    PROVIDER_MAX_CONNECTIONS: int = 100
+    PROVIDER_MAX_KEEPALIVE: int = 20
+    PROVIDER_THREAD_POOL_SIZE: int = 16
+
+    # Flashcard / quiz result cache
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_TTL: float = 3600.0
+    GENERATION_CACHE_MAX_ENTRIES: int = 512
+
+    # Content record cache (version stamps shared through DATA_DIR)
+    CONTENT_CACHE_ENABLED: bool = True
+    CONTENT_CACHE_PROCESSING_TTL: float = 2.0
+    CONTENT_CACHE_PROCESSED_TTL: float = 300.0
+    CONTENT_CACHE_MAX_ENTRIES: int = 1024
+
+    # Map-reduce flashcard / quiz generation over the whole document
+    GENERATION_MAP_GROUP_CHUNKS: int = 8  # Chunks per map prompt
+    GENERATION_MAP_MAX_GROUPS: int = 12  # Longer documents are sampled evenly
+    GENERATION_MAP_CONCURRENCY: int = 4  # Map prompts in flight per request
+
+    # Provider rate limits ("provider:model" -> {"rpm": ..., "tpm": ...}).
+    # Groq limits are learned from its x-ratelimit-* response headers.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: dict[str, dict[str, float]] = {
+        "gemini:gemini-embedding-001": {"rpm": 100},
+        "gemini:gemini-2.0-flash": {"rpm": 15},
+    }
+    RATE_LIMIT_RESERVE_FRACTION: float = 0.2  # Quota kept for interactive chat
+    RATE_LIMIT_MAX_WAIT: float = 120.0
+    RATE_LIMIT_DEFAULT_BACKOFF: float = 5.0  # After a 429 without retry-after
+
+    # Hybrid retrieval for chat (BM25 index per content under DATA_DIR)
+    HYBRID_SEARCH_ENABLED: bool = True
+    RETRIEVAL_CANDIDATES: int = 20  # Per ranking, before fusion
+    RRF_K: int = 60
+    LEXICAL_FAST_PATH_ENABLED: bool = True  # Skip embedding for confident keyword matches
+    LEXICAL_FAST_PATH_MAX_TERMS: int = 4
+    LEXICAL_FAST_PATH_MIN_RATIO: float = 1.5  # Best BM25 score vs. the runner-up
+
+    # Prompt context packing (estimated tokens; per-model overrides)
+    CONTEXT_TOKEN_BUDGET: int = 3000
+    CONTEXT_TOKEN_BUDGETS: dict[str, int] = {
+        "llama-3.1-8b-instant": 4000,
+        "llama-3.3-70b-versatile": 3000,
+    }
+    CONTEXT_MMR_LAMBDA: float = 0.7  # 1.0 = relevance only, lower = more diversity
+    CONTEXT_MAX_SIMILARITY: float = 0.8  # Drop chunks this similar to a selected one
+
+    # Semantic answer cache for chat
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # Cosine similarity between questions
+    ANSWER_CACHE_MAX_ENTRIES: int = 2000
+
+    # Background Jobs (SQLite queue under DATA_DIR)
+    JOB_WORKERS_IN_PROCESS: bool = True  # Set False when running `python -m app.worker`
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_DELAY: float = 5.0
+    JOB_LEASE_SECONDS: float = 300.0
+    JOB_POLL_INTERVAL: float = 2.0
+
+    # PDF text extraction process pool (0 = one worker per CPU, -1 = no pool);
+    # PDFs with fewer pages are extracted in-thread
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    PDF_PAGES_PER_TASK: int = 8
+
+    # Bulk imports (/api/process-batch)
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_MAX_TOTAL_MB: float = 200.0
 
     # Supabase
     SUPABASE_URL: str = ""
@@ -31,6 +129,27 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL_NAME: str = "all-distilroberta-v1"
     TRANSFORMERS_CACHE: str = "D:\\ai_models\\huggingface"
 
+    # Local model inference: "torch", "onnx" (ONNX Runtime) or "onnx_int8"
+    # (dynamically quantized, exported once under DATA_DIR/models). ONNX needs
+    # `pip install "sentence-transformers[onnx]"`. Quantization targets one of
+    # "arm64", "avx2", "avx512" or "avx512_vnni".
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_QUANTIZATION: str = "avx2"
+    EMBEDDING_INTRA_OP_THREADS: int = 0  # 0 = library default (one per core)
+    EMBEDDING_ENCODE_BATCH_SIZE: int = 32  # Texts per forward pass, sorted by length
+
+    # Load the local model in the background at startup (/api/ready waits for it)
+    EMBEDDING_WARMUP: bool = False
+
+    # Local embedding micro-batching (coalesces concurrent requests)
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Embedding Cache (in-memory LRU + SQLite file under DATA_DIR)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+    EMBEDDING_CACHE_DISK_ITEMS: int = 200000
+
     class Config:
         env_file = ".env"
         extra = "allow" # Allow extra fields for flexibility
@@ -1,14 +1,79 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
-from app.schemas import HealthResponse
-from app.routers import video, pdf, flashcards, quiz, chat
+from app.schemas import HealthResponse, ReadyResponse
+from app.routers import video, pdf, batch, flashcards, quiz, chat, jobs
+from app.services import (
+    answer_cache,
+    content_cache,
+    embedding_cache,
+    embedding_service,
+    generation_cache,
+    job_queue,
+    metrics,
+    pdf_extractor,
+    provider_io,
+    rate_limiter,
+    vector_store,
+)
+
+
+# ── Lifespan ──────────────────────────────────
+# Provider clients (Supabase, Groq, Pinecone, the local embedding model) are
+# created on first use, so startup never waits on them and a missing
+# credential only fails the requests that need it.
+_startup = {"import_seconds": 0.0, "startup_seconds": None, "warmup": "disabled"}
+
+
+async def _warmup():
+    _startup["warmup"] = "running"
+    started = time.perf_counter()
+    try:
+        await embedding_service.warmup()
+        _startup["warmup"] = "done"
+        print(f"Embedding model warmed up in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        _startup["warmup"] = "failed"
+        print(f"Embedding model warmup failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifespan_started = time.perf_counter()
+    # Shared provider connection pools live as long as the app
+    await provider_io.startup()
+    if settings.JOB_WORKERS_IN_PROCESS:
+        await job_queue.start_workers()
+    warmup_task = asyncio.create_task(_warmup()) if settings.EMBEDDING_WARMUP else None
+
+    ready = time.perf_counter()
+    _startup["startup_seconds"] = _startup["import_seconds"] + ready - lifespan_started
+    print(
+        f"Startup complete in {_startup['startup_seconds']:.2f}s "
+        f"(imports {_startup['import_seconds']:.2f}s, lifespan {ready - lifespan_started:.2f}s)"
+    )
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await job_queue.stop_workers()
+    await provider_io.shutdown()
+    pdf_extractor.shutdown()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="Backend API for AI Learning Assistant — process videos & PDFs, generate flashcards & quizzes, and chat with your content using RAG.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # ── CORS ──────────────────────────────────────
@@ -20,18 +85,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Metrics ───────────────────────────────────
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Per-request latency histogram plus a Server-Timing header breaking down provider calls."""
+    timings = metrics.start_request_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    # Label by route template, not raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    metrics.HTTP_LATENCY.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    if request.url.path.startswith("/api"):
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
+
+
 # ── Routers ───────────────────────────────────
 app.include_router(video.router, prefix="/api", tags=["Video"])
 app.include_router(pdf.router, prefix="/api", tags=["PDF"])
+app.include_router(batch.router, prefix="/api", tags=["Batch"])
 app.include_router(flashcards.router, prefix="/api", tags=["Flashcards"])
 app.include_router(quiz.router, prefix="/api", tags=["Quiz"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse, tags=["Health"])
+async def get_metrics():
+    """Prometheus text exposition of latency histograms, counters and cache stats."""
+    gauges = {}
+    for name, cache in (
+        ("content_cache", content_cache.get_cache()),
+        ("embedding_cache", embedding_cache.get_cache()),
+        ("generation_cache", generation_cache.get_cache()),
+        ("answer_cache", answer_cache.get_cache()),
+        ("embedding_batcher", embedding_service._batcher),
+    ):
+        if cache is not None:
+            gauges[name] = cache.stats()
+    for name, stats in rate_limiter.stats().items():
+        gauges[f"rate_limiter_{name}"] = stats
+    if vector_stats := vector_store.stats():
+        gauges["vector_store"] = vector_stats
+    gauges["startup"] = {key: value for key, value in _startup.items() if value is not None}
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
 
 
 # ── Health Check ──────────────────────────────
 @app.get("/api/health", response_model=HealthResponse, tags=["Health"])
 async def health_check():
+    """Liveness: the process is up (no provider is contacted)."""
     return HealthResponse(
         status="healthy",
         app_name=settings.APP_NAME,
     )
+
+
+@app.get("/api/ready", response_model=ReadyResponse, tags=["Health"])
+async def readiness_check(response: Response):
+    """Readiness: 503 until startup (and the optional warmup) has finished."""
+    ready = _startup["startup_seconds"] is not None and _startup["warmup"] != "running"
+    if not ready:
+        response.status_code = 503
+    return ReadyResponse(
+        status="ready" if ready else "starting",
+        startup_seconds=_startup["startup_seconds"],
+        import_seconds=_startup["import_seconds"],
+        warmup=_startup["warmup"],
+        providers={
+            "supabase": bool(settings.SUPABASE_URL and settings.SUPABASE_KEY),
+            "groq": bool(settings.GROQ_API_KEY),
+            "pinecone": bool(settings.PINECONE_API_KEY),
+            "huggingface": bool(settings.HUGGINGFACE_API_KEY),
+        },
+    )
+
+
+# Everything above (routers, services, their SDKs) is imported by now
+_startup["import_seconds"] = time.perf_counter() - _import_started
@@ -0,0 +1,210 @@
+import asyncio
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+
+from app.config import settings
+from app.schemas import BatchItem, BatchStatusResponse, ProcessBatchResponse
+from app.services import ingestion, job_queue, processor, provider_io, supabase_service
+
+router = APIRouter()
+
+
+async def run_background_batch_process(items: list[dict], blob: bytes | None):
+    """Background job for bulk imports: one pipeline for every item.
+
+    Transcripts are fetched concurrently, then the chunks of all documents
+    share embedding batches and vector upserts. Each content is marked as
+    processed as soon as its own chunks are stored. Items that fail are left
+    in ``processing`` and the job raises at the end, so a retry only picks
+    up what is still missing (see ``mark_failed`` for the last attempt).
+    """
+    # 1. Skip items finished by a previous attempt (one batched lookup)
+    contents = await supabase_service.get_contents([item["content_id"] for item in items])
+    pending = [item for item in items if contents.get(item["content_id"], {}).get("status") == "processing"]
+    total = len(items)
+    done = total - len(pending)
+    errors: list[str] = []
+
+    # 2. Fetch transcripts concurrently (the transcript API is blocking)
+    await job_queue.report_progress("fetching_transcripts", 0.1, f"{done}/{total} items processed")
+    videos = [item for item in pending if item["content_type"] == "video"]
+    transcripts = await asyncio.gather(
+        *(provider_io.run_blocking(processor.get_youtube_transcript, item["source"]) for item in videos),
+        return_exceptions=True,
+    )
+
+    documents = []
+    for item, transcript in zip(videos, transcripts):
+        if isinstance(transcript, Exception):
+            errors.append(f"{item['source']}: {transcript}")
+            continue
+        documents.append((item["content_id"], [(None, transcript)]))
+    for item in pending:
+        if item["content_type"] == "pdf":
+            start = item["blob_offset"]
+            documents.append((item["content_id"], processor.iter_pdf_pages(blob[start : start + item["blob_size"]])))
+
+    # 3. Stream every document through one chunk -> embedding -> vector store pipeline
+    sources = {item["content_id"]: item["source"] for item in items}
+
+    async def on_document_done(result: ingestion.DocumentResult):
+        nonlocal done
+        if result.error is not None:
+            errors.append(f"{sources[result.content_id]}: {result.error}")
+            return
+        await supabase_service.update_content(result.content_id, result.chunks_count, "processed")
+        done += 1
+        await job_queue.report_progress("ingesting", 0.1 + 0.8 * done / total, f"{done}/{total} items processed")
+
+    await job_queue.report_progress("ingesting", 0.1 + 0.8 * done / total, f"{done}/{total} items processed")
+    await ingestion.ingest_documents(
+        documents,
+        max_chunks=500,  # Per document, as for single uploads
+        on_document_done=on_document_done,
+    )
+
+    if errors:
+        raise RuntimeError(f"{len(errors)}/{total} items failed: " + "; ".join(errors))
+    print(f"SUCCESS: Batch processing complete for {total} items")
+
+
+async def run_batch_job(payload: dict, blob: bytes | None):
+    await run_background_batch_process(payload["items"], blob)
+
+
+async def mark_failed(payload: dict, error: Exception):
+    """Called by the job queue once all retries of a job are exhausted."""
+    print(f"CRITICAL ERROR: Batch background process failed: {str(error)}")
+    ids = [item["content_id"] for item in payload["items"]]
+    contents = await supabase_service.get_contents(ids)
+    for content_id in ids:
+        if contents.get(content_id, {}).get("status") == "processing":
+            await supabase_service.update_content(content_id, status="failed", error_message=str(error))
+
+
+job_queue.register_handler("batch", run_batch_job, on_failure=mark_failed)
+
+
+def batch_item(item: dict, content: dict | None) -> BatchItem:
+    content = content or {}
+    return BatchItem(
+        content_id=item["content_id"],
+        content_type=item["content_type"],
+        source=item["source"],
+        title=content.get("title") or item["title"],
+        status=content.get("status", "processing"),
+        chunks_count=content.get("chunks_count") or 0,
+        error=(content.get("metadata") or {}).get("error"),
+    )
+
+
+@router.post(
+    "/process-batch",
+    response_model=ProcessBatchResponse,
+    summary="Process several videos and PDFs (Background)",
+    description="Creates all content records with one insert and queues a single background job that ingests every item through a shared pipeline. Inputs that were already processed are linked to the existing vectors instead. Poll `/api/batches/{job_id}` for per-item status.",
+)
+async def process_batch(
+    youtube_urls: list[str] = Form(default=[]),
+    files: list[UploadFile] = File(default=[]),
+):
+    total_items = len(youtube_urls) + len(files)
+    if total_items == 0:
+        raise HTTPException(status_code=400, detail="Provide at least one YouTube URL or PDF file.")
+    if total_items > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (Max {settings.BATCH_MAX_ITEMS}).")
+
+    items = []
+    for url in youtube_urls:
+        try:
+            title = processor.get_youtube_title(url)
+        except:
+            title = "YouTube Video"
+        items.append(
+            {"content_type": "video", "source": url, "title": title, "fingerprint": processor.video_fingerprint(url)}
+        )
+
+    pdf_data: list[bytes] = []
+    for file in files:
+        if file.content_type != "application/pdf":
+            raise HTTPException(status_code=400, detail=f"Only PDF files are accepted ({file.filename}).")
+        contents = await file.read()
+        file_size_mb = len(contents) / (1024 * 1024)
+        if file_size_mb > 25:
+            raise HTTPException(status_code=400, detail=f"File too large (Max 25MB): {file.filename}")
+        pdf_data.append(contents)
+        items.append(
+            {
+                "content_type": "pdf",
+                "source": file.filename or "unknown.pdf",
+                "title": file.filename or "unknown.pdf",
+                "metadata": {"file_size_mb": round(file_size_mb, 2)},
+            }
+        )
+    if sum(len(data) for data in pdf_data) > settings.BATCH_MAX_TOTAL_MB * 1024 * 1024:
+        raise HTTPException(status_code=400, detail=f"Batch too large (Max {settings.BATCH_MAX_TOTAL_MB:g}MB).")
+
+    # 1. Fingerprint every input; already processed ones are linked, not re-ingested
+    pdf_items = [item for item in items if item["content_type"] == "pdf"]
+    fingerprints = await asyncio.gather(*(asyncio.to_thread(processor.pdf_fingerprint, data) for data in pdf_data))
+    for item, fingerprint in zip(pdf_items, fingerprints):
+        item["fingerprint"] = fingerprint
+    existing = await supabase_service.find_processed([item["fingerprint"] for item in items if item["fingerprint"]])
+
+    # PDFs to ingest are spooled into one job blob, each item keeps its byte range
+    blob = bytearray()
+    data_by_item = {id(item): data for item, data in zip(pdf_items, pdf_data)}
+    for item in items:
+        match = existing.get(item["fingerprint"])
+        item["metadata"] = {**item.get("metadata", {}), **supabase_service.linked_metadata(item.pop("fingerprint"), match)}
+        if match is not None:
+            item["status"] = "processed"
+            item["chunks_count"] = match.get("chunks_count", 0)
+        elif item["content_type"] == "pdf":
+            item["blob_offset"] = len(blob)
+            item["blob_size"] = len(data_by_item[id(item)])
+            blob.extend(data_by_item[id(item)])
+
+    # 2. Create all initial entries with one insert
+    records = await supabase_service.create_contents(items)
+    for item, record in zip(items, records):
+        item["content_id"] = record["id"]
+        for key in ("metadata", "status", "chunks_count"):
+            item.pop(key, None)
+
+    # 3. Queue one durable background job for everything that still needs ingesting
+    pending = [item for item, record in zip(items, records) if record["status"] == "processing"]
+    job_id = None
+    if pending:
+        job_id = await job_queue.enqueue("batch", {"items": pending}, blob=bytes(blob) if blob else None)
+
+    # 4. Return Instant Response
+    return ProcessBatchResponse(
+        job_id=job_id,
+        items=[batch_item(item, record) for item, record in zip(items, records)],
+        status="processing" if pending else "processed",
+        created_at=records[0]["created_at"],
+    )
+
+
+@router.get(
+    "/batches/{job_id}",
+    response_model=BatchStatusResponse,
+    summary="Get bulk import status",
+    description="Returns the batch job's progress and the status of every item (read with one query).",
+)
+async def get_batch(job_id: str):
+    job = await job_queue.get_job(job_id, include_payload=True)
+    if not job or job["kind"] != "batch":
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    items = job["payload"]["items"]
+    contents = await supabase_service.get_contents([item["content_id"] for item in items])
+    return BatchStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=job["progress"],
+        detail=job["detail"],
+        items=[batch_item(item, contents.get(item["content_id"])) for item in items],
+    )
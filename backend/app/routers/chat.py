@@ -1,7 +1,12 @@
+import asyncio
+import json
+import time
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.schemas import ChatRequest, ChatResponse
-from app.services import embedding_service, groq_service, pinecone_service, supabase_service
+from app.services import answer_cache, context_packer, embedding_service, groq_service, retrieval, supabase_service
 
 router = APIRouter()
 
@@ -22,15 +27,16 @@ User's Question: {question}
 Response:"""
 
 
-@router.post(
-    "/chat",
-    response_model=ChatResponse,
-    summary="Chat with processed content",
-    description="Embeds the user's question, searches Pinecone for relevant chunks, and uses Gemini LLM to generate an answer based on the retrieved context (RAG).",
-)
-async def chat(request: ChatRequest):
-    # Verify content exists and is processed
-    content = await supabase_service.get_content(request.content_id)
+CHAT_MODEL = "llama-3.3-70b-versatile"
+
+# Chunks retrieved before packing the context into the model's token budget
+RETRIEVAL_TOP_K = 8
+
+NO_CONTEXT_REPLY = "I couldn't find any relevant information in the content to answer your question."
+
+
+def check_content_ready(content: dict | None):
+    """Raise an HTTP error unless the content exists and has been processed."""
     if not content:
         raise HTTPException(status_code=404, detail="Content not found")
     
@@ -41,35 +47,169 @@ async def chat(request: ChatRequest):
         error_info = content.get("metadata", {}).get("error", "Unknown error")
         raise HTTPException(status_code=400, detail=f"Content processing failed: {error_info}")
 
-    try:
-        # 1. Embed the user's question
-        embedding_list = await embedding_service.get_embeddings(request.message)
-        query_embedding = embedding_list[0]
-
-        # 2. Search Pinecone for relevant chunks
-        similar_chunks = await pinecone_service.query_similar(
-            query_embedding=query_embedding,
-            content_id=request.content_id,
-            top_k=5,
+
+async def fetch_contents_and_embedding(
+    request: ChatRequest,
+) -> tuple[list[dict], list[float] | None, list[dict] | None]:
+    """Run the (batched) status check and the question embedding concurrently.
+
+    Returns (contents, query embedding, None), or (contents, None, chunks)
+    when a confident keyword match makes the embedding unnecessary.
+    """
+    content_ids = request.all_content_ids()
+    if len(content_ids) == 1:
+        lexical_chunks = await retrieval.lexical_fast_path(content_ids[0], request.message)
+        if lexical_chunks:
+            contents = await supabase_service.get_contents(content_ids)
+            return ready_contents(content_ids, contents), None, lexical_chunks
+
+    contents_result, embedding_result = await asyncio.gather(
+        supabase_service.get_contents(content_ids),
+        embedding_service.get_embeddings(request.message),
+        return_exceptions=True,
+    )
+    if isinstance(contents_result, Exception):
+        raise contents_result
+    contents = ready_contents(content_ids, contents_result)
+
+    if isinstance(embedding_result, Exception):
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(embedding_result)}")
+    return contents, embedding_result[0], None
+
+
+def ready_contents(content_ids: list[str], contents: dict[str, dict]) -> list[dict]:
+    """Records of the requested contents, in request order; all must be processed."""
+    for content_id in content_ids:
+        check_content_ready(contents.get(content_id))
+    return [contents[content_id] for content_id in content_ids]
+
+
+def cache_key(contents: list[dict]) -> tuple[str, tuple]:
+    """Answer cache key and version of a set of contents."""
+    ordered = sorted(contents, key=lambda content: content["id"])
+    return (
+        ",".join(content["id"] for content in ordered),
+        tuple(answer_cache.content_version(content) for content in ordered),
+    )
+
+
+def lookup_cached_answer(request: ChatRequest, contents: list[dict], query_embedding: list[float] | None):
+    """Return a cached answer for a semantically equivalent question, if any."""
+    cache = answer_cache.get_cache()
+    if cache is None or query_embedding is None:
+        return None
+    key, version = cache_key(contents)
+    return cache.lookup(key, version, query_embedding)
+
+
+def remember_answer(
+    request: ChatRequest,
+    contents: list[dict],
+    query_embedding: list[float] | None,
+    reply: str,
+    sources: list[str],
+    started: float,
+):
+    """Store a generated answer so similar questions can reuse it."""
+    cache = answer_cache.get_cache()
+    if cache is None or query_embedding is None:
+        return
+    key, version = cache_key(contents)
+    cache.store(
+        key,
+        version,
+        query_embedding,
+        answer_cache.CachedAnswer(
+            question=request.message,
+            reply=reply,
+            sources=sources,
+            latency_ms=(time.perf_counter() - started) * 1000,
+        ),
+    )
+
+
+async def retrieve_context(
+    contents: list[dict],
+    question: str,
+    query_embedding: list[float] | None,
+    similar_chunks: list[dict] | None = None,
+) -> tuple[str, list[str]]:
+    """Search (hybrid BM25 + vector) and pack the prompt context; returns it with the source list.
+
+    Across several contents, one vector query covers them all, passages are
+    labelled with their document title and sources read '<content_id>:chunk_N'.
+    """
+    # Deduplicated uploads are searched under the content they are linked to
+    content_ids = {supabase_service.vector_content_id(content): content["id"] for content in contents}
+    if similar_chunks is None:
+        similar_chunks = await retrieval.search(list(content_ids), question, query_embedding, top_k=RETRIEVAL_TOP_K)
+    if not similar_chunks:
+        return "", []
+
+    labels = None
+    if len(contents) > 1:
+        labels = {
+            supabase_service.vector_content_id(content): content.get("title") or content["id"] for content in contents
+        }
+    # Overlapping chunks are merged and near-duplicates dropped within the budget
+    packed = await asyncio.to_thread(
+        context_packer.pack_ranked,
+        next(iter(content_ids)),
+        similar_chunks,
+        context_packer.budget_for(CHAT_MODEL),
+        labels,
+    )
+    if labels is None:
+        return packed.context, [f"chunk_{chunk['chunk_index']}" for chunk in packed.chunks]
+    return packed.context, [
+        f"{content_ids.get(chunk['content_id'], chunk['content_id'])}:chunk_{chunk['chunk_index']}"
+        for chunk in packed.chunks
+    ]
+
+
+@router.post(
+    "/chat",
+    response_model=ChatResponse,
+    summary="Chat with processed content",
+    description="Embeds the user's question, searches the vector store for relevant chunks, and uses Groq LLM to generate an answer based on the retrieved context (RAG). Pass `content_ids` to ask across several contents in one request.",
+)
+async def chat(request: ChatRequest):
+    # 1. Verify the contents are processed (one batched lookup) while embedding
+    # the question (or skip the embedding for a confident keyword match)
+    contents, query_embedding, lexical_chunks = await fetch_contents_and_embedding(request)
+    content_ids = [content["id"] for content in contents]
+
+    # 2. Reuse the answer of a semantically equivalent question
+    cached = lookup_cached_answer(request, contents, query_embedding)
+    if cached:
+        return ChatResponse(
+            content_id=content_ids[0],
+            content_ids=content_ids,
+            reply=cached.reply,
+            sources=cached.sources,
         )
 
-        if not similar_chunks:
+    started = time.perf_counter()
+    try:
+        # 3. Search (hybrid) and build context from retrieved chunks
+        context, sources = await retrieve_context(contents, request.message, query_embedding, lexical_chunks)
+
+        if not sources:
             return ChatResponse(
-                content_id=request.content_id,
-                reply="I couldn't find any relevant information in the content to answer your question.",
+                content_id=content_ids[0],
+                content_ids=content_ids,
+                reply=NO_CONTEXT_REPLY,
                 sources=[],
             )
 
-        # 3. Build context from retrieved chunks
-        context = "\n\n".join([chunk["text"] for chunk in similar_chunks])
-        sources = [f"chunk_{chunk['chunk_index']}" for chunk in similar_chunks]
-
         # 4. Generate answer via Groq (using the high-performance model for chat)
         prompt = CHAT_PROMPT.format(context=context, question=request.message)
-        reply = await groq_service.generate_response(prompt, model_override="llama-3.3-70b-versatile")
+        reply = await groq_service.generate_response(prompt, model_override=CHAT_MODEL)
+        remember_answer(request, contents, query_embedding, reply, sources, started)
 
         return ChatResponse(
-            content_id=request.content_id,
+            content_id=content_ids[0],
+            content_ids=content_ids,
             reply=reply,
             sources=sources,
         )
@@ -78,3 +218,77 @@ async def chat(request: ChatRequest):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post(
+    "/chat/stream",
+    summary="Chat with processed content (streaming)",
+    description="Same as /chat, but streams the reply as server-sent events: a `sources` frame first, then `delta` frames with incremental text, then a final `done` frame (or an `error` frame).",
+    response_class=StreamingResponse,
+)
+async def chat_stream(request: ChatRequest):
+    # Errors before the first byte are returned as regular HTTP errors
+    contents, query_embedding, lexical_chunks = await fetch_contents_and_embedding(request)
+    content_ids = [content["id"] for content in contents]
+
+    cached = lookup_cached_answer(request, contents, query_embedding)
+    if cached:
+        async def cached_stream():
+            yield sse_event("sources", {"content_id": content_ids[0], "content_ids": content_ids, "sources": cached.sources})
+            yield sse_event("delta", {"text": cached.reply})
+            yield sse_event("done", {"content_id": content_ids[0], "content_ids": content_ids, "reply": cached.reply, "sources": cached.sources})
+
+        return StreamingResponse(
+            cached_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    started = time.perf_counter()
+    try:
+        context, sources = await retrieve_context(contents, request.message, query_embedding, lexical_chunks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+
+    async def event_stream():
+        yield sse_event("sources", {"content_id": content_ids[0], "content_ids": content_ids, "sources": sources})
+
+        if not sources:
+            yield sse_event("delta", {"text": NO_CONTEXT_REPLY})
+            yield sse_event("done", {"content_id": content_ids[0], "content_ids": content_ids, "reply": NO_CONTEXT_REPLY, "sources": []})
+            return
+
+        prompt = CHAT_PROMPT.format(context=context, question=request.message)
+        reply_parts = []
+        try:
+            async for delta in groq_service.stream_response(prompt, model_override=CHAT_MODEL):
+                reply_parts.append(delta)
+                yield sse_event("delta", {"text": delta})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Chat failed: {str(e)}"})
+            return
+
+        reply = "".join(reply_parts)
+        remember_answer(request, contents, query_embedding, reply, sources, started)
+        yield sse_event("done", {"content_id": content_ids[0], "content_ids": content_ids, "reply": reply, "sources": sources})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/chat/cache-stats",
+    summary="Semantic answer cache statistics",
+    description="Hit rate and total generation latency saved by the semantic answer cache.",
+)
+async def chat_cache_stats():
+    cache = answer_cache.get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
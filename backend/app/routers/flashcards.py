@@ -1,5 +1,3 @@
-import json
-
 from fastapi import APIRouter, HTTPException
 
 from app.schemas import (
@@ -7,10 +5,13 @@ from app.schemas import (
     GenerateFlashcardsResponse,
     Flashcard,
 )
-from app.services import groq_service, pinecone_service, supabase_service
+from app.services import generation, generation_cache, groq_service, rate_limiter, vector_store, supabase_service
 
 router = APIRouter()
 
+# Bump when the prompt changes so cached results are regenerated
+PROMPT_VERSION = 1
+
 FLASHCARD_PROMPT = """You are an expert educator. Based on the following content, generate exactly {num_cards} flashcards for studying.
 
 Each flashcard should have a clear question and a concise answer.
@@ -31,29 +32,31 @@ Content:
 """
 
 
-@router.post(
-    "/generate-flashcards",
-    response_model=GenerateFlashcardsResponse,
-    summary="Generate flashcards from processed content",
-    description="Retrieves content chunks from Pinecone and uses Gemini LLM to generate study flashcards.",
-)
-async def generate_flashcards(request: GenerateFlashcardsRequest):
-    # Verify content exists and is processed
-    content = await supabase_service.get_content(request.content_id)
-    if not content:
-        raise HTTPException(status_code=404, detail="Content not found")
-    
-    if content["status"] == "processing":
-        raise HTTPException(status_code=400, detail="Content is still being processed. Please try again in a few moments.")
-    
-    if content["status"] == "failed":
-        error_info = content.get("metadata", {}).get("error", "Unknown error")
-        raise HTTPException(status_code=400, detail=f"Content processing failed: {error_info}")
+async def generate_flashcard_items(text: str, num_cards: int) -> list[dict]:
+    """One Groq call: flashcard dicts generated from ``text``."""
+    prompt = FLASHCARD_PROMPT.format(num_cards=num_cards, content=text)
+    response = await groq_service.generate_response(prompt, json_mode=True)
+
+    try:
+        data = generation.parse_json_response(response)
+    except ValueError:
+        print(f"DEBUG: Failed to parse AI Response: {response}")
+        raise HTTPException(status_code=500, detail="AI returned an invalid format for flashcards. Please try again.")
+
+    return [
+        fc for fc in generation.extract_items(data, "flashcards")
+        if isinstance(fc, dict) and "question" in fc and "answer" in fc
+    ]
 
+
+async def build_flashcards(content: dict, num_cards: int, mode: str = generation.AUTO) -> GenerateFlashcardsResponse:
+    """Fetch the content's chunks and generate flashcards via Groq."""
     try:
-        # 1. Fetch chunks from Pinecone using chunks_count for reliability
+        # 1. Fetch chunks from the vector store using chunks_count for reliability
+        # (deduplicated uploads read the chunks of the content they are linked to)
         chunks_count = content.get("chunks_count", 0)
-        chunks = await pinecone_service.fetch_all_chunks(request.content_id, chunks_count)
+        vector_content_id = supabase_service.vector_content_id(content)
+        chunks = await vector_store.fetch_all_chunks(vector_content_id, chunks_count)
 
         if not chunks:
             # Final attempt: If status is processed and we still have no chunks, something is wrong
@@ -61,45 +64,16 @@ async def generate_flashcards(request: GenerateFlashcardsRequest):
                  raise HTTPException(status_code=404, detail="No chunks found. This document might need to be re-uploaded to work with the updated engine.")
             raise HTTPException(status_code=400, detail="Content is still being processed or failed.")
 
-        # 2. Combine chunks into context (Limit to 20 chunks for speed and API safety)
-        if len(chunks) > 20:
-            chunks = chunks[:20]
-        combined_content = "\n\n".join(chunks)
-
-        # 3. Generate flashcards via Groq (using JSON mode)
-        num_cards = request.num_cards or 10
-        prompt = FLASHCARD_PROMPT.format(num_cards=num_cards, content=combined_content)
-        response = await groq_service.generate_response(prompt, json_mode=True)
-
-        # 4. Parse JSON response
-        cleaned_response = response.strip()
-        
-        # Groq's JSON mode can still sometimes return a string with a markdown block if not careful
-        if "```json" in cleaned_response:
-            cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
-        elif "```" in cleaned_response:
-            cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
-            
-        try:
-            # First try direct parse
-            data = json.loads(cleaned_response)
-        except json.JSONDecodeError:
-            # Strategy 2: Try to find the first { and the last }
-            try:
-                start = cleaned_response.find("{")
-                end = cleaned_response.rfind("}") + 1
-                if start != -1 and end != 0:
-                    data = json.loads(cleaned_response[start:end])
-                else:
-                    raise ValueError("No JSON object found in response")
-            except Exception:
-                print(f"DEBUG: Failed to parse AI Response: {response}")
-                raise HTTPException(status_code=500, detail="AI returned an invalid format for flashcards. Please try again.")
-
-        flashcards_data = data.get("flashcards", [])
-        if not flashcards_data and isinstance(data, list):
-            # Compatibility with old array-only response format
-            flashcards_data = data
+        # 2. Generate flashcards via Groq (using JSON mode)
+        packed = await generation.single_prompt_context(vector_content_id, chunks)
+        if generation.use_map_reduce(mode, chunks, packed):
+            # Concurrent prompts over chunk groups, merged and deduplicated
+            flashcards_data = await generation.map_reduce(
+                vector_content_id, chunks, num_cards, generate_flashcard_items, lambda fc: fc["question"]
+            )
+        else:
+            # Single prompt: as much of the document as fits the model's context budget
+            flashcards_data = await generate_flashcard_items(packed.context, num_cards)
 
         flashcards = [
             Flashcard(id=i + 1, question=fc["question"], answer=fc["answer"])
@@ -107,14 +81,50 @@ async def generate_flashcards(request: GenerateFlashcardsRequest):
         ]
 
         return GenerateFlashcardsResponse(
-            content_id=request.content_id,
+            content_id=content["id"],
             flashcards=flashcards,
             total=len(flashcards),
         )
 
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Failed to parse flashcards from AI response")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate flashcards: {str(e)}")
+
+
+@router.post(
+    "/generate-flashcards",
+    response_model=GenerateFlashcardsResponse,
+    summary="Generate flashcards from processed content",
+    description="Retrieves content chunks from the vector store and uses Gemini LLM to generate study flashcards.",
+)
+async def generate_flashcards(request: GenerateFlashcardsRequest):
+    # Verify content exists and is processed
+    content = await supabase_service.get_content(request.content_id)
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
+    
+    if content["status"] == "processing":
+        raise HTTPException(status_code=400, detail="Content is still being processed. Please try again in a few moments.")
+    
+    if content["status"] == "failed":
+        error_info = content.get("metadata", {}).get("error", "Unknown error")
+        raise HTTPException(status_code=400, detail=f"Content processing failed: {error_info}")
+
+    # Identical requests share one cached / in-flight generation. It is keyed
+    # by the stored vectors: linked duplicates share it, re-ingestion drops it
+    num_cards = request.num_cards or 10
+    cache_key = (
+        supabase_service.vector_content_id(content),
+        "flashcards",
+        num_cards,
+        request.mode,
+        PROMPT_VERSION,
+        content.get("chunks_count", 0),
+    )
+    # Generation calls queue behind interactive chat for LLM quota
+    with rate_limiter.priority(rate_limiter.GENERATION):
+        response = await generation_cache.get_or_create(
+            cache_key, lambda: build_flashcards(content, num_cards, request.mode)
+        )
+    return response.model_copy(update={"content_id": content["id"]})
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException
+
+from app.schemas import JobStatusResponse
+from app.services import job_queue
+
+router = APIRouter()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    summary="Get background job status",
+    description="Returns the status, current stage and progress of a processing job.",
+)
+async def get_job(job_id: str):
+    job = await job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return JobStatusResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        content_id=job["content_id"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=job["progress"],
+        detail=job["detail"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        error=job["error"],
+        created_at=datetime.fromtimestamp(job["created_at"], tz=timezone.utc),
+        updated_at=datetime.fromtimestamp(job["updated_at"], tz=timezone.utc),
+    )
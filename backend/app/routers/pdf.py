@@ -1,43 +1,54 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks
+import asyncio
+
+from fastapi import APIRouter, File, UploadFile, HTTPException
 
 from app.schemas import ProcessPdfResponse
-from app.services import embedding_service, pinecone_service, supabase_service, processor
+from app.services import ingestion, job_queue, supabase_service, processor
 
 router = APIRouter()
 
 async def run_background_process(content_id: str, file_contents: bytes):
-    """Heavy lifting background task: Chunks -> Embeddings -> Vector DB."""
-    try:
-        # 1. Extract text and Chunk
-        text, pages_count = processor.extract_pdf_text(file_contents)
-        chunks = processor.chunk_text(text)
-        
-        # Max limit for free tier stability
-        if len(chunks) > 500:
-            chunks = chunks[:500]
+    """Heavy lifting background job: Pages -> Chunks -> Embeddings -> Vector DB.
+
+    Pages are streamed through the ingestion pipeline, so extraction,
+    embedding and upserting overlap. Errors propagate so the job queue can
+    retry; the content is only marked as failed once every attempt has been
+    used (see ``mark_failed``).
+    """
+    # 1. Stream pages -> chunks -> embeddings -> vector store
+    await job_queue.report_progress("ingesting", 0.1)
+    chunks_count = await ingestion.ingest_pages(
+        content_id,
+        processor.iter_pdf_pages(file_contents),
+        max_chunks=500,  # Max limit for free tier stability
+    )
+
+    # 2. Mark as DONE
+    await job_queue.report_progress("finalizing", 0.9)
+    await supabase_service.update_content(content_id, chunks_count, "processed")
+    print(f"SUCCESS: Background processing complete for: {content_id}")
 
-        # 2. Embed
-        embeddings = await embedding_service.embed_chunks(chunks)
 
-        # 3. Upsert to Pinecone (Includes durability wait)
-        await pinecone_service.upsert_chunks(content_id, chunks, embeddings)
+async def run_pdf_job(payload: dict, blob: bytes | None):
+    await run_background_process(payload["content_id"], blob)
 
-        # 4. Mark as DONE
-        await supabase_service.update_content(content_id, len(chunks), "processed")
-        print(f"SUCCESS: Background processing complete for: {content_id}")
 
-    except Exception as e:
-        print(f"CRITICAL ERROR: Background process failed for {content_id}: {str(e)}")
-        await supabase_service.update_content(content_id, status="failed", error_message=str(e))
+async def mark_failed(payload: dict, error: Exception):
+    """Called by the job queue once all retries of a job are exhausted."""
+    print(f"CRITICAL ERROR: Background process failed for {payload['content_id']}: {str(error)}")
+    await supabase_service.update_content(payload["content_id"], status="failed", error_message=str(error))
+
+
+job_queue.register_handler("pdf", run_pdf_job, on_failure=mark_failed)
 
 
 @router.post(
     "/process-pdf",
     response_model=ProcessPdfResponse,
     summary="Process a PDF document (Background)",
-    description="Starts a background job to process the PDF. Returns the content ID immediately.",
+    description="Queues a background job to process the PDF. Returns the content ID and job ID immediately. A PDF that was already processed is linked to the existing vectors and returned as processed, without a job.",
 )
-async def process_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def process_pdf(file: UploadFile = File(...)):
     # Validate file type
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
@@ -48,21 +59,47 @@ async def process_pdf(background_tasks: BackgroundTasks, file: UploadFile = File
     if file_size_mb > 25:
         raise HTTPException(status_code=400, detail="File too large (Max 25MB).")
 
-    # 1. Create Initial Entry in Supabase (Status: Processing)
+    # 1. Fingerprint the file: an identical, already processed upload is reused
+    fingerprint = await asyncio.to_thread(processor.pdf_fingerprint, contents)
+    existing = (await supabase_service.find_processed([fingerprint])).get(fingerprint)
+    metadata = {"file_size_mb": round(file_size_mb, 2), **supabase_service.linked_metadata(fingerprint, existing)}
+
+    if existing is not None:
+        # Linked to the existing vectors and chunks: nothing to ingest
+        content = await supabase_service.create_content(
+            content_type="pdf",
+            source=file.filename or "unknown.pdf",
+            title=file.filename or "unknown.pdf",
+            metadata=metadata,
+            status="processed",
+            chunks_count=existing.get("chunks_count", 0),
+        )
+        return ProcessPdfResponse(
+            content_id=content["id"],
+            job_id=None,
+            filename=file.filename or "unknown.pdf",
+            pages_count=0,
+            chunks_count=content.get("chunks_count", 0),
+            status="processed",
+            created_at=content["created_at"],
+        )
+
+    # 2. Create Initial Entry in Supabase (Status: Processing)
     content = await supabase_service.create_content(
         content_type="pdf",
         source=file.filename or "unknown.pdf",
         title=file.filename or "unknown.pdf",
-        metadata={"file_size_mb": round(file_size_mb, 2)},
+        metadata=metadata,
     )
     content_id = content["id"]
 
-    # 2. Add to Background Tasks
-    background_tasks.add_task(run_background_process, content_id, contents)
+    # 3. Queue the durable background job
+    job_id = await job_queue.enqueue("pdf", {"content_id": content_id}, blob=contents, content_id=content_id)
 
-    # 3. Return Instant Response
+    # 4. Return Instant Response
     return ProcessPdfResponse(
         content_id=content_id,
+        job_id=job_id,
         filename=file.filename or "unknown.pdf",
         pages_count=0, # Will be updated in background
         chunks_count=0, # Will be updated in background
@@ -1,5 +1,3 @@
-import json
-
 from fastapi import APIRouter, HTTPException
 
 from app.schemas import (
@@ -8,10 +6,13 @@ from app.schemas import (
     QuizQuestion,
     QuizOption,
 )
-from app.services import groq_service, pinecone_service, supabase_service
+from app.services import generation, generation_cache, groq_service, rate_limiter, vector_store, supabase_service
 
 router = APIRouter()
 
+# Bump when the prompt changes so cached results are regenerated
+PROMPT_VERSION = 1
+
 QUIZ_PROMPT = """You are an expert educator. Based on the following content, generate exactly {num_questions} multiple-choice quiz questions.
 
 Each question should have 4 options (A, B, C, D) with exactly one correct answer.
@@ -44,29 +45,31 @@ Content:
 """
 
 
-@router.post(
-    "/generate-quiz",
-    response_model=GenerateQuizResponse,
-    summary="Generate a quiz from processed content",
-    description="Retrieves content chunks from Pinecone and uses Gemini LLM to generate a multiple-choice quiz.",
-)
-async def generate_quiz(request: GenerateQuizRequest):
-    # Verify content exists and is processed
-    content = await supabase_service.get_content(request.content_id)
-    if not content:
-        raise HTTPException(status_code=404, detail="Content not found")
-    
-    if content["status"] == "processing":
-        raise HTTPException(status_code=400, detail="Content is still being processed. Please try again in a few moments.")
-    
-    if content["status"] == "failed":
-        error_info = content.get("metadata", {}).get("error", "Unknown error")
-        raise HTTPException(status_code=400, detail=f"Content processing failed: {error_info}")
+async def generate_quiz_items(text: str, num_questions: int) -> list[dict]:
+    """One Groq call: quiz question dicts generated from ``text``."""
+    prompt = QUIZ_PROMPT.format(num_questions=num_questions, content=text)
+    response = await groq_service.generate_response(prompt, json_mode=True)
+
+    try:
+        data = generation.parse_json_response(response)
+    except ValueError:
+        print(f"DEBUG: Failed to parse Quiz JSON: {response}")
+        raise HTTPException(status_code=500, detail="AI returned invalid quiz format. Please try again.")
+
+    return [
+        q for q in generation.extract_items(data, "questions")
+        if isinstance(q, dict) and {"question", "options", "correct_answer"} <= q.keys()
+    ]
+
 
+async def build_quiz(content: dict, num_questions: int, mode: str = generation.AUTO) -> GenerateQuizResponse:
+    """Fetch the content's chunks and generate a quiz via Groq."""
     try:
-        # 1. Fetch chunks from Pinecone using chunks_count for reliability
+        # 1. Fetch chunks from the vector store using chunks_count for reliability
+        # (deduplicated uploads read the chunks of the content they are linked to)
         chunks_count = content.get("chunks_count", 0)
-        chunks = await pinecone_service.fetch_all_chunks(request.content_id, chunks_count)
+        vector_content_id = supabase_service.vector_content_id(content)
+        chunks = await vector_store.fetch_all_chunks(vector_content_id, chunks_count)
 
         if not chunks:
             # Final attempt: If status is processed and we still have no chunks, something is wrong
@@ -74,39 +77,16 @@ async def generate_quiz(request: GenerateQuizRequest):
                  raise HTTPException(status_code=404, detail="No quiz content found. This document might need clear text to process.")
             raise HTTPException(status_code=400, detail="Content is still being processed or failed.")
 
-        # 2. Combine chunks into context (Limit to 20 chunks for speed and API safety)
-        if len(chunks) > 20:
-            chunks = chunks[:20]
-        combined_content = "\n\n".join(chunks)
-
-        # 3. Generate quiz via Groq (using JSON mode)
-        num_questions = request.num_questions or 5
-        prompt = QUIZ_PROMPT.format(num_questions=num_questions, content=combined_content)
-        response = await groq_service.generate_response(prompt, json_mode=True)
-
-        # 4. Parse JSON response
-        cleaned_response = response.strip()
-        if "```json" in cleaned_response:
-            cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
-        elif "```" in cleaned_response:
-            cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
-            
-        try:
-            # Strategy 1: Direct parse
-            data = json.loads(cleaned_response)
-        except json.JSONDecodeError:
-            # Strategy 2: Bracket search
-            try:
-                start = cleaned_response.find("{")
-                end = cleaned_response.rfind("}") + 1
-                data = json.loads(cleaned_response[start:end])
-            except:
-                print(f"DEBUG: Failed to parse Quiz JSON: {response}")
-                raise HTTPException(status_code=500, detail="AI returned invalid quiz format. Please try again.")
-            
-        quiz_data = data.get("questions", [])
-        if not quiz_data and isinstance(data, list):
-            quiz_data = data
+        # 2. Generate quiz via Groq (using JSON mode)
+        packed = await generation.single_prompt_context(vector_content_id, chunks)
+        if generation.use_map_reduce(mode, chunks, packed):
+            # Concurrent prompts over chunk groups, merged and deduplicated
+            quiz_data = await generation.map_reduce(
+                vector_content_id, chunks, num_questions, generate_quiz_items, lambda q: q["question"]
+            )
+        else:
+            # Single prompt: as much of the document as fits the model's context budget
+            quiz_data = await generate_quiz_items(packed.context, num_questions)
 
         questions = [
             QuizQuestion(
@@ -119,14 +99,50 @@ async def generate_quiz(request: GenerateQuizRequest):
         ]
 
         return GenerateQuizResponse(
-            content_id=request.content_id,
+            content_id=content["id"],
             questions=questions,
             total=len(questions),
         )
 
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Failed to parse quiz from AI response")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
+
+
+@router.post(
+    "/generate-quiz",
+    response_model=GenerateQuizResponse,
+    summary="Generate a quiz from processed content",
+    description="Retrieves content chunks from the vector store and uses Gemini LLM to generate a multiple-choice quiz.",
+)
+async def generate_quiz(request: GenerateQuizRequest):
+    # Verify content exists and is processed
+    content = await supabase_service.get_content(request.content_id)
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
+    
+    if content["status"] == "processing":
+        raise HTTPException(status_code=400, detail="Content is still being processed. Please try again in a few moments.")
+    
+    if content["status"] == "failed":
+        error_info = content.get("metadata", {}).get("error", "Unknown error")
+        raise HTTPException(status_code=400, detail=f"Content processing failed: {error_info}")
+
+    # Identical requests share one cached / in-flight generation. It is keyed
+    # by the stored vectors: linked duplicates share it, re-ingestion drops it
+    num_questions = request.num_questions or 5
+    cache_key = (
+        supabase_service.vector_content_id(content),
+        "quiz",
+        num_questions,
+        request.mode,
+        PROMPT_VERSION,
+        content.get("chunks_count", 0),
+    )
+    # Generation calls queue behind interactive chat for LLM quota
+    with rate_limiter.priority(rate_limiter.GENERATION):
+        response = await generation_cache.get_or_create(
+            cache_key, lambda: build_quiz(content, num_questions, request.mode)
+        )
+    return response.model_copy(update={"content_id": content["id"]})
@@ -1,63 +1,106 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter
 
 from app.schemas import ProcessVideoRequest, ProcessVideoResponse
-from app.services import embedding_service, pinecone_service, supabase_service, processor
+from app.services import ingestion, job_queue, provider_io, supabase_service, processor
 
 router = APIRouter()
 
 async def run_background_video_process(content_id: str, youtube_url: str):
-    """Background task for videos: Transcript -> Embeddings -> Vector DB."""
-    try:
-        # 1. Fetch transcript and title
-        transcript = processor.get_youtube_transcript(youtube_url)
-        chunks = processor.chunk_text(transcript)
-        
-        # Max limit for stability
-        if len(chunks) > 500:
-            chunks = chunks[:500]
+    """Background job for videos: Transcript -> Embeddings -> Vector DB.
+
+    Errors propagate so the job queue can retry; the content is only marked
+    as failed once every attempt has been used (see ``mark_failed``).
+    """
+    # 1. Fetch transcript and title
+    await job_queue.report_progress("fetching_transcript", 0.1)
+    # The transcript API is blocking, keep it off the event loop
+    transcript = await provider_io.run_blocking(processor.get_youtube_transcript, youtube_url)
+
+    # 2. Stream chunks -> embeddings -> vector store
+    await job_queue.report_progress("ingesting", 0.3)
+    chunks_count = await ingestion.ingest_pages(
+        content_id,
+        [(None, transcript)],
+        max_chunks=500,  # Max limit for stability
+    )
+
+    # 3. Mark as DONE
+    await job_queue.report_progress("finalizing", 0.9)
+    await supabase_service.update_content(content_id, chunks_count, "processed")
+    print(f"SUCCESS: Video processing complete for: {content_id}")
+
 
-        # 2. Embed
-        embeddings = await embedding_service.embed_chunks(chunks)
+async def run_video_job(payload: dict, blob: bytes | None):
+    await run_background_video_process(payload["content_id"], payload["youtube_url"])
 
-        # 3. Upsert to Pinecone (Includes durability wait)
-        await pinecone_service.upsert_chunks(content_id, chunks, embeddings)
 
-        # 4. Mark as DONE
-        await supabase_service.update_content(content_id, len(chunks), "processed")
-        print(f"SUCCESS: Video processing complete for: {content_id}")
+async def mark_failed(payload: dict, error: Exception):
+    """Called by the job queue once all retries of a job are exhausted."""
+    print(f"CRITICAL ERROR: Video background process failed for {payload['content_id']}: {str(error)}")
+    await supabase_service.update_content(payload["content_id"], status="failed", error_message=str(error))
 
-    except Exception as e:
-        print(f"CRITICAL ERROR: Video background process failed for {content_id}: {str(e)}")
-        await supabase_service.update_content(content_id, status="failed", error_message=str(e))
+
+job_queue.register_handler("video", run_video_job, on_failure=mark_failed)
 
 
 @router.post(
     "/process-video",
     response_model=ProcessVideoResponse,
     summary="Process a YouTube video (Background)",
-    description="Starts a background job to fetch transcript and process. Returns the content ID immediately.",
+    description="Queues a background job to fetch the transcript and process it. Returns the content ID and job ID immediately. A video that was already processed is linked to the existing vectors and returned as processed, without a job.",
 )
-async def process_video(request: ProcessVideoRequest, background_tasks: BackgroundTasks):
+async def process_video(request: ProcessVideoRequest):
     # Get title quickly (or use a placeholder) to create record
     try:
         title = processor.get_youtube_title(request.youtube_url)
     except:
         title = "YouTube Video"
 
-    # 1. Create Initial Entry
+    # 1. Fingerprint the video (id + chunking): an already processed one is reused
+    fingerprint = processor.video_fingerprint(request.youtube_url)
+    existing = (await supabase_service.find_processed([fingerprint])).get(fingerprint) if fingerprint else None
+    metadata = supabase_service.linked_metadata(fingerprint, existing)
+
+    if existing is not None:
+        # Linked to the existing vectors and chunks: nothing to ingest
+        content = await supabase_service.create_content(
+            content_type="video",
+            source=request.youtube_url,
+            title=title,
+            metadata=metadata,
+            status="processed",
+            chunks_count=existing.get("chunks_count", 0),
+        )
+        return ProcessVideoResponse(
+            content_id=content["id"],
+            job_id=None,
+            title=title,
+            duration=None,
+            chunks_count=content.get("chunks_count", 0),
+            status="processed",
+            created_at=content["created_at"],
+        )
+
+    # 2. Create Initial Entry
     content = await supabase_service.create_content(
         content_type="video",
         source=request.youtube_url,
         title=title,
+        metadata=metadata,
     )
     content_id = content["id"]
 
-    # 2. Add to Background Tasks
-    background_tasks.add_task(run_background_video_process, content_id, request.youtube_url)
+    # 3. Queue the durable background job
+    job_id = await job_queue.enqueue(
+        "video",
+        {"content_id": content_id, "youtube_url": request.youtube_url},
+        content_id=content_id,
+    )
 
-    # 3. Return Instant Response
+    # 4. Return Instant Response
     return ProcessVideoResponse(
         content_id=content_id,
+        job_id=job_id,
         title=title,
         duration=None,
         chunks_count=0,
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Literal, Optional
 from datetime import datetime
 
 
@@ -17,6 +17,7 @@ class ProcessVideoRequest(BaseModel):
 
 class ProcessVideoResponse(BaseModel):
     content_id: str
+    job_id: Optional[str] = None
     title: str
     duration: Optional[str] = None
     chunks_count: int
@@ -30,6 +31,7 @@ class ProcessVideoResponse(BaseModel):
 
 class ProcessPdfResponse(BaseModel):
     content_id: str
+    job_id: Optional[str] = None
     filename: str
     pages_count: int
     chunks_count: int
@@ -37,6 +39,36 @@ class ProcessPdfResponse(BaseModel):
     created_at: datetime
 
 
+# ──────────────────────────────────────
+# Process Batch
+# ──────────────────────────────────────
+
+class BatchItem(BaseModel):
+    content_id: str
+    content_type: str = Field(..., description="video or pdf")
+    source: str
+    title: str
+    status: str
+    chunks_count: int = 0
+    error: Optional[str] = None
+
+
+class ProcessBatchResponse(BaseModel):
+    job_id: Optional[str] = Field(None, description="Background job, None when every item was already processed")
+    items: list[BatchItem]
+    status: str
+    created_at: datetime
+
+
+class BatchStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: Optional[str] = None
+    progress: float = Field(..., description="Progress between 0 and 1")
+    detail: Optional[str] = None
+    items: list[BatchItem] = Field(..., description="Per-item status, in request order")
+
+
 # ──────────────────────────────────────
 # Generate Flashcards
 # ──────────────────────────────────────
@@ -46,6 +78,11 @@ class GenerateFlashcardsRequest(BaseModel):
     num_cards: Optional[int] = Field(
         10, description="Number of flashcards to generate", ge=1, le=50
     )
+    mode: Literal["auto", "single", "map_reduce"] = Field(
+        "auto",
+        description="'single' prompts with the start of the document, 'map_reduce' covers all of it, "
+        "'auto' uses map_reduce for long documents",
+    )
 
 
 class Flashcard(BaseModel):
@@ -69,6 +106,11 @@ class GenerateQuizRequest(BaseModel):
     num_questions: Optional[int] = Field(
         5, description="Number of quiz questions", ge=1, le=20
     )
+    mode: Literal["auto", "single", "map_reduce"] = Field(
+        "auto",
+        description="'single' prompts with the start of the document, 'map_reduce' covers all of it, "
+        "'auto' uses map_reduce for long documents",
+    )
 
 
 class QuizOption(BaseModel):
@@ -94,19 +136,56 @@ class GenerateQuizResponse(BaseModel):
 # ──────────────────────────────────────
 
 class ChatRequest(BaseModel):
-    content_id: str = Field(..., description="ID of the processed content")
+    content_id: Optional[str] = Field(None, description="ID of the processed content")
+    content_ids: Optional[list[str]] = Field(
+        None,
+        description="IDs of several processed contents to chat across (instead of content_id)",
+        min_length=1,
+        max_length=20,
+    )
     message: str = Field(..., description="User message / question", min_length=1)
 
+    @model_validator(mode="after")
+    def check_content_ids(self):
+        if not self.content_id and not self.content_ids:
+            raise ValueError("Either content_id or content_ids is required")
+        return self
+
+    def all_content_ids(self) -> list[str]:
+        """Requested content ids, de-duplicated, in request order."""
+        ids = ([self.content_id] if self.content_id else []) + (self.content_ids or [])
+        return list(dict.fromkeys(ids))
+
 
 class ChatResponse(BaseModel):
     content_id: str
+    content_ids: list[str] = Field(default_factory=list, description="All contents the question was asked across")
     reply: str
     sources: list[str] = Field(
         default_factory=list,
-        description="Chunk references used to generate the reply",
+        description="Chunk references used to generate the reply ('chunk_N', or '<content_id>:chunk_N' across several contents)",
     )
 
 
+# ──────────────────────────────────────
+# Jobs
+# ──────────────────────────────────────
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    content_id: Optional[str] = None
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: Optional[str] = Field(None, description="Current pipeline stage")
+    progress: float = Field(..., description="Progress between 0 and 1")
+    detail: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 # ──────────────────────────────────────
 # Health
 # ──────────────────────────────────────
@@ -114,3 +193,11 @@ class ChatResponse(BaseModel):
 class HealthResponse(BaseModel):
     status: str
     app_name: str
+
+
+class ReadyResponse(BaseModel):
+    status: str  # "ready" or "starting"
+    startup_seconds: Optional[float] = None  # Import + lifespan, once started
+    import_seconds: float
+    warmup: str  # "disabled", "running", "done" or "failed"
+    providers: dict[str, bool]  # Credentials configured per provider
@@ -0,0 +1,154 @@
+"""Semantic answer cache for RAG chat.
+
+For each content we keep recent (question embedding, reply, sources)
+entries. A new question whose embedding is within
+``ANSWER_CACHE_THRESHOLD`` cosine similarity of a cached one gets the cached
+reply, skipping retrieval and the LLM call. Entries are tied to a content
+version and dropped as soon as the content changes.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.config import settings
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    reply: str
+    sources: list[str]
+    latency_ms: float
+
+
+class _ContentAnswers:
+    """Cached answers of one content, with embeddings stacked for fast lookup."""
+
+    def __init__(self, version):
+        self.version = version
+        self.answers: list[CachedAnswer] = []
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
+
+    def add(self, embedding: np.ndarray, answer: CachedAnswer):
+        if self.embeddings.size and self.embeddings.shape[1] != embedding.shape[0]:
+            # Embedding model changed: start over for this content
+            self.answers = []
+            self.embeddings = np.empty((0, 0), dtype=np.float32)
+        self.answers.append(answer)
+        self.embeddings = (
+            np.vstack([self.embeddings, embedding]) if self.embeddings.size else embedding[None, :]
+        )
+
+    def pop_oldest(self):
+        self.answers.pop(0)
+        self.embeddings = self.embeddings[1:]
+
+
+class AnswerCache:
+    """Per-content semantic cache, bounded by total entries (LRU by content)."""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 2000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._contents: OrderedDict[str, _ContentAnswers] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        return vector / norm
+
+    def lookup(self, content_id: str, version, embedding: list[float]) -> CachedAnswer | None:
+        """Return the closest cached answer above the threshold, if any."""
+        entries = self._contents.get(content_id)
+        if entries is not None and entries.version != version:
+            self.invalidate(content_id)
+            entries = None
+
+        if entries is None or not entries.answers:
+            self.misses += 1
+            return None
+
+        query = self._normalize(embedding)
+        if entries.embeddings.shape[1] != query.shape[0]:
+            self.misses += 1
+            return None
+
+        scores = entries.embeddings @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self._contents.move_to_end(content_id)
+        answer = entries.answers[best]
+        self.hits += 1
+        self.saved_ms += answer.latency_ms
+        return answer
+
+    def store(self, content_id: str, version, embedding: list[float], answer: CachedAnswer):
+        entries = self._contents.get(content_id)
+        if entries is None or entries.version != version:
+            self.invalidate(content_id)
+            entries = _ContentAnswers(version)
+            self._contents[content_id] = entries
+
+        before = len(entries.answers)
+        entries.add(self._normalize(embedding), answer)
+        self._size += len(entries.answers) - before
+        self._contents.move_to_end(content_id)
+
+        # Evict from the least recently used contents first
+        while self._size > self.max_entries:
+            oldest_id, oldest = next(iter(self._contents.items()))
+            oldest.pop_oldest()
+            self._size -= 1
+            if not oldest.answers:
+                del self._contents[oldest_id]
+
+    def invalidate(self, content_id: str):
+        entries = self._contents.pop(content_id, None)
+        if entries is not None:
+            self._size -= len(entries.answers)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "contents": len(self._contents),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_ms": round(self.saved_ms, 1),
+        }
+
+
+_cache = None
+
+
+def get_cache() -> AnswerCache | None:
+    global _cache
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = AnswerCache(
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        )
+    return _cache
+
+
+def invalidate(content_id: str):
+    """Drop cached answers for a content that has been (re-)processed."""
+    if _cache is not None:
+        _cache.invalidate(content_id)
+
+
+def content_version(content: dict):
+    """Version stamp of a content record; cached answers must match it."""
+    return (content.get("status"), content.get("chunks_count"), content.get("updated_at"))
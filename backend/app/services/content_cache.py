@@ -0,0 +1,156 @@
+"""Read-through cache for content records.
+
+Chat, flashcard and quiz requests all start by loading the content row just
+to check ``status`` and ``chunks_count``. Rows are kept in memory with a TTL
+that depends on their status: rows still ``processing`` change soon and are
+only kept briefly, finished rows for much longer.
+
+Writes go through ``supabase_service.update_content``, which bumps a version
+stamp in a small SQLite file under ``DATA_DIR``. Every lookup compares the
+cached entry against that stamp, so an update made by any uvicorn worker or
+the standalone job worker invalidates the entry in all of them.
+
+The version stamps are read from SQLite, so ``lookup`` / ``write`` block:
+async callers run them in a thread (see ``supabase_service``).
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+FINAL_STATUSES = ("processed", "failed")
+
+
+class ContentCache:
+    """In-memory TTL + LRU cache validated against shared version stamps."""
+
+    def __init__(
+        self,
+        path: str,
+        processing_ttl: float = 2.0,
+        processed_ttl: float = 300.0,
+        max_entries: int = 1024,
+    ):
+        self.processing_ttl = processing_ttl
+        self.processed_ttl = processed_ttl
+        self.max_entries = max_entries
+        # content_id -> (expires_at, version, record)
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._lock = threading.Lock()  # Guards the entries, never held during I/O
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS content_versions (
+                content_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )"""
+        )
+
+    def _versions(self, content_ids: list[str]) -> dict[str, int]:
+        placeholders = ",".join("?" * len(content_ids))
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT content_id, version FROM content_versions WHERE content_id IN ({placeholders})",
+                content_ids,
+            ).fetchall()
+        return dict(rows)
+
+    def lookup(self, content_id: str) -> tuple[dict | None, int]:
+        """Return (cached record or None, current version stamp).
+
+        Pass the version to ``put`` after fetching on a miss: if the row is
+        updated meanwhile, the stored entry is already stale and won't be served.
+        """
+        records, versions = self.lookup_many([content_id])
+        return records.get(content_id), versions[content_id]
+
+    def lookup_many(self, content_ids: list[str]) -> tuple[dict[str, dict], dict[str, int]]:
+        """Cached records by id (fresh ones only) and every id's version stamp.
+
+        All versions are read with one query.
+        """
+        versions = self._versions(content_ids) if content_ids else {}
+        records = {}
+        now = time.monotonic()
+        with self._lock:
+            for content_id in content_ids:
+                version = versions.setdefault(content_id, 0)
+                entry = self._entries.get(content_id)
+                if entry is None:
+                    self.misses += 1
+                    continue
+
+                expires_at, cached_version, record = entry
+                if cached_version != version or expires_at <= now:
+                    del self._entries[content_id]
+                    self.stale += cached_version != version
+                    self.misses += 1
+                    continue
+
+                self._entries.move_to_end(content_id)
+                self.hits += 1
+                records[content_id] = dict(record)
+        return records, versions
+
+    def put(self, content_id: str, record: dict, version: int):
+        ttl = self.processed_ttl if record.get("status") in FINAL_STATUSES else self.processing_ttl
+        with self._lock:
+            self._entries[content_id] = (time.monotonic() + ttl, version, dict(record))
+            self._entries.move_to_end(content_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def write(self, content_id: str, record: dict | None = None):
+        """Bump the shared version of a content and cache its new row (write-through)."""
+        with self._db_lock:
+            (version,) = self._db.execute(
+                """INSERT INTO content_versions (content_id, version) VALUES (?, 1)
+                   ON CONFLICT(content_id) DO UPDATE SET version = version + 1
+                   RETURNING version""",
+                (content_id,),
+            ).fetchone()
+        with self._lock:
+            self._entries.pop(content_id, None)
+        if record is not None:
+            self.put(content_id, record, version)
+
+    def write_many(self, records: list[dict]):
+        for record in records:
+            self.write(record["id"], record)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Lazy load the cache so the SQLite file is only created when it's used
+_cache = None
+
+
+def get_cache() -> ContentCache | None:
+    global _cache
+    if not settings.CONTENT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ContentCache(
+            os.path.join(settings.DATA_DIR, "content_versions.sqlite3"),
+            processing_ttl=settings.CONTENT_CACHE_PROCESSING_TTL,
+            processed_ttl=settings.CONTENT_CACHE_PROCESSED_TTL,
+            max_entries=settings.CONTENT_CACHE_MAX_ENTRIES,
+        )
+    return _cache
@@ -0,0 +1,167 @@
+"""Token-budgeted prompt context assembly.
+
+Chunks overlap by design (250 of 1000 characters), so joining retrieved
+chunks verbatim repeats text in the prompt. The packer:
+
+1. picks chunks in MMR order (relevance vs. similarity to what's already
+   picked), dropping near-duplicates, until the model's token budget is full
+   (``pack_ranked``), or simply in document order (``pack_sequential``);
+2. merges overlapping / adjacent chunks into single passages by their
+   document spans, so every character is sent once.
+
+Contents without document spans (ingested before the document store) are
+merged by detecting the overlapping text of consecutive chunks instead.
+Chunks may come from several contents (``content_id`` key); passages are
+then grouped per content under a label.
+"""
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services import document_store, lexical_index, rate_limiter
+
+# Longest chunk overlap looked for when spans are unknown
+_MAX_TEXT_OVERLAP = 400
+
+
+@dataclass
+class PackedContext:
+    context: str
+    chunks: list[dict]  # selected chunks, in selection order
+    tokens: int
+
+    @property
+    def chunk_indices(self) -> list[int]:
+        return [chunk["chunk_index"] for chunk in self.chunks]
+
+
+def budget_for(model: str) -> int:
+    """Context token budget of a model."""
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``."""
+    for size in range(min(len(left), len(right), _MAX_TEXT_OVERLAP), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge(chunks: list[dict], documents: dict[str, tuple[str, list] | None], labels: dict[str, str] | None) -> list[str]:
+    """Passages covering the given chunks once, in document order (grouped per content)."""
+    by_content: dict[str, list[dict]] = {}
+    for chunk in chunks:
+        by_content.setdefault(chunk["content_id"], []).append(chunk)
+
+    passages = []
+    for content_id, content_chunks in by_content.items():
+        merged = _merge_document(content_chunks, documents.get(content_id))
+        if labels:
+            merged[0] = f"[{labels.get(content_id, content_id)}]\n{merged[0]}"
+        passages.extend(merged)
+    return passages
+
+
+def _merge_document(chunks: list[dict], document: tuple[str, list] | None) -> list[str]:
+    ordered = sorted(chunks, key=lambda chunk: chunk["chunk_index"])
+
+    if document is not None:
+        text, spans = document
+        ranges: list[list[int]] = []
+        for chunk in ordered:
+            start, end, _ = spans[chunk["chunk_index"]]
+            if ranges and start <= ranges[-1][1] + 1:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        return [text[start:end] for start, end in ranges]
+
+    passages: list[str] = []
+    previous_index = None
+    for chunk in ordered:
+        if passages and chunk["chunk_index"] == previous_index + 1:
+            overlap = _text_overlap(passages[-1], chunk["text"])
+            passages[-1] += chunk["text"][overlap:] if overlap else "\n" + chunk["text"]
+        else:
+            passages.append(chunk["text"])
+        previous_index = chunk["chunk_index"]
+    return passages
+
+
+def _load_document(content_id: str, chunks: list[dict]) -> tuple[str, list] | None:
+    manifest = document_store.get_manifest(content_id)
+    if manifest is None or any(chunk["chunk_index"] >= len(manifest["spans"]) for chunk in chunks):
+        return None
+    text = document_store.get_document(manifest["doc"])
+    return (text, manifest["spans"]) if text is not None else None
+
+
+def _similarity(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _pack(
+    content_id: str | None, candidates: list[dict], budget: int, use_mmr: bool, labels: dict[str, str] | None = None
+) -> PackedContext:
+    candidates = [{"content_id": content_id, **chunk} if "content_id" not in chunk else chunk for chunk in candidates]
+    documents = {
+        cid: _load_document(cid, [chunk for chunk in candidates if chunk["content_id"] == cid])
+        for cid in dict.fromkeys(chunk["content_id"] for chunk in candidates)
+    }
+    selected: list[dict] = []
+    selected_terms: list[set[str]] = []
+    remaining = list(enumerate(candidates))
+    terms = {id(chunk): set(lexical_index.tokenize(chunk["text"])) for chunk in candidates} if use_mmr else {}
+    passages: list[str] = []
+
+    while remaining:
+        if use_mmr:
+            # MMR: relevance (by rank) traded off against redundancy with the selection
+            def mmr(entry):
+                rank, chunk = entry
+                relevance = 1.0 - rank / len(candidates)
+                redundancy = max((_similarity(terms[id(chunk)], other) for other in selected_terms), default=0.0)
+                return settings.CONTEXT_MMR_LAMBDA * relevance - (1 - settings.CONTEXT_MMR_LAMBDA) * redundancy, redundancy
+
+            best = max(remaining, key=lambda entry: mmr(entry)[0])
+            redundancy = mmr(best)[1]
+        else:
+            best, redundancy = remaining[0], 0.0
+        remaining.remove(best)
+        chunk = best[1]
+
+        if redundancy > settings.CONTEXT_MAX_SIMILARITY:
+            continue  # near-duplicate of a selected chunk
+        trial = _merge(selected + [chunk], documents, labels)
+        if rate_limiter.estimate_tokens(*trial) > budget and selected:
+            if not use_mmr:
+                break  # sequential packing stops at the first chunk that doesn't fit
+            continue
+        selected.append(chunk)
+        if use_mmr:
+            selected_terms.append(terms[id(chunk)])
+        passages = trial
+
+    return PackedContext(
+        context="\n\n".join(passages),
+        chunks=selected,
+        tokens=rate_limiter.estimate_tokens(*passages),
+    )
+
+
+def pack_ranked(
+    content_id: str | None, chunks: list[dict], budget: int, labels: dict[str, str] | None = None
+) -> PackedContext:
+    """Pack retrieved chunks (best first) with MMR redundancy filtering.
+
+    Chunks without a ``content_id`` key belong to ``content_id``. ``labels``
+    (content id -> title) prefixes each content's passages with its title.
+    """
+    return _pack(content_id, chunks, budget, use_mmr=True, labels=labels)
+
+
+def pack_sequential(content_id: str, chunks: list[dict], budget: int) -> PackedContext:
+    """Pack chunks in the given (document) order until the budget is full."""
+    return _pack(content_id, chunks, budget, use_mmr=False)
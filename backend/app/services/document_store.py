@@ -0,0 +1,176 @@
+"""Compact document store: each document's text is written once.
+
+Chunks overlap, so storing every chunk's text in vector metadata duplicates
+a large part of the document and ships it over the wire on every fetch.
+Instead the text is stored here, zlib-compressed and content-addressed
+(``DATA_DIR/documents/blobs/<sha256>.z``), and vector metadata only carries
+``start`` / ``end`` / ``page`` offsets. A small manifest per content maps it
+to its document and chunk spans, so chunk texts are rebuilt by slicing.
+
+The store is local to ``DATA_DIR``: every process reading the vectors must
+share it. Deployments where Pinecone readers don't can opt into keeping
+``text`` in the metadata as well (``PINECONE_METADATA_TEXT``); vectors
+written before this store existed have it too. A text that can be found
+nowhere raises ``MissingDocumentError``.
+
+Reads are blocking (file I/O, decompression): async callers resolve texts in
+a thread, once per batch of chunks (``chunk_texts``).
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from app.config import settings
+
+# Decompressed documents and parsed manifests kept in memory
+_MAX_CACHED_DOCUMENTS = 32
+_MAX_CACHED_MANIFESTS = 1024
+
+_documents: OrderedDict[str, str] = OrderedDict()
+_manifests: OrderedDict[str, dict] = OrderedDict()
+_lock = threading.Lock()
+
+
+class MissingDocumentError(LookupError):
+    """A chunk's text is neither in its metadata nor in this document store."""
+
+
+def _root_dir() -> str:
+    return os.path.join(settings.DATA_DIR, "documents")
+
+
+def _blob_path(doc_hash: str) -> str:
+    return os.path.join(_root_dir(), "blobs", f"{doc_hash}.z")
+
+
+def _manifest_path(content_id: str) -> str:
+    return os.path.join(_root_dir(), "contents", f"{content_id}.json")
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def put_document(text: str) -> str:
+    """Store a document text (once per distinct text) and return its hash."""
+    data = text.encode("utf-8")
+    doc_hash = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(_blob_path(doc_hash)):
+        _write_atomic(_blob_path(doc_hash), zlib.compress(data, 6))
+    return doc_hash
+
+
+def get_document(doc_hash: str) -> str | None:
+    with _lock:
+        text = _documents.get(doc_hash)
+        if text is not None:
+            _documents.move_to_end(doc_hash)
+            return text
+
+    try:
+        with open(_blob_path(doc_hash), "rb") as f:
+            text = zlib.decompress(f.read()).decode("utf-8")
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        _documents[doc_hash] = text
+        while len(_documents) > _MAX_CACHED_DOCUMENTS:
+            _documents.popitem(last=False)
+    return text
+
+
+def save_content(content_id: str, text: str, spans: list[tuple[int, int, int | None]]) -> str:
+    """Store a content's document and its chunk spans (in chunk index order)."""
+    doc_hash = put_document(text)
+    manifest = {"doc": doc_hash, "spans": [list(span) for span in spans]}
+    _write_atomic(_manifest_path(content_id), json.dumps(manifest).encode("utf-8"))
+    _cache_manifest(content_id, manifest)
+    return doc_hash
+
+
+def _cache_manifest(content_id: str, manifest: dict):
+    with _lock:
+        _manifests[content_id] = manifest
+        _manifests.move_to_end(content_id)
+        while len(_manifests) > _MAX_CACHED_MANIFESTS:
+            _manifests.popitem(last=False)
+
+
+def get_manifest(content_id: str) -> dict | None:
+    with _lock:
+        manifest = _manifests.get(content_id)
+        if manifest is not None:
+            _manifests.move_to_end(content_id)
+            return manifest
+
+    try:
+        with open(_manifest_path(content_id), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    _cache_manifest(content_id, manifest)
+    return manifest
+
+
+def get_chunks(content_id: str) -> list[str] | None:
+    """All chunk texts of a content, or None if it isn't in the store."""
+    manifest = get_manifest(content_id)
+    if manifest is None:
+        return None
+    text = get_document(manifest["doc"])
+    if text is None:
+        return None
+    return [text[start:end] for start, end, _ in manifest["spans"]]
+
+
+def chunk_metadata(content_id: str, chunk_index: int, chunk, include_text: bool = False) -> dict:
+    """Vector metadata of a chunk: offsets for spans, the text itself for plain strings.
+
+    ``include_text`` also keeps a span's text (for vector stores shared with
+    processes that can't read this document store).
+    """
+    metadata = {"content_id": content_id, "chunk_index": chunk_index}
+    if isinstance(chunk, str):
+        metadata["text"] = chunk
+        return metadata
+    metadata["start"] = chunk.start
+    metadata["end"] = chunk.end
+    if chunk.page is not None:
+        metadata["page"] = chunk.page
+    if include_text:
+        metadata["text"] = chunk.text
+    return metadata
+
+
+def _content_document(content_id: str) -> str:
+    manifest = get_manifest(content_id)
+    text = get_document(manifest["doc"]) if manifest else None
+    if text is None:
+        raise MissingDocumentError(
+            f"Document of content {content_id} not found under {_root_dir()} "
+            "(is DATA_DIR shared with the process that ingested it?)"
+        )
+    return text
+
+
+def chunk_texts(metadatas: list[dict]) -> list[str]:
+    """Rebuild several chunks' texts, loading each content's document once."""
+    documents: dict[str, str] = {}
+    texts = []
+    for metadata in metadatas:
+        if "text" in metadata:
+            texts.append(metadata["text"])
+            continue
+        content_id = metadata.get("content_id", "")
+        if content_id not in documents:
+            documents[content_id] = _content_document(content_id)
+        texts.append(documents[content_id][int(metadata.get("start", 0)) : int(metadata.get("end", 0))])
+    return texts
@@ -0,0 +1,149 @@
+"""Micro-batching for local embedding inference.
+
+Concurrent callers (e.g. many chat questions at once) are coalesced into a
+single ``model.encode`` call: the batcher waits until ``max_batch_size``
+texts are queued or ``max_wait_ms`` has passed since the first one, runs
+one forward pass in a worker thread and fans the vectors back out.
+
+Batches never exceed ``max_batch_size``: larger inputs are split, and a
+request that doesn't fit waits for the next batch. Queued requests are
+served in the caller's ``rate_limiter`` priority order, so interactive
+questions don't wait behind ingestion.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+
+from app.services import rate_limiter
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    sequence: int
+    texts: list[str] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(default_factory=time.perf_counter, compare=False)
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into batched encode calls."""
+
+    def __init__(self, encode, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: list[_Request] = []  # heap by (priority, arrival)
+        self._queued: asyncio.Event | None = None
+        self._sequence = itertools.count()
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending_texts = 0
+
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.largest_batch = 0
+        self.total_wait = 0.0
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = []
+            self._queued = asyncio.Event()
+            self._pending_texts = 0
+            self._task = loop.create_task(self._run())
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Queue texts for the next batches and wait for their vectors."""
+        if not texts:
+            return []
+        self._ensure_running()
+        priority = rate_limiter.current_priority()
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            request = _Request(
+                priority=priority,
+                sequence=next(self._sequence),
+                texts=texts[start : start + self.max_batch_size],
+                future=self._loop.create_future(),
+            )
+            heapq.heappush(self._queue, request)
+            self._pending_texts += len(request.texts)
+            futures.append(request.future)
+        self._queued.set()
+        parts = await asyncio.gather(*futures)
+        return [vector for part in parts for vector in part]
+
+    async def _wait_for_requests(self, timeout: float | None = None) -> bool:
+        self._queued.clear()
+        try:
+            await asyncio.wait_for(self._queued.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _collect(self) -> list[_Request]:
+        while not self._queue:
+            await self._wait_for_requests()
+        deadline = self._loop.time() + self.max_wait
+        while self._pending_texts < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0 or not await self._wait_for_requests(timeout):
+                break
+
+        # Highest priority first; stop at the first request that doesn't fit
+        batch = []
+        size = 0
+        while self._queue and size + len(self._queue[0].texts) <= self.max_batch_size:
+            request = heapq.heappop(self._queue)
+            self._pending_texts -= len(request.texts)
+            if request.future.done():
+                continue  # Caller gave up
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            texts = [text for request in batch for text in request.texts]
+
+            started = time.perf_counter()
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.largest_batch = max(self.largest_batch, len(texts))
+            self.total_wait += sum(started - request.enqueued_at for request in batch)
+
+            try:
+                vectors = await self._loop.run_in_executor(None, self.encode, texts)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                result = vectors[offset : offset + len(request.texts)]
+                offset += len(request.texts)
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._queue),
+            "pending_texts": self._pending_texts,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_wait_ms": 1000 * self.total_wait / self.requests if self.requests else 0.0,
+        }
@@ -0,0 +1,178 @@
+"""Two-tier cache for text embeddings.
+
+Entries are keyed by (model namespace, hash of the normalized text); the
+namespace names the model and the backend that computed the vector, since
+e.g. int8 vectors differ from float ones. A small in-memory LRU sits in front
+of a SQLite file under ``DATA_DIR`` so vectors survive restarts; both tiers
+are size bounded. Lookups and writes block on SQLite: call them in a thread.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(namespace: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class EmbeddingCache:
+    """In-memory LRU tier backed by a size-bounded SQLite tier."""
+
+    def __init__(self, path: str, memory_items: int = 10_000, disk_items: int = 200_000):
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk_count = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._db.commit()
+        (self._disk_count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, namespace: str, texts: list[str]) -> list[list[float] | None]:
+        """Look up texts; returns a vector per text or None on a miss."""
+        keys = [cache_key(namespace, text) for text in texts]
+        results: list[list[float] | None] = [None] * len(texts)
+        disk_lookup: dict[str, list[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector.tolist()
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup:
+                found = {}
+                lookup_keys = list(disk_lookup)
+                # SQLite limits the number of bound parameters per statement
+                for start in range(0, len(lookup_keys), 500):
+                    batch = lookup_keys[start : start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+
+                for key, positions in disk_lookup.items():
+                    vector = found.get(key)
+                    if vector is None:
+                        self.misses += len(positions)
+                        continue
+                    self._remember(key, vector)
+                    for i in positions:
+                        results[i] = vector.tolist()
+                    self.disk_hits += len(positions)
+
+                if found:
+                    now = time.time()
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+                    self._db.commit()
+
+        return results
+
+    def put_many(self, namespace: str, texts: list[str], vectors: list[list[float]]):
+        """Store vectors for texts in both tiers, evicting the oldest entries."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, values in zip(texts, vectors):
+                key = cache_key(namespace, text)
+                vector = np.asarray(values, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+
+            # Entries are immutable per key: an existing row already holds this vector
+            inserted = self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            ).rowcount
+            self._disk_count += max(inserted, 0)
+            if self._disk_count > self.disk_items:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Trim the disk tier to 90% of its size so eviction runs now and then, not per write."""
+        # Other processes write the same file: recount before deleting
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - int(self.disk_items * 0.9)
+        if overflow > 0 and count > self.disk_items:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+            count -= overflow
+        self._disk_count = count
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_items": len(self._memory),
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+# Lazy load the cache so the SQLite file is only created when embeddings are used
+_cache = None
+
+
+def get_cache() -> EmbeddingCache | None:
+    global _cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache(
+            os.path.join(settings.DATA_DIR, "embedding_cache.sqlite3"),
+            memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+            disk_items=settings.EMBEDDING_CACHE_DISK_ITEMS,
+        )
+    return _cache
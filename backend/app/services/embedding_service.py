@@ -1,51 +1,173 @@
-import os
-import httpx
 import asyncio
+import os
 from app.config import settings
-
-# Set the cache directory before importing sentence_transformers
-os.environ["TRANSFORMERS_CACHE"] = settings.TRANSFORMERS_CACHE
+from app.services import embedding_cache, metrics, provider_io, rate_limiter
+from app.services.embedding_batcher import EmbeddingBatcher
 
 # Lasy load the model only if needed to save memory if using API
 _local_model = None
 
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+def _quantized_model_dir() -> str:
+    # One directory per model and quantization target: each is moved into
+    # place whole, so an existing directory always holds its model file
+    name = settings.EMBEDDING_MODEL_NAME.replace("/", "--")
+    return os.path.join(settings.DATA_DIR, "models", f"{name}-onnx-qint8-{settings.EMBEDDING_QUANTIZATION}")
+
+def _export_quantized(path: str, file_name: str):
+    """Export the model to ONNX and quantize it to int8 (once per model / target)."""
+    import shutil
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    print(f"Exporting {settings.EMBEDDING_MODEL_NAME} to int8 ONNX ({settings.EMBEDDING_QUANTIZATION})...")
+    # Build in a private directory: the API and the worker may start together
+    staging = f"{path}.tmp-{os.getpid()}"
+    model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, backend="onnx")
+    model.save_pretrained(staging)
+    export_dynamic_quantized_onnx_model(model, settings.EMBEDDING_QUANTIZATION, staging)
+    if not os.path.exists(os.path.join(staging, file_name)):
+        raise RuntimeError(f"Quantized model not found at {file_name}")
+    try:
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, file_name)):
+            raise RuntimeError(f"Could not move the quantized model into {path}")
+        # Otherwise another process finished first
+
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+
+    backend = settings.EMBEDDING_BACKEND.lower()
+    threads = settings.EMBEDDING_INTRA_OP_THREADS
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{settings.EMBEDDING_BACKEND}'. Expected one of: {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if threads:
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = session_options
+    if backend == "onnx":
+        return SentenceTransformer(settings.EMBEDDING_MODEL_NAME, backend="onnx", model_kwargs=model_kwargs)
+
+    # onnx_int8: dynamic quantization, exported on first use and reused afterwards
+    path = _quantized_model_dir()
+    file_name = f"onnx/model_qint8_{settings.EMBEDDING_QUANTIZATION}.onnx"
+    if not os.path.exists(os.path.join(path, file_name)):
+        _export_quantized(path, file_name)
+    return SentenceTransformer(path, backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name})
+
 def get_local_model():
     global _local_model
     if _local_model is None:
-        from sentence_transformers import SentenceTransformer
-        _local_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+        # Set the cache directory before importing sentence_transformers
+        # (here rather than at import time, so importing the app stays cheap)
+        os.environ["TRANSFORMERS_CACHE"] = settings.TRANSFORMERS_CACHE
+        _local_model = _load_model()
     return _local_model
 
-async def get_embeddings(text_or_list: str | list[str]) -> list[list[float]]:
-    """Generate embeddings using Hugging Face API (Cloud) with Local Fallback."""
-    if isinstance(text_or_list, str):
-        text_or_list = [text_or_list]
+def encode(texts: list[str]) -> list[list[float]]:
+    """Blocking local inference.
 
-    # 1. Try Hugging Face API first (Speed boost)
-    if settings.HUGGINGFACE_API_KEY:
+    SentenceTransformer sorts the texts by length before splitting them into
+    forward passes of ``EMBEDDING_ENCODE_BATCH_SIZE``, so each pass pads little
+    even when the micro-batcher mixes short questions with full chunks.
+    """
+    return get_local_model().encode(texts, batch_size=settings.EMBEDDING_ENCODE_BATCH_SIZE).tolist()
+
+_batcher = None
+
+def get_batcher() -> EmbeddingBatcher:
+    """Coalesces concurrent local encode calls into batched forward passes."""
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher(
+            encode,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+        )
+    return _batcher
+
+async def warmup():
+    """Load the local model and run one forward pass (optional background warmup)."""
+    with metrics.timed("local_model", "warmup"):
+        await provider_io.run_blocking(encode, ["warmup"])
+
+async def compute_embeddings(texts: list[str]) -> list[list[float]]:
+    """Compute embeddings using Hugging Face API (Cloud) with Local Fallback."""
+    # 1. Try Hugging Face API first (Speed boost), unless it recently answered 429:
+    # the local model is a better option than waiting for the quota
+    limiter = rate_limiter.get_limiter("huggingface", settings.EMBEDDING_MODEL_NAME)
+    if settings.HUGGINGFACE_API_KEY and not limiter.blocked():
         try:
             api_url = f"https://api-inference.huggingface.co/pipeline/feature-extraction/{settings.EMBEDDING_MODEL_NAME}"
             headers = {"Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+            # Reuse the shared keep-alive pool instead of a client per request
+            await limiter.acquire()
+            with metrics.timed("huggingface", "embed"):
+                response = await provider_io.get_http_client().post(
                     api_url, 
                     headers=headers, 
-                    json={"inputs": text_or_list, "options": {"wait_for_model": True}},
+                    json={"inputs": texts, "options": {"wait_for_model": True}},
                     timeout=30.0
                 )
-                if response.status_code == 200:
-                    return response.json()
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429:
+                limiter.rate_limited_for(rate_limiter.parse_duration(response.headers.get("retry-after")))
         except Exception as e:
             print(f"HF API Failed, falling back to local: {e}")
 
-    # 2. Local Fallback (Standard)
-    model = get_local_model()
-    # Run in thread pool to avoid blocking the event loop
-    loop = asyncio.get_event_loop()
-    embeddings = await loop.run_in_executor(None, lambda: model.encode(text_or_list))
-    return embeddings.tolist()
+    # 2. Local Fallback (Standard), micro-batched with concurrent requests
+    # and run in a thread pool to avoid blocking the event loop
+    with metrics.timed("local_model", "embed"):
+        return await get_batcher().embed(texts)
+
+def cache_namespace() -> str:
+    """Model plus backend: vectors from different backends / precisions differ."""
+    backend = settings.EMBEDDING_BACKEND.lower()
+    if backend == "onnx_int8":
+        backend = f"{backend}-{settings.EMBEDDING_QUANTIZATION}"
+    return f"{settings.EMBEDDING_MODEL_NAME}@{backend}"
+
+async def get_embeddings(text_or_list: str | list[str]) -> list[list[float]]:
+    """Generate embeddings, only computing the ones missing from the cache."""
+    if isinstance(text_or_list, str):
+        text_or_list = [text_or_list]
+
+    cache = embedding_cache.get_cache()
+    if cache is None:
+        return await compute_embeddings(text_or_list)
+
+    namespace = cache_namespace()
+    embeddings = await asyncio.to_thread(cache.get_many, namespace, text_or_list)
+
+    # Deduplicate misses so repeated texts in one request are embedded once
+    missing: dict[str, list[int]] = {}
+    for i, (text, embedding) in enumerate(zip(text_or_list, embeddings)):
+        if embedding is None:
+            missing.setdefault(embedding_cache.normalize_text(text), []).append(i)
+
+    if missing:
+        miss_texts = [text_or_list[positions[0]] for positions in missing.values()]
+        computed = await compute_embeddings(miss_texts)
+        await asyncio.to_thread(cache.put_many, namespace, miss_texts, computed)
+        for positions, embedding in zip(missing.values(), computed):
+            for i in positions:
+                embeddings[i] = list(embedding)
+
+    return embeddings
 
 async def embed_chunks(chunks: list[str], batch_size: int = 50) -> list[list[float]]:
-    """Generate embeddings for multiple chunks efficiently."""
+    """Generate embeddings for multiple chunks efficiently (cache misses only)."""
     return await get_embeddings(chunks)
@@ -1,54 +1,91 @@
-import asyncio
 import time
-from google import genai
-from google.genai import types
+from typing import TYPE_CHECKING
 
 from app.config import settings
+from app.services import metrics, provider_io, rate_limiter
 
-# Initialize the Gemini client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+if TYPE_CHECKING:
+    from google import genai
+
+# Gemini client (created, and the SDK imported, on first use; async calls go
+# through client.aio)
+_client: "genai.Client | None" = None
 
 EMBEDDING_MODEL = "gemini-embedding-001"
 LLM_MODEL = "gemini-2.0-flash"
-EMBEDDING_DIMENSION = 768  # Must match Pinecone index dimension
+EMBEDDING_DIMENSION = settings.GEMINI_EMBEDDING_DIMENSION  # Must match Pinecone index dimension
+
+
+def get_client() -> "genai.Client":
+    global _client
+    if _client is None:
+        from google import genai
+
+        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        provider_io.on_shutdown(close_client)
+    return _client
+
+
+async def close_client():
+    """Close the async connection pool of the Gemini client."""
+    global _client
+    if _client is not None:
+        await _client.aio.aclose()
+        _client = None
 
 
 async def get_embeddings_with_retry(text_or_list: str | list[str], retries: int = 5, base_delay: float = 1.0) -> list[list[float]]:
-    """Generate embeddings with exponential backoff for rate limits."""
+    """Generate embeddings, waiting on the rate limiter (which backs off after 429 / 503)."""
+    from google.genai import types
+
+    limiter = rate_limiter.get_limiter("gemini", EMBEDDING_MODEL)
+    inputs = [text_or_list] if isinstance(text_or_list, str) else text_or_list
     for i in range(retries):
+        await limiter.acquire(rate_limiter.estimate_tokens(*inputs))
         try:
-            response = client.models.embed_content(
-                model=EMBEDDING_MODEL,
-                contents=text_or_list,
-                config=types.EmbedContentConfig(
-                    output_dimensionality=EMBEDDING_DIMENSION,
-                ),
-            )
+            with metrics.timed("gemini", "embed"):
+                response = await get_client().aio.models.embed_content(
+                    model=EMBEDDING_MODEL,
+                    contents=text_or_list,
+                    config=types.EmbedContentConfig(
+                        output_dimensionality=EMBEDDING_DIMENSION,
+                    ),
+                )
             # If it's a single string, response.embeddings is a list of 1
             # If it's a list, response.embeddings matches the list length
             return [emb.values for emb in response.embeddings]
         except Exception as e:
             # Check for Rate Limit (429) or Service Unavailable (503)
             error_str = str(e).lower()
-            if ("429" in error_str or "resource_exhausted" in error_str or "503" in error_str) and i < retries - 1:
-                delay = base_delay * (2 ** i)
-                await asyncio.sleep(delay)
-                continue
-            raise e
+            delay = rate_limiter.retry_after_from(e) or base_delay * (2 ** i)
+            if "429" in error_str or "resource_exhausted" in error_str:
+                # Every caller of this model now waits, not just this one
+                limiter.rate_limited_for(delay)
+            elif "503" in error_str:
+                limiter.back_off(delay)
+            else:
+                raise e
+            if i == retries - 1:
+                raise e
+            metrics.RETRIES.inc(provider="gemini", operation="embed")
     return []
 
 
 async def generate_response(prompt: str) -> str:
     """Generate a text response using Gemini LLM."""
+    limiter = rate_limiter.get_limiter("gemini", LLM_MODEL)
+    await limiter.acquire(rate_limiter.estimate_tokens(prompt))
     try:
-        response = client.models.generate_content(
-            model=LLM_MODEL,
-            contents=prompt,
-        )
+        with metrics.timed("gemini", "generate"):
+            response = await get_client().aio.models.generate_content(
+                model=LLM_MODEL,
+                contents=prompt,
+            )
         return response.text
     except Exception as e:
         error_str = str(e).lower()
         if "429" in error_str or "resource_exhausted" in error_str:
+            limiter.rate_limited_for(rate_limiter.retry_after_from(e))
             raise ValueError("AI rate limit reached. Please wait a minute and try again.")
         raise e
 
@@ -60,8 +97,5 @@ async def embed_chunks(chunks: list[str], batch_size: int = 50) -> list[list[flo
         batch = chunks[i : i + batch_size]
         batch_embeddings = await get_embeddings_with_retry(batch)
         all_embeddings.extend(batch_embeddings)
-        # Small delay between batches to stay under free tier RPM
-        if i + batch_size < len(chunks):
-            await asyncio.sleep(0.5)
     return all_embeddings
 
@@ -0,0 +1,157 @@
+"""Shared helpers for flashcard / quiz generation.
+
+- ``parse_json_response`` turns an LLM reply into JSON, tolerating markdown
+  fences and stray text around the object.
+- ``single_prompt_context`` packs as much of the document as fits the
+  model's context budget, with chunk overlaps removed.
+
+Packing reads the document store and is CPU bound, so it runs in a thread.
+- ``map_reduce`` covers a whole document: chunk groups are sent to the LLM
+  concurrently (bounded fan-out) and the partial item sets are merged,
+  deduplicated and trimmed to the requested count.
+"""
+import asyncio
+import json
+import math
+import re
+
+from app.config import settings
+from app.services import context_packer, groq_service
+
+SINGLE = "single"
+MAP_REDUCE = "map_reduce"
+AUTO = "auto"
+
+_NON_WORD = re.compile(r"\W+")
+
+
+def parse_json_response(response: str):
+    """Parse the JSON object of an LLM reply; raise ValueError if there is none."""
+    cleaned_response = response.strip()
+
+    # Groq's JSON mode can still sometimes return a string with a markdown block if not careful
+    if "```json" in cleaned_response:
+        cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
+    elif "```" in cleaned_response:
+        cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
+
+    try:
+        # Strategy 1: Direct parse
+        return json.loads(cleaned_response)
+    except json.JSONDecodeError:
+        pass
+
+    # Strategy 2: Take everything between the first { and the last }
+    start = cleaned_response.find("{")
+    end = cleaned_response.rfind("}") + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON object found in response")
+    try:
+        return json.loads(cleaned_response[start:end])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in response: {e}") from e
+
+
+def extract_items(data, key: str) -> list:
+    """Items list of a parsed reply (``{key: [...]}`` or a bare array)."""
+    if isinstance(data, list):
+        # Compatibility with old array-only response format
+        return data
+    items = data.get(key, []) if isinstance(data, dict) else []
+    return items if isinstance(items, list) else []
+
+
+def dedupe_key(text: str) -> str:
+    """Case / punctuation insensitive key used to drop duplicate items."""
+    return _NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+def _indexed(chunks: list[str]) -> list[dict]:
+    return [{"chunk_index": i, "text": text} for i, text in enumerate(chunks)]
+
+
+async def single_prompt_context(content_id: str, chunks: list[str]) -> context_packer.PackedContext:
+    """The start of the document, overlap-free, up to the generation model's budget."""
+    return await asyncio.to_thread(
+        context_packer.pack_sequential,
+        content_id,
+        _indexed(chunks),
+        context_packer.budget_for(groq_service.MODEL_NAME),
+    )
+
+
+def use_map_reduce(mode: str, chunks: list[str], packed: context_packer.PackedContext) -> bool:
+    if mode == AUTO:
+        # Only when the document doesn't fit in a single prompt
+        return len(packed.chunk_indices) < len(chunks)
+    return mode == MAP_REDUCE
+
+
+def group_chunks(chunks: list, group_size: int, max_groups: int) -> list[list]:
+    """Split chunks into consecutive groups.
+
+    Documents longer than ``group_size * max_groups`` chunks are sampled at
+    even intervals so every part of the document is still represented.
+    """
+    limit = group_size * max_groups
+    if len(chunks) > limit:
+        step = len(chunks) / limit
+        chunks = [chunks[int(i * step)] for i in range(limit)]
+    return [chunks[i : i + group_size] for i in range(0, len(chunks), group_size)]
+
+
+async def map_reduce(content_id: str, chunks: list[str], count: int, generate_group, item_key) -> list:
+    """Generate ``count`` items from the whole document.
+
+    ``await generate_group(text, n)`` returns up to ``n`` items for one chunk
+    group; ``item_key(item)`` is the text used for deduplication. Groups
+    that fail are skipped as long as at least one succeeds.
+    """
+    groups = group_chunks(
+        _indexed(chunks), settings.GENERATION_MAP_GROUP_CHUNKS, settings.GENERATION_MAP_MAX_GROUPS
+    )
+    budget = context_packer.budget_for(groq_service.MODEL_NAME)
+    # Ask each group for a few extra items so duplicates can be dropped
+    per_group = min(count, max(1, math.ceil(count * 1.5 / len(groups))))
+    semaphore = asyncio.Semaphore(settings.GENERATION_MAP_CONCURRENCY)
+
+    async def run(group: list[dict]) -> list:
+        packed = await asyncio.to_thread(context_packer.pack_sequential, content_id, group, budget)
+        async with semaphore:
+            return await generate_group(packed.context, per_group)
+
+    results = await asyncio.gather(*(run(group) for group in groups), return_exceptions=True)
+    partials = [result for result in results if not isinstance(result, BaseException)]
+    if not partials:
+        raise results[0]
+    if len(partials) < len(results):
+        print(f"Map-reduce generation: {len(results) - len(partials)}/{len(results)} chunk groups failed")
+
+    # Reduce: drop duplicates, then take items round-robin across groups so the
+    # result covers the whole document rather than only its beginning
+    seen = set()
+    rounds: list[list[tuple[int, int, object]]] = []
+    for group_index, items in enumerate(partials):
+        for position, item in enumerate(items):
+            key = dedupe_key(item_key(item))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            while len(rounds) <= position:
+                rounds.append([])
+            rounds[position].append((group_index, position, item))
+
+    selected = []
+    for candidates in rounds:
+        needed = count - len(selected)
+        if needed <= 0:
+            break
+        if len(candidates) > needed:
+            # Last partial round: spread the picks evenly over the groups
+            step = len(candidates) / needed
+            candidates = [candidates[int(i * step)] for i in range(needed)]
+        selected.extend(candidates)
+
+    # Keep document order
+    selected.sort(key=lambda entry: entry[:2])
+    return [item for _, _, item in selected]
@@ -0,0 +1,110 @@
+"""Result cache with single-flight deduplication for LLM generations.
+
+Flashcard and quiz results are cached per key (content id, requested count,
+prompt version, ...) for a TTL. Concurrent requests for the same key share
+one in-flight generation instead of each calling the LLM. Failures are
+never cached.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class GenerationCache:
+    """TTL + LRU cache whose misses are computed at most once at a time."""
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    async def get_or_create(self, key: tuple, factory):
+        """Return the cached value for key, or run ``await factory()`` once for all callers.
+
+        ``key[0]`` must be the content id so ``invalidate`` can find it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._fill(key, factory))
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        # Shield so one caller disconnecting doesn't cancel everyone's generation
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: tuple, factory):
+        try:
+            value = await factory()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, content_id: str):
+        """Drop every cached result for a content (e.g. after re-processing)."""
+        for key in [key for key in self._entries if key[0] == content_id]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+        }
+
+
+def _consume_exception(task: asyncio.Task):
+    # Every waiter may have gone away; mark the error as retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+_cache = None
+
+
+def get_cache() -> GenerationCache | None:
+    global _cache
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = GenerationCache(
+            ttl=settings.GENERATION_CACHE_TTL,
+            max_entries=settings.GENERATION_CACHE_MAX_ENTRIES,
+        )
+    return _cache
+
+
+async def get_or_create(key: tuple, factory):
+    """Cached / single-flight ``await factory()``, or a plain call when disabled."""
+    cache = get_cache()
+    if cache is None:
+        return await factory()
+    return await cache.get_or_create(key, factory)
+
+
+def invalidate(content_id: str):
+    """Drop cached generations for a content that has been (re-)processed."""
+    if _cache is not None:
+        _cache.invalidate(content_id)
@@ -1,15 +1,50 @@
-from groq import Groq
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING
+
 from app.config import settings
+from app.services import metrics, provider_io, rate_limiter
 
-client = Groq(api_key=settings.GROQ_API_KEY)
+if TYPE_CHECKING:
+    from groq import AsyncGroq
 
 MODEL_NAME = "llama-3.1-8b-instant" # Faster model with higher rate limits
 
+# Completion size assumed when reserving tokens/min quota (corrected afterwards)
+COMPLETION_TOKENS_ESTIMATE = 512
+
+# Async client sharing the provider connection pool (created, and the SDK
+# imported, on first use)
+_client: "AsyncGroq | None" = None
+_client_pool = None
+
+
+def get_client() -> "AsyncGroq":
+    global _client, _client_pool
+    http_client = provider_io.get_http_client()
+    # Rebuild if the shared pool was recreated (e.g. after an app restart)
+    if _client is None or _client_pool is not http_client:
+        from groq import AsyncGroq
+
+        _client = AsyncGroq(api_key=settings.GROQ_API_KEY, http_client=http_client)
+        _client_pool = http_client
+    return _client
+
+
+def record_usage(model: str, usage) -> None:
+    """Count prompt / completion tokens reported by the API."""
+    if usage is None:
+        return
+    metrics.LLM_TOKENS.inc(usage.prompt_tokens or 0, provider="groq", model=model, kind="prompt")
+    metrics.LLM_TOKENS.inc(usage.completion_tokens or 0, provider="groq", model=model, kind="completion")
+
+
 async def generate_response(prompt: str, system_prompt: str = "You are a helpful learning assistant.", json_mode: bool = False, model_override: str | None = None) -> str:
     """Generate a text response using Groq LLM."""
+    model = model_override or MODEL_NAME
+    limiter = rate_limiter.get_limiter("groq", model)
     try:
         kwargs = {
-            "model": model_override or MODEL_NAME,
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
@@ -21,10 +56,60 @@ async def generate_response(prompt: str, system_prompt: str = "You are a helpful
         if json_mode:
             kwargs["response_format"] = {"type": "json_object"}
 
-        completion = client.chat.completions.create(**kwargs)
+        # Wait for quota (priority-ordered), then resync it from the response headers
+        estimate = rate_limiter.estimate_tokens(system_prompt, prompt) + COMPLETION_TOKENS_ESTIMATE
+        await limiter.acquire(estimate)
+        with metrics.timed("groq", "generate"):
+            raw = await get_client().chat.completions.with_raw_response.create(**kwargs)
+        completion = await raw.parse()
+        if not limiter.update_from_headers(raw.headers) and completion.usage is not None:
+            limiter.settle(estimate, completion.usage.total_tokens)
+        record_usage(model, completion.usage)
         return completion.choices[0].message.content
     except Exception as e:
         error_str = str(e).lower()
         if "rate_limit" in error_str or "429" in error_str:
+            limiter.rate_limited_for(rate_limiter.retry_after_from(e))
+            raise ValueError("Groq rate limit reached. Please wait a moment and try again.")
+        raise e
+
+
+async def stream_response(prompt: str, system_prompt: str = "You are a helpful learning assistant.", model_override: str | None = None) -> AsyncIterator[str]:
+    """Stream a text response from Groq LLM, yielding content deltas as they arrive."""
+    model = model_override or MODEL_NAME
+    limiter = rate_limiter.get_limiter("groq", model)
+    try:
+        estimate = rate_limiter.estimate_tokens(system_prompt, prompt) + COMPLETION_TOKENS_ESTIMATE
+        await limiter.acquire(estimate)
+        # Timed until the stream opens (time to first byte), not its full length
+        with metrics.timed("groq", "stream"):
+            raw = await get_client().chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.5,
+                max_tokens=4096,
+                stream=True,
+            )
+        synced = limiter.update_from_headers(raw.headers)
+        stream = await raw.parse()
+        async for chunk in stream:
+            # Groq reports usage on the last chunk under ``x_groq``
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                record_usage(model, x_groq.usage)
+                if not synced:
+                    limiter.settle(estimate, x_groq.usage.total_tokens)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    except Exception as e:
+        error_str = str(e).lower()
+        if "rate_limit" in error_str or "429" in error_str:
+            limiter.rate_limited_for(rate_limiter.retry_after_from(e))
             raise ValueError("Groq rate limit reached. Please wait a moment and try again.")
         raise e
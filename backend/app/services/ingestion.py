@@ -0,0 +1,194 @@
+"""Streaming ingestion pipeline: pages -> chunks -> embeddings -> vector store.
+
+Chunk spans are pulled from a (blocking) page generator in a worker thread and flow
+through bounded queues into the embedding and upsert stages, which run
+concurrently. Only a few batches are ever in flight, so memory stays flat
+for large documents and the total time approaches the slowest stage instead
+of the sum of all stages. The document text itself is written once to the
+document store (vectors only carry chunk offsets) and a BM25 index is built
+from the same chunks for hybrid retrieval.
+
+``ingest_documents`` runs several documents through one pipeline (bulk
+imports), packing their chunks into shared embedding batches and upserts.
+"""
+import asyncio
+import itertools
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from app.services import (
+    answer_cache,
+    document_store,
+    embedding_service,
+    generation_cache,
+    job_queue,
+    lexical_index,
+    metrics,
+    processor,
+    vector_store,
+)
+
+_DONE = object()
+
+
+@dataclass
+class DocumentResult:
+    """Outcome of one document of ``ingest_documents``."""
+
+    content_id: str
+    chunks_count: int = 0
+    error: Exception | None = None
+
+
+class _Document:
+    def __init__(self, content_id: str, pages: Iterable[tuple[int | None, str]], max_chunks: int):
+        self.content_id = content_id
+        self.pages = pages
+        self.max_chunks = max_chunks
+        self.chunker = processor.SpanChunker()
+        self.spans: list[tuple[int, int, int | None]] = []
+        self.lexical = lexical_index.LexicalIndex()
+        self.produced: int | None = None  # total chunks, set once chunking is over
+        self.stored = 0
+        self.error: Exception | None = None
+        self.finished = False
+
+    def iter_chunks(self):
+        """Chunk spans of the document; a failing document stops early and records its error."""
+        count = 0
+        try:
+            for chunk in itertools.islice(self.chunker.iter_spans(self.pages), self.max_chunks):
+                yield chunk
+                count += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            # Release what the page source holds (e.g. spooled PDF, extraction workers)
+            close = getattr(self.pages, "close", None)
+            if close is not None:
+                close()
+        self.produced = count
+
+
+async def ingest_pages(
+    content_id: str,
+    pages: Iterable[tuple[int | None, str]],
+    max_chunks: int = 500,
+    batch_size: int = 50,
+    queue_size: int = 2,
+) -> int:
+    """Chunk, embed and upsert a stream of (page number, text) pages.
+
+    Returns the number of chunks stored.
+    """
+    [result] = await ingest_documents([(content_id, pages)], max_chunks, batch_size, queue_size)
+    if result.error is not None:
+        raise result.error
+    return result.chunks_count
+
+
+async def ingest_documents(
+    documents: list[tuple[str, Iterable[tuple[int | None, str]]]],
+    max_chunks: int = 500,
+    batch_size: int = 50,
+    queue_size: int = 2,
+    on_document_done=None,
+) -> list[DocumentResult]:
+    """Ingest several documents through one pipeline.
+
+    Chunks of consecutive documents share embedding batches and vector
+    upserts, so small documents don't each pay for a partly filled batch.
+    A document whose pages fail to extract is reported with its error;
+    embedding or upsert failures abort the whole run. ``await
+    on_document_done(result)`` is called as soon as a document is fully
+    stored and visible.
+    """
+    docs = [_Document(content_id, pages, max_chunks) for content_id, pages in documents]
+    chunks = ((doc, chunk) for doc in docs for chunk in doc.iter_chunks())
+    embed_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    finishing: list[asyncio.Task] = []
+    total_stored = 0
+
+    def next_batch() -> list[tuple[_Document, processor.ChunkSpan]]:
+        return list(itertools.islice(chunks, batch_size))
+
+    async def produce():
+        while True:
+            # Extraction and splitting are blocking, keep them off the event loop
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                break
+            await embed_queue.put(batch)
+        await embed_queue.put(_DONE)
+
+    async def embed():
+        while (batch := await embed_queue.get()) is not _DONE:
+            embeddings = await embedding_service.embed_chunks([chunk.text for _, chunk in batch])
+            await upsert_queue.put((batch, embeddings))
+        await upsert_queue.put(_DONE)
+
+    async def upsert():
+        nonlocal total_stored
+        while (item := await upsert_queue.get()) is not _DONE:
+            batch, embeddings = item
+            # One segment per document run within the batch
+            segments: list[tuple[_Document, list, list]] = []
+            for (doc, chunk), embedding in zip(batch, embeddings):
+                if not segments or segments[-1][0] is not doc:
+                    segments.append((doc, [], []))
+                segments[-1][1].append(chunk)
+                segments[-1][2].append(embedding)
+
+            await vector_store.upsert_many(
+                [(doc.content_id, doc.stored, seg_chunks, seg_embeddings) for doc, seg_chunks, seg_embeddings in segments],
+                wait=False,
+            )
+            for doc, seg_chunks, _ in segments:
+                for i, chunk in enumerate(seg_chunks, start=doc.stored):
+                    doc.lexical.add(i, chunk.text)
+                doc.spans.extend((chunk.start, chunk.end, chunk.page) for chunk in seg_chunks)
+                doc.stored += len(seg_chunks)
+            total_stored += len(batch)
+            metrics.CHUNKS_INGESTED.inc(len(batch))
+
+            # Documents whose chunking is over and whose chunks are all stored
+            for doc in docs:
+                if not doc.finished and doc.produced is not None and doc.stored == doc.produced:
+                    doc.finished = True
+                    finishing.append(asyncio.create_task(finish(doc)))
+
+            detail = f"{total_stored} chunks stored"
+            if len(docs) > 1:
+                detail = f"{sum(doc.finished for doc in docs)}/{len(docs)} documents, {detail}"
+            await job_queue.report_progress("ingesting", None, detail)
+
+    async def finish(doc: _Document):
+        if doc.error is None and doc.stored:
+            await asyncio.to_thread(document_store.save_content, doc.content_id, doc.chunker.text(), doc.spans)
+            await asyncio.to_thread(lexical_index.save, doc.content_id, doc.lexical)
+            # Confirmed readable before the caller marks the content as processed
+            await vector_store.wait_for_propagation([doc.content_id])
+        # Results generated from a previous version of this content are stale now
+        generation_cache.invalidate(doc.content_id)
+        answer_cache.invalidate(doc.content_id)
+        if on_document_done is not None:
+            await on_document_done(DocumentResult(doc.content_id, doc.stored, doc.error))
+
+    tasks = [asyncio.create_task(stage()) for stage in (produce, embed, upsert)]
+    try:
+        await asyncio.gather(*tasks)
+        # Documents without any chunk (empty or failed before the first one)
+        for doc in docs:
+            if not doc.finished:
+                doc.finished = True
+                finishing.append(asyncio.create_task(finish(doc)))
+        await asyncio.gather(*finishing)
+    except BaseException:
+        # One stage failed: stop the others so nothing is left blocked on a queue
+        for task in tasks + finishing:
+            task.cancel()
+        await asyncio.gather(*tasks, *finishing, return_exceptions=True)
+        raise
+
+    return [DocumentResult(doc.content_id, doc.stored, doc.error) for doc in docs]
@@ -0,0 +1,427 @@
+"""Durable background job queue.
+
+Jobs are stored in a SQLite file under ``DATA_DIR`` so they survive restarts,
+and are executed by a fixed-size pool of workers instead of FastAPI
+``BackgroundTasks``. Large inputs (e.g. uploaded PDFs) are spooled next to
+the database rather than kept in memory.
+
+Workers claim jobs with a lease that a heartbeat keeps extending while the
+handler runs; a job whose worker died (crash, restart) is picked up again
+once its lease expires. Every update a worker makes is conditional on still
+owning the lease, and a worker that lost it stops the job. Failed jobs are
+retried with exponential backoff and abandoned ones reclaimed, both up to
+``max_attempts``.
+
+Handlers are registered per job kind and receive ``(payload, blob)``. They
+can report stage-level progress with ``report_progress``.
+
+SQLite and blob file I/O runs in worker threads: claiming can wait up to
+the busy timeout for another process's write lock, and blobs can be large.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services import metrics, rate_limiter
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class _Handler:
+    run: object
+    on_failure: object | None = None
+
+
+_handlers: dict[str, _Handler] = {}
+# (job id, lease token) of the job running in the current task
+_current_job: contextvars.ContextVar[tuple[str, str] | None] = contextvars.ContextVar("current_job", default=None)
+
+_db: sqlite3.Connection | None = None
+_db_lock = threading.Lock()
+_wakeup: asyncio.Event | None = None
+_workers: list[asyncio.Task] = []
+
+
+def _data_dir() -> str:
+    return os.path.join(settings.DATA_DIR, "jobs")
+
+
+def _blob_path(job_id: str) -> str:
+    return os.path.join(_data_dir(), f"{job_id}.bin")
+
+
+def _get_db() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        os.makedirs(_data_dir(), exist_ok=True)
+        _db = sqlite3.connect(
+            os.path.join(_data_dir(), "jobs.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,  # explicit transactions for claiming
+            timeout=30,
+        )
+        _db.row_factory = sqlite3.Row
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                content_id TEXT,
+                payload TEXT NOT NULL,
+                has_blob INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                detail TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                error TEXT,
+                run_after REAL NOT NULL,
+                lease_until REAL,
+                lease_owner TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        columns = {row["name"] for row in _db.execute("PRAGMA table_info(jobs)")}
+        if "lease_owner" not in columns:
+            _db.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+        _db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, run_after)")
+    return _db
+
+
+def _execute(sql: str, params: tuple = ()) -> int:
+    """Run a write statement; returns the number of rows it changed."""
+    with _db_lock:
+        return _get_db().execute(sql, params).rowcount
+
+
+def register_handler(kind: str, handler, on_failure=None):
+    """Register the coroutine that runs jobs of a kind.
+
+    ``handler(payload, blob)`` does the work. ``on_failure(payload, error)``
+    is awaited once a job has exhausted all of its attempts.
+    """
+    _handlers[kind] = _Handler(run=handler, on_failure=on_failure)
+
+
+def _insert_job(job_id: str, kind: str, payload: dict, blob: bytes | None, content_id: str | None, max_attempts: int):
+    now = time.time()
+    if blob is not None:
+        os.makedirs(_data_dir(), exist_ok=True)
+        with open(_blob_path(job_id), "wb") as f:
+            f.write(blob)
+
+    _execute(
+        """INSERT INTO jobs (id, kind, content_id, payload, has_blob, status, stage,
+                             max_attempts, run_after, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            job_id,
+            kind,
+            content_id,
+            json.dumps(payload),
+            int(blob is not None),
+            QUEUED,
+            QUEUED,
+            max_attempts,
+            now,
+            now,
+            now,
+        ),
+    )
+
+
+async def enqueue(
+    kind: str,
+    payload: dict,
+    blob: bytes | None = None,
+    content_id: str | None = None,
+    max_attempts: int | None = None,
+) -> str:
+    """Persist a new job and wake up an idle worker. Returns the job id."""
+    job_id = str(uuid.uuid4())
+    await asyncio.to_thread(
+        _insert_job, job_id, kind, payload, blob, content_id, max_attempts or settings.JOB_MAX_ATTEMPTS
+    )
+    if _wakeup is not None:
+        _wakeup.set()
+    return job_id
+
+
+def _select_job(job_id: str) -> sqlite3.Row | None:
+    with _db_lock:
+        return _get_db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+async def get_job(job_id: str, include_payload: bool = False) -> dict | None:
+    """Return the job record (without payload unless asked for) or None."""
+    row = await asyncio.to_thread(_select_job, job_id)
+    if row is None:
+        return None
+    job = dict(row)
+    payload = job.pop("payload")
+    if include_payload:
+        job["payload"] = json.loads(payload)
+    job.pop("has_blob")
+    return job
+
+
+async def report_progress(stage: str, progress: float | None = None, detail: str | None = None):
+    """Record the current stage of the running job (no-op outside a job)."""
+    current = _current_job.get()
+    if current is None:
+        return
+    job_id, lease = current
+    now = time.time()
+    await asyncio.to_thread(
+        _execute,
+        """UPDATE jobs SET stage = ?, progress = COALESCE(?, progress), detail = ?,
+                           lease_until = ?, updated_at = ?
+           WHERE id = ? AND lease_owner = ?""",
+        (stage, progress, detail, now + settings.JOB_LEASE_SECONDS, now, job_id, lease),
+    )
+
+
+def _claim_next() -> tuple[sqlite3.Row, str] | None:
+    """Atomically claim the oldest runnable job (or one with an expired lease).
+
+    Returns the job and the lease token that its later updates must match.
+    """
+    now = time.time()
+    lease = str(uuid.uuid4())
+    with _db_lock:
+        db = _get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                """SELECT * FROM jobs
+                   WHERE (status = ? AND run_after <= ?)
+                      OR (status = ? AND lease_until < ? AND attempts < max_attempts)
+                   ORDER BY created_at LIMIT 1""",
+                (QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    """UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?,
+                                       lease_owner = ?, error = NULL, updated_at = ?
+                       WHERE id = ?""",
+                    (RUNNING, now + settings.JOB_LEASE_SECONDS, lease, now, row["id"]),
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+    return (row, lease) if row is not None else None
+
+
+def _claim_abandoned() -> list[tuple[sqlite3.Row, str]]:
+    """Claim expired jobs that have no attempts left, so they can be failed.
+
+    Their worker died on every attempt (e.g. the job crashes the process):
+    they are not reclaimed again.
+    """
+    now = time.time()
+    claimed = []
+    with _db_lock:
+        db = _get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (RUNNING, now),
+            ).fetchall()
+            for row in rows:
+                lease = str(uuid.uuid4())
+                db.execute(
+                    "UPDATE jobs SET lease_until = ?, lease_owner = ?, updated_at = ? WHERE id = ?",
+                    (now + settings.JOB_LEASE_SECONDS, lease, now, row["id"]),
+                )
+                claimed.append((row, lease))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+    return claimed
+
+
+async def _heartbeat(job_id: str, lease: str, task: asyncio.Task):
+    """Extend the lease while the handler runs; stop the handler if it was lost."""
+    lease_until = time.time() + settings.JOB_LEASE_SECONDS
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        now = time.time()
+        try:
+            renewed = await asyncio.to_thread(
+                _execute,
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (now + settings.JOB_LEASE_SECONDS, now, job_id, lease),
+            )
+        except Exception as e:
+            # Transient (e.g. database locked): keep the job while the lease still holds
+            if time.time() < lease_until:
+                print(f"Job {job_id} could not renew its lease, retrying: {e}")
+                continue
+            print(f"Job {job_id} lease expired before it could be renewed, stopping it: {e}")
+            task.cancel()
+            return
+        if not renewed:
+            print(f"Job {job_id} lost its lease to another worker, stopping it")
+            task.cancel()
+            return
+        lease_until = now + settings.JOB_LEASE_SECONDS
+
+
+async def _run_handler(handler: _Handler, payload: dict, blob: bytes | None, job_id: str, lease: str):
+    _current_job.set((job_id, lease))
+    # Background work yields provider quota to interactive requests
+    with rate_limiter.priority(rate_limiter.BATCH):
+        await handler.run(payload, blob)
+
+
+async def _fail(row: sqlite3.Row, lease: str, payload: dict, error: Exception):
+    """Mark a job as failed for good and run its failure hook."""
+    job_id = row["id"]
+    now = time.time()
+    failed = await asyncio.to_thread(
+        _execute,
+        """UPDATE jobs SET status = ?, stage = ?, error = ?, lease_until = NULL, updated_at = ?
+           WHERE id = ? AND lease_owner = ?""",
+        (FAILED, FAILED, str(error), now, job_id, lease),
+    )
+    if not failed:
+        return  # Another worker owns the job now
+    await asyncio.to_thread(_remove_blob, job_id)
+    handler = _handlers.get(row["kind"])
+    if handler is not None and handler.on_failure is not None:
+        try:
+            await handler.on_failure(payload, error)
+        except Exception as hook_error:
+            print(f"Job {job_id} failure hook raised: {hook_error}")
+
+
+async def _run_job(row: sqlite3.Row, lease: str):
+    job_id = row["id"]
+    attempt = row["attempts"] + 1
+    payload = json.loads(row["payload"])
+    handler = _handlers.get(row["kind"])
+    lease_lost = False
+
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind '{row['kind']}'")
+
+        blob = await asyncio.to_thread(_read_blob, job_id) if row["has_blob"] else None
+
+        task = asyncio.create_task(_run_handler(handler, payload, blob, job_id, lease))
+        heartbeat = asyncio.create_task(_heartbeat(job_id, lease, task))
+        try:
+            await task
+        finally:
+            lease_lost = heartbeat.done()
+            heartbeat.cancel()
+
+    except asyncio.CancelledError:
+        if lease_lost:
+            return  # Stopped by the heartbeat: the new owner runs the job
+        # Worker shutdown: hand the job back without spending an attempt
+        await asyncio.to_thread(
+            _execute,
+            """UPDATE jobs SET status = ?, attempts = attempts - 1, lease_until = NULL, updated_at = ?
+               WHERE id = ? AND lease_owner = ?""",
+            (QUEUED, time.time(), job_id, lease),
+        )
+        raise
+
+    except Exception as e:
+        now = time.time()
+        if attempt < row["max_attempts"]:
+            delay = settings.JOB_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+            print(f"Job {job_id} failed (attempt {attempt}/{row['max_attempts']}), retrying in {delay}s: {e}")
+            metrics.RETRIES.inc(provider="job_queue", operation=row["kind"])
+            await asyncio.to_thread(
+                _execute,
+                """UPDATE jobs SET status = ?, stage = ?, error = ?, run_after = ?,
+                                   lease_until = NULL, updated_at = ?
+                   WHERE id = ? AND lease_owner = ?""",
+                (QUEUED, "retrying", str(e), now + delay, now, job_id, lease),
+            )
+            return
+
+        print(f"CRITICAL ERROR: Job {job_id} failed after {attempt} attempts: {e}")
+        await _fail(row, lease, payload, e)
+        return
+
+    now = time.time()
+    succeeded = await asyncio.to_thread(
+        _execute,
+        """UPDATE jobs SET status = ?, stage = ?, progress = 1, lease_until = NULL, updated_at = ?
+           WHERE id = ? AND lease_owner = ?""",
+        (SUCCEEDED, SUCCEEDED, now, job_id, lease),
+    )
+    if succeeded:
+        await asyncio.to_thread(_remove_blob, job_id)
+
+
+def _read_blob(job_id: str) -> bytes:
+    with open(_blob_path(job_id), "rb") as f:
+        return f.read()
+
+
+def _remove_blob(job_id: str):
+    try:
+        os.remove(_blob_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+async def _worker_loop(worker_id: int):
+    while True:
+        try:
+            for row, lease in await asyncio.to_thread(_claim_abandoned):
+                print(f"CRITICAL ERROR: Job {row['id']} lost its worker on all {row['attempts']} attempts")
+                await _fail(row, lease, json.loads(row["payload"]), RuntimeError("Worker stopped while running the job"))
+            claimed = await asyncio.to_thread(_claim_next)
+        except sqlite3.OperationalError as e:
+            # Another process holds the write lock; try again shortly
+            print(f"Job worker {worker_id} could not claim a job: {e}")
+            claimed = None
+
+        if claimed is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(*claimed)
+
+
+async def start_workers(concurrency: int | None = None):
+    """Start the worker pool on the running event loop."""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for worker_id in range(concurrency or settings.JOB_WORKER_CONCURRENCY):
+        _workers.append(asyncio.create_task(_worker_loop(worker_id)))
+
+
+async def stop_workers():
+    """Cancel the worker pool; in-flight jobs are returned to the queue."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
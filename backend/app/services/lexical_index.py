@@ -0,0 +1,116 @@
+"""Per-content BM25 inverted index.
+
+Built during ingestion from the same chunks that are embedded, and saved as
+``DATA_DIR/lexical/<content_id>.json``. Exact-term questions (definitions,
+formula or API names, ...) are matched much better lexically than by vector
+similarity, and a lexical lookup needs no embedding at all.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from app.config import settings
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    """a an and are as at be by can do does for from how i in is it its me of on or
+    please tell that the their this to was what when where which who why will with
+    explain describe define definition meaning mean give about you your""".split()
+)
+
+# Loaded indexes, validated against the file's modification time
+_MAX_CACHED_INDEXES = 64
+_indexes: OrderedDict[str, tuple[int, "LexicalIndex"]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 postings of one content: term -> [(chunk_index, term frequency), ...]."""
+
+    def __init__(self, postings: dict[str, list[list[int]]] | None = None, lengths: dict[int, int] | None = None):
+        self.postings = postings or {}
+        self.lengths = lengths or {}
+
+    def add(self, chunk_index: int, text: str):
+        tokens = tokenize(text)
+        self.lengths[chunk_index] = len(tokens)
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, []).append([chunk_index, count])
+
+    def search(self, query: str, top_k: int = 5) -> list[tuple[int, float, int]]:
+        """Return (chunk_index, score, matched query terms) for the best chunks."""
+        if not self.lengths:
+            return []
+        total = len(self.lengths)
+        average_length = sum(self.lengths.values()) / total
+        scores: dict[int, float] = {}
+        matched: Counter = Counter()
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_index, frequency in postings:
+                length_norm = K1 * (1 - B + B * self.lengths[chunk_index] / average_length)
+                scores[chunk_index] = scores.get(chunk_index, 0.0) + idf * frequency * (K1 + 1) / (frequency + length_norm)
+                matched[chunk_index] += 1
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(chunk_index, score, matched[chunk_index]) for chunk_index, score in best]
+
+    def to_json(self) -> dict:
+        return {"lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "LexicalIndex":
+        return cls(data["postings"], {int(index): length for index, length in data["lengths"].items()})
+
+
+def _index_path(content_id: str) -> str:
+    return os.path.join(settings.DATA_DIR, "lexical", f"{content_id}.json")
+
+
+def save(content_id: str, index: LexicalIndex):
+    path = _index_path(content_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_json(), f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load(content_id: str) -> LexicalIndex | None:
+    """Return the content's index, re-reading it if another process rewrote it."""
+    path = _index_path(content_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        cached = _indexes.get(content_id)
+        if cached is not None and cached[0] == mtime:
+            _indexes.move_to_end(content_id)
+            return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        index = LexicalIndex.from_json(json.load(f))
+
+    with _lock:
+        _indexes[content_id] = (mtime, index)
+        _indexes.move_to_end(content_id)
+        while len(_indexes) > _MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,371 @@
+"""Embedded vector index used as an in-process alternative to Pinecone.
+
+Vectors are kept in NumPy arrays partitioned by ``content_id``. Each
+partition is persisted under ``DATA_DIR/vectors/<content_id>/`` as a
+``.npy`` matrix (opened memory-mapped) plus a small JSON file holding the
+ids and metadata, so restarts don't need to re-embed anything.
+
+With ``LOCAL_VECTOR_PRECISION`` set to ``float16`` / ``int8`` (and optionally
+``LOCAL_VECTOR_SEARCH_DIM`` for Matryoshka truncation), queries scan a
+compact in-memory copy of the unit-normalized vectors instead, then re-score
+a shortlist exactly against the memory-mapped float32 rows. The compact copy
+is derived when a partition is loaded, so the on-disk format is unchanged.
+Compact rows are widened to float32 one small block at a time while
+scoring, so a query never materializes a float32 copy of the matrix.
+"""
+import asyncio
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.config import settings
+from app.services import document_store
+
+_partitions: dict[str, "_Partition"] = {}
+_lock = threading.Lock()
+
+# Scratch buffer for widening compact rows to float32 during a scan (a block
+# that stays in cache; the matmul itself runs in BLAS)
+_SCORE_BLOCK_BYTES = 1 << 20
+
+# Largest working memory used by a single partition query (see ``stats``)
+_peak_query_bytes = 0
+
+
+def _root_dir() -> str:
+    return os.path.join(settings.DATA_DIR, "vectors")
+
+
+def _partition_dir(content_id: str) -> str:
+    if not content_id or os.sep in content_id or "/" in content_id or content_id in (".", ".."):
+        raise ValueError(f"Invalid content_id for local vector store: {content_id!r}")
+    return os.path.join(_root_dir(), content_id)
+
+
+def _content_id_from_vector_id(vector_id: str) -> str:
+    # Vector ids follow the Pinecone layout: "<content_id>_<chunk_index>"
+    return vector_id.rsplit("_", 1)[0]
+
+
+class _SearchIndex:
+    """Reduced-precision (and optionally truncated) unit vectors for first-pass search."""
+
+    def __init__(self, vectors: np.ndarray, precision: str, dim: int):
+        self.dim = dim if 0 < dim < vectors.shape[1] else vectors.shape[1]
+        rows = np.asarray(vectors[:, : self.dim], dtype=np.float32)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        rows = rows / norms
+        self.scales = None
+        if precision == "int8":
+            # Symmetric per-row scale: row ~= int8 values * scale
+            scales = np.abs(rows).max(axis=1)
+            scales[scales == 0] = 1.0
+            self.matrix = np.round(rows / scales[:, None] * 127).astype(np.int8)
+            self.scales = (scales / 127).astype(np.float32)
+        elif precision == "float16":
+            self.matrix = rows.astype(np.float16)
+        elif precision == "float32":
+            self.matrix = rows
+        else:
+            raise ValueError(f"Unknown LOCAL_VECTOR_PRECISION '{precision}'. Expected float32, float16 or int8")
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @property
+    def block_rows(self) -> int:
+        return max(1, _SCORE_BLOCK_BYTES // (self.dim * 4))
+
+    @property
+    def query_bytes(self) -> int:
+        """Working memory of ``scores``: the scores plus one float32 block."""
+        scratch = 0 if self.matrix.dtype == np.float32 else min(self.block_rows, len(self.matrix)) * self.dim * 4
+        return len(self.matrix) * 4 + scratch
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate cosine scores of every row against ``query``."""
+        query = query[: self.dim]
+        query = query / (float(np.linalg.norm(query)) or 1.0)
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        block_rows = self.block_rows
+        scratch = np.empty((min(block_rows, len(self.matrix)), self.dim), dtype=np.float32)
+        for start in range(0, len(self.matrix), block_rows):
+            rows = self.matrix[start : start + block_rows]
+            block = scratch[: len(rows)]
+            np.copyto(block, rows)
+            np.matmul(block, query, out=scores[start : start + len(rows)])
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class _Partition:
+    """All vectors of one content_id, backed by a memory-mapped .npy file."""
+
+    def __init__(self, content_id: str):
+        self.content_id = content_id
+        self.path = _partition_dir(content_id)
+        self.generation = 0
+        self.ids: list[str] = []
+        self.metadata: list[dict] = []
+        self.rows: dict[str, int] = {}
+        self.vectors: np.ndarray | None = None
+        self.norms: np.ndarray | None = None
+        self.search: _SearchIndex | None = None
+        self._load()
+
+    def _vectors_file(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.npy")
+
+    def _load(self):
+        index_file = os.path.join(self.path, "index.json")
+        if not os.path.exists(index_file):
+            return
+        with open(index_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.generation = state["generation"]
+        self.ids = state["ids"]
+        self.metadata = state["metadata"]
+        self.rows = {vid: row for row, vid in enumerate(self.ids)}
+        self._attach(np.load(self._vectors_file(self.generation), mmap_mode="r"))
+
+    def _attach(self, vectors: np.ndarray):
+        self.vectors = vectors
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1.0
+        self.norms = norms
+        self.search = None
+        if settings.LOCAL_VECTOR_PRECISION != "float32" or settings.LOCAL_VECTOR_SEARCH_DIM:
+            self.search = _SearchIndex(vectors, settings.LOCAL_VECTOR_PRECISION, settings.LOCAL_VECTOR_SEARCH_DIM)
+
+    def upsert(self, vectors: list[dict]):
+        """Insert or overwrite vectors, then persist a new generation to disk."""
+        dim = len(vectors[0]["values"])
+        if self.vectors is not None and self.vectors.shape[1] != dim:
+            raise ValueError(
+                f"Vector dimension {dim} does not match existing partition dimension {self.vectors.shape[1]}"
+            )
+
+        ids = list(self.ids)
+        metadata = list(self.metadata)
+        rows = dict(self.rows)
+        new_rows = [vec["id"] for vec in vectors if vec["id"] not in rows]
+        for vid in new_rows:
+            rows[vid] = len(ids)
+            ids.append(vid)
+            metadata.append({})
+
+        matrix = np.zeros((len(ids), dim), dtype=np.float32)
+        if self.vectors is not None:
+            matrix[: len(self.ids)] = self.vectors
+        for vec in vectors:
+            row = rows[vec["id"]]
+            matrix[row] = np.asarray(vec["values"], dtype=np.float32)
+            metadata[row] = vec.get("metadata", {})
+
+        # Write to a fresh generation file: replacing a file that is still
+        # memory-mapped fails on Windows, so old generations are removed after.
+        os.makedirs(self.path, exist_ok=True)
+        generation = self.generation + 1
+        np.save(self._vectors_file(generation), matrix)
+        index_file = os.path.join(self.path, "index.json")
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "ids": ids, "metadata": metadata}, f)
+        os.replace(tmp_file, index_file)
+
+        old_generation = self.generation
+        self.generation = generation
+        self.ids = ids
+        self.metadata = metadata
+        self.rows = rows
+        self._attach(np.load(self._vectors_file(generation), mmap_mode="r"))
+
+        if old_generation:
+            try:
+                os.remove(self._vectors_file(old_generation))
+            except OSError:
+                pass
+
+    def query(self, query_embedding: list[float], top_k: int) -> list[tuple[int, float]]:
+        """Return (row, cosine score) pairs for the top_k most similar vectors."""
+        global _peak_query_bytes
+        if self.vectors is None or not self.ids:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query)) or 1.0
+        if self.search is None:
+            scores = (self.vectors @ query) / (self.norms * query_norm)
+            _peak_query_bytes = max(_peak_query_bytes, scores.nbytes)
+            return [(int(row), float(scores[row])) for row in _top(scores, top_k)]
+
+        # First pass on the compact vectors, then exact float32 scores for the shortlist
+        approximate = self.search.scores(query)
+        if settings.LOCAL_VECTOR_RESCORE_FACTOR <= 0:
+            _peak_query_bytes = max(_peak_query_bytes, self.search.query_bytes)
+            return [(int(row), float(approximate[row])) for row in _top(approximate, top_k)]
+        shortlist = np.sort(_top(approximate, top_k * settings.LOCAL_VECTOR_RESCORE_FACTOR))
+        rows = np.asarray(self.vectors[shortlist])
+        exact = (rows @ query) / (self.norms[shortlist] * query_norm)
+        _peak_query_bytes = max(_peak_query_bytes, self.search.query_bytes + rows.nbytes)
+        return [(int(shortlist[i]), float(exact[i])) for i in _top(exact, top_k)]
+
+
+def _get_partition(content_id: str, create: bool = False) -> _Partition | None:
+    partition = _partitions.get(content_id)
+    if partition is not None:
+        return partition
+    with _lock:
+        partition = _partitions.get(content_id)
+        if partition is None:
+            partition = _Partition(content_id)
+            if partition.vectors is None and not create:
+                return None
+            _partitions[content_id] = partition
+    return partition
+
+
+async def upsert_chunks(
+    content_id: str,
+    chunks: list,
+    embeddings: list[list[float]],
+    start_index: int = 0,
+    wait: bool = True,
+) -> int:
+    """Store chunk vectors for a content_id (same ids and metadata as Pinecone)."""
+    return await upsert_many([(content_id, start_index, chunks, embeddings)], wait)
+
+
+async def upsert_many(segments: list[tuple[str, int, list, list[list[float]]]], wait: bool = True) -> int:
+    """Store chunk runs of several contents, one partition write per content."""
+    by_content: dict[str, list[dict]] = {}
+    for content_id, start_index, chunks, embeddings in segments:
+        by_content.setdefault(content_id, []).extend(
+            {
+                "id": f"{content_id}_{i}",
+                "values": embedding,
+                "metadata": document_store.chunk_metadata(content_id, i, chunk),
+            }
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings), start=start_index)
+        )
+
+    stored = 0
+    for content_id, vectors in by_content.items():
+        if not vectors:
+            continue
+        partition = _get_partition(content_id, create=True)
+        with _lock:
+            partition.upsert(vectors)
+        stored += len(vectors)
+
+    # Writes are visible immediately, no propagation wait needed.
+    return stored
+
+
+async def wait_for_propagation(content_ids: list[str] | None = None):
+    """Local writes are visible immediately."""
+
+
+async def query_similar(
+    query_embedding: list[float], content_id: str | list[str], top_k: int = 5
+) -> list[dict]:
+    """Return the top_k most similar chunks within one or several contents."""
+    content_ids = [content_id] if isinstance(content_id, str) else content_id
+    matches = []
+    for cid in content_ids:
+        partition = _get_partition(cid)
+        if partition is None:
+            continue
+        matches.extend((score, cid, partition, row) for row, score in partition.query(query_embedding, top_k))
+
+    # Global top_k across the partitions
+    matches.sort(key=lambda match: match[0], reverse=True)
+    matches = matches[:top_k]
+    texts = await asyncio.to_thread(
+        document_store.chunk_texts, [partition.metadata[row] for _, _, partition, row in matches]
+    )
+    return [
+        {
+            "text": text,
+            "chunk_index": partition.metadata[row].get("chunk_index", 0),
+            "content_id": cid,
+            "score": score,
+        }
+        for (score, cid, partition, row), text in zip(matches, texts)
+    ]
+
+
+async def fetch(ids: list[str]) -> dict[str, dict]:
+    """Fetch vectors by id. Missing ids are omitted from the result."""
+    found = {}
+    for vid in ids:
+        partition = _get_partition(_content_id_from_vector_id(vid))
+        if partition is None or vid not in partition.rows:
+            continue
+        row = partition.rows[vid]
+        found[vid] = {
+            "values": partition.vectors[row].tolist(),
+            "metadata": partition.metadata[row],
+        }
+    return found
+
+
+async def fetch_all_chunks(content_id: str, chunks_count: int | None = None) -> list[str]:
+    """Fetch all chunk texts of a content ordered by chunk index."""
+    partition = _get_partition(content_id)
+    if partition is None:
+        return []
+
+    if chunks_count and chunks_count > 0:
+        ids = [f"{content_id}_{i}" for i in range(chunks_count)]
+        return await asyncio.to_thread(
+            document_store.chunk_texts,
+            [partition.metadata[partition.rows[vid]] for vid in ids if vid in partition.rows],
+        )
+
+    ordered = sorted(partition.metadata, key=lambda m: m.get("chunk_index", 0))
+    return await asyncio.to_thread(document_store.chunk_texts, ordered)
+
+
+def reset_peak_query_bytes():
+    global _peak_query_bytes
+    _peak_query_bytes = 0
+
+
+def stats() -> dict:
+    """Memory used by the loaded partitions' search vectors vs. plain float32.
+
+    ``peak_query_bytes`` is the largest working memory of one partition scan
+    so far (scores, conversion block and re-scored rows).
+    """
+    vectors = 0
+    float32_bytes = 0
+    search_bytes = 0
+    for partition in list(_partitions.values()):
+        if partition.vectors is None:
+            continue
+        size = partition.vectors.shape[0] * partition.vectors.shape[1] * 4
+        vectors += partition.vectors.shape[0]
+        float32_bytes += size
+        search_bytes += partition.search.nbytes if partition.search is not None else size
+    return {
+        "partitions": len(_partitions),
+        "vectors": vectors,
+        "float32_bytes": float32_bytes,
+        "search_bytes": search_bytes,
+        "peak_query_bytes": _peak_query_bytes,
+    }
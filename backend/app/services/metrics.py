@@ -0,0 +1,181 @@
+"""In-process metrics with Prometheus text exposition.
+
+- ``timed(provider, operation)`` measures a provider call: it feeds the
+  ``provider_request_duration_seconds`` histogram and the current request's
+  ``Server-Timing`` header.
+- ``counter(...)`` / ``histogram(...)`` return named metrics (created once).
+- ``render()`` produces the ``/api/metrics`` payload; component stats (caches,
+  batcher, ...) are added as gauges by the caller.
+
+Metrics are per process: with several uvicorn workers each one reports its
+own values.
+"""
+import contextvars
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_metrics: dict[str, "_Metric"] = {}
+_request_timings: contextvars.ContextVar[dict | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        """Exposition lines of every series (without HELP / TYPE)."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        with _lock:
+            self._values[tuple(sorted(labels.items()))] += amount
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., sum, count]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, series in self._series.items():
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+def _get_or_create(cls, name: str, help: str, **kwargs):
+    metric = _metrics.get(name)
+    if metric is None:
+        with _lock:
+            metric = _metrics.get(name)
+            if metric is None:
+                metric = _metrics[name] = cls(name, help, **kwargs)
+    return metric
+
+
+def counter(name: str, help: str) -> Counter:
+    return _get_or_create(Counter, name, help)
+
+
+def histogram(name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help, buckets=buckets)
+
+
+PROVIDER_LATENCY = histogram(
+    "provider_request_duration_seconds", "Latency of calls to external providers and stores"
+)
+PROVIDER_ERRORS = counter("provider_errors_total", "Failed provider calls")
+RATE_LIMITED = counter("provider_rate_limited_total", "Provider responses rejected with 429 / rate limit")
+RETRIES = counter("provider_retries_total", "Retried provider calls")
+LLM_TOKENS = counter("llm_tokens_total", "LLM tokens used, by provider, model and kind (prompt/completion)")
+CHUNKS_INGESTED = counter("ingested_chunks_total", "Chunks embedded and stored by ingestion jobs")
+HTTP_LATENCY = histogram("http_request_duration_seconds", "API request latency (time to response headers)")
+
+
+@contextmanager
+def timed(provider: str, operation: str):
+    """Time a provider call for the latency histogram and Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        PROVIDER_ERRORS.inc(provider=provider, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        PROVIDER_LATENCY.observe(elapsed, provider=provider, operation=operation)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[f"{provider}_{operation}"] = timings.get(f"{provider}_{operation}", 0.0) + elapsed
+
+
+def start_request_timings() -> dict:
+    """Start collecting Server-Timing entries for the current request."""
+    timings: dict = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: dict, total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def render(gauges: dict[str, dict] | None = None) -> str:
+    """Render all metrics, plus numeric component stats as ``app_<component>_<key>`` gauges."""
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+
+    for component, stats in (gauges or {}).items():
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = _NAME_RE.sub("_", f"app_{component}_{key}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+"""Multi-core PDF text extraction.
+
+PyPDF2 is pure Python: extracting a large PDF page by page uses one core and,
+even from a worker thread, holds the GIL long enough to slow the event loop
+down. Large PDFs are therefore sharded into page ranges and extracted by a
+process pool. The uploaded bytes are spooled once to a temporary file that
+every worker opens itself, so they are never pickled to the workers.
+
+Pages come back in order as (page_number, text), a bounded number of ranges
+ahead of the consumer, so memory stays flat like the sequential extractor.
+Small PDFs skip the pool (process round trips would cost more than they save).
+If a worker dies (out of memory, crash on a malformed file) the pool is
+replaced and the remaining ranges are retried once on the new one.
+
+This module is imported by the pool's worker processes, so it keeps its
+imports light.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from contextlib import closing
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyPDF2 import PdfReader
+
+from app.config import settings
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _worker_count() -> int:
+    return settings.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the extraction process pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads (event loop, provider pool) is unsafe
+        _pool = ProcessPoolExecutor(max_workers=_worker_count(), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next ``get_pool`` starts a fresh one."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    """Stop the worker processes (called from the app lifespan)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_range(path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """Worker: (page_number, text) of pages ``start``..``end - 1`` that have text."""
+    reader = PdfReader(path)
+    pages = []
+    for index in range(start, end):
+        page_text = reader.pages[index].extract_text()
+        if page_text:
+            pages.append((index + 1, page_text))
+    return pages
+
+
+def _iter_sequential(reader: PdfReader) -> Iterator[tuple[int, str]]:
+    for page_number, page in enumerate(reader.pages, start=1):
+        page_text = page.extract_text()
+        if page_text:
+            yield page_number, page_text
+
+
+def iter_pdf_pages(file_bytes: bytes) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) for each PDF page that has text, in page order.
+
+    Blocking: consume it from a thread (the ingestion pipeline does).
+    """
+    reader = PdfReader(io.BytesIO(file_bytes))
+    page_count = len(reader.pages)
+    if settings.PDF_EXTRACT_WORKERS < 0 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        yield from _iter_sequential(reader)
+        return
+
+    # 1. Spool the bytes once; workers read the file (shared through the page cache)
+    spool_dir = os.path.join(settings.DATA_DIR, "tmp")
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=spool_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(file_bytes)
+
+    # 2. Shard page ranges over the pool; a broken pool is replaced once
+    ranges = deque(
+        (start, min(start + settings.PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, settings.PDF_PAGES_PER_TASK)
+    )
+    retried = False
+    try:
+        while ranges:
+            pool = get_pool()
+            try:
+                with closing(_extract_ranges(pool, path, list(ranges))) as extracted:
+                    for pages in extracted:
+                        ranges.popleft()
+                        yield from pages
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                if retried:
+                    raise
+                retried = True
+                print(f"PDF extraction worker died, retrying {len(ranges)} page ranges on a new pool")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _extract_ranges(pool: ProcessPoolExecutor, path: str, ranges: list[tuple[int, int]]) -> Iterator[list]:
+    """Pages of each range, in order, with a bounded number of ranges in flight."""
+    pending = iter(ranges)
+    in_flight = deque()
+    try:
+        for start, end in pending:
+            in_flight.append(pool.submit(_extract_range, path, start, end))
+            if len(in_flight) >= 2 * _worker_count():
+                break
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(pending, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_range, path, *next_range))
+            # 3. Results are consumed in submission order, so pages stay in order
+            yield pages
+    finally:
+        # Also runs when the consumer stops early (chunk limit, failure)
+        for future in in_flight:
+            future.cancel()
@@ -1,105 +1,193 @@
-from pinecone import Pinecone
+import asyncio
+import time
+
+from pinecone import PineconeAsyncio
 
 from app.config import settings
+from app.services import document_store, provider_io
+
+# Async Pinecone client (calls never block the event loop): the index handle
+# is opened on first use and closed on shutdown.
+_client: PineconeAsyncio | None = None
+_index = None
+
+# Pinecone is eventually consistent: ids of the last upsert request of each
+# content, until ``wait_for_propagation`` has seen them readable. Contents are
+# only marked as processed after that, so readers can trust their status.
+_unconfirmed: dict[str, list[str]] = {}
+
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-index = pc.Index(settings.PINECONE_INDEX_NAME)
+async def get_index():
+    global _client, _index
+    if _index is None:
+        client = PineconeAsyncio(api_key=settings.PINECONE_API_KEY)
+        index = await client.index(settings.PINECONE_INDEX_NAME)
+        if _index is None:
+            _client, _index = client, index
+            provider_io.on_shutdown(close_index)
+        else:
+            # Another request opened the index meanwhile
+            await index.close()
+            await client.close()
+    return _index
+
+
+async def close_index():
+    """Close the connection pools of the index handle and the client."""
+    global _client, _index
+    if _index is not None:
+        await _index.close()
+        _index = None
+    if _client is not None:
+        await _client.close()
+        _client = None
 
 
 async def upsert_chunks(
-    content_id: str, chunks: list[str], embeddings: list[list[float]]
+    content_id: str,
+    chunks: list,
+    embeddings: list[list[float]],
+    start_index: int = 0,
+    wait: bool = True,
 ) -> int:
-    """Upsert chunk vectors into Pinecone with metadata."""
+    """Upsert chunk vectors into Pinecone with metadata.
+
+    Chunks are ``ChunkSpan``s (metadata keeps their offsets, see
+    ``document_store``) or plain strings (stored as ``text``). ``start_index``
+    offsets the chunk indices so a document can be written in several
+    batches; pass ``wait=False`` for all but the final batch.
+    """
+    return await upsert_many([(content_id, start_index, chunks, embeddings)], wait)
+
+
+async def upsert_many(segments: list[tuple[str, int, list, list[list[float]]]], wait: bool = True) -> int:
+    """Upsert chunk runs of several contents together.
+
+    Each segment is ``(content_id, start_index, chunks, embeddings)``; all
+    vectors go out in shared requests instead of one loop per content.
+    """
     vectors = []
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-        vectors.append(
-            {
-                "id": f"{content_id}_{i}",
-                "values": embedding,
-                "metadata": {
-                    "content_id": content_id,
-                    "chunk_index": i,
-                    "text": chunk,
-                },
-            }
-        )
+    for content_id, start_index, chunks, embeddings in segments:
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings), start=start_index):
+            vectors.append(
+                {
+                    "id": f"{content_id}_{i}",
+                    "values": embedding,
+                    "metadata": document_store.chunk_metadata(
+                        content_id, i, chunk, include_text=settings.PINECONE_METADATA_TEXT
+                    ),
+                }
+            )
 
     # Upsert in batches of 100
+    index = await get_index()
     batch_size = 100
     for i in range(0, len(vectors), batch_size):
         batch = vectors[i : i + batch_size]
-        index.upsert(vectors=batch)
+        await index.upsert(vectors=batch)
+        # The last request of each content is its visibility watermark
+        last_ids: dict[str, list[str]] = {}
+        for vector in batch:
+            last_ids.setdefault(vector["metadata"]["content_id"], []).append(vector["id"])
+        _unconfirmed.update(last_ids)
 
-    # Ensure Pinecone index propagates before we mark as 'processed'
-    import asyncio
-    await asyncio.sleep(2)
+    if wait:
+        await wait_for_propagation([content_id for content_id, *_ in segments])
 
     return len(vectors)
 
 
+async def wait_for_propagation(content_ids: list[str] | None = None):
+    """Wait until the last writes of the given contents (default: all) are readable.
+
+    Polls a fetch of the last written ids with exponential backoff, so small
+    documents are confirmed within milliseconds instead of a fixed sleep.
+    Raises TimeoutError if they are still not visible after
+    ``PINECONE_VISIBILITY_TIMEOUT`` seconds.
+    """
+    pending = list(_unconfirmed) if content_ids is None else [cid for cid in content_ids if cid in _unconfirmed]
+    ids = {vid for content_id in pending for vid in _unconfirmed[content_id]}
+    deadline = time.monotonic() + settings.PINECONE_VISIBILITY_TIMEOUT
+    delay = settings.PINECONE_VISIBILITY_INITIAL_DELAY
+
+    while ids:
+        results = await (await get_index()).fetch(ids=list(ids))
+        ids -= set(results.vectors)
+        if not ids:
+            break
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Pinecone writes not visible after {settings.PINECONE_VISIBILITY_TIMEOUT}s: {len(ids)} ids")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.PINECONE_VISIBILITY_MAX_DELAY)
+
+    for content_id in pending:
+        _unconfirmed.pop(content_id, None)
+
+
 async def query_similar(
-    query_embedding: list[float], content_id: str, top_k: int = 5
+    query_embedding: list[float], content_id: str | list[str], top_k: int = 5
 ) -> list[dict]:
-    """Query Pinecone for similar chunks within a specific content."""
-    results = index.query(
+    """Query Pinecone for similar chunks within one or several contents (single query)."""
+    if isinstance(content_id, str):
+        content_filter = {"$eq": content_id}
+    else:
+        content_filter = {"$in": list(content_id)}
+    index = await get_index()
+    results = await index.query(
         vector=query_embedding,
         top_k=top_k,
         include_metadata=True,
-        filter={"content_id": {"$eq": content_id}},
+        filter={"content_id": content_filter},
     )
 
+    texts = await asyncio.to_thread(document_store.chunk_texts, [match.metadata for match in results.matches])
     return [
         {
-            "text": match.metadata.get("text", ""),
-            "chunk_index": match.metadata.get("chunk_index", 0),
+            "text": text,
+            "chunk_index": int(match.metadata.get("chunk_index", 0)),
+            "content_id": match.metadata.get("content_id"),
             "score": match.score,
         }
-        for match in results.matches
+        for match, text in zip(results.matches, texts)
     ]
 
 
+async def fetch(ids: list[str]) -> dict[str, dict]:
+    """Fetch vectors by id. Missing ids are omitted from the result."""
+    found = {}
+    index = await get_index()
+    batch_size = 100
+    for i in range(0, len(ids), batch_size):
+        results = await index.fetch(ids=ids[i : i + batch_size])
+        for vid, vector in results.vectors.items():
+            found[vid] = {"values": vector.values, "metadata": vector.metadata}
+    return found
+
+
 async def fetch_all_chunks(content_id: str, chunks_count: int | None = None) -> list[str]:
-    """Fetch all chunks with a retry policy for maximum reliability."""
-    import asyncio
-    
-    max_retries = 3
-    retry_delay = 1.5
-
-    for attempt in range(max_retries):
-        all_texts = []
-        
-        # Path A: Direct ID Fetch (Preferred)
-        if chunks_count and chunks_count > 0:
-            ids = [f"{content_id}_{i}" for i in range(chunks_count)]
-            batch_size = 100
-            for i in range(0, len(ids), batch_size):
-                batch_ids = ids[i : i + batch_size]
-                results = index.fetch(ids=batch_ids)
-                for vid in batch_ids:
-                    if vid in results.vectors:
-                        all_texts.append(results.vectors[vid].metadata.get("text", ""))
-        
-        # Path B: Fallback (Vector Query)
-        if not all_texts:
-            dummy_vector = [0.0] * 768
-            results = index.query(
-                vector=dummy_vector,
-                top_k=1000,
-                include_metadata=True,
-                filter={"content_id": {"$eq": content_id}},
-            )
-            sorted_matches = sorted(
-                results.matches, key=lambda m: m.metadata.get("chunk_index", 0)
-            )
-            all_texts = [match.metadata.get("text", "") for match in sorted_matches]
-
-        if all_texts:
-            return all_texts
-            
-        # If we reach here, we found nothing. Wait and retry.
-        if attempt < max_retries - 1:
-            print(f"DEBUG: Pinecone fetch empty, retrying in {retry_delay}s (Attempt {attempt+1}/{max_retries})")
-            await asyncio.sleep(retry_delay)
-    
-    return []
+    """Fetch all chunks of a content ordered by chunk index.
+
+    Contents are marked as processed only once their vectors are readable,
+    so a single pass of direct id fetches is enough.
+    """
+    # Path A: Direct ID Fetch (Preferred)
+    if chunks_count and chunks_count > 0:
+        ids = [f"{content_id}_{i}" for i in range(chunks_count)]
+        vectors = await fetch(ids)
+        return await asyncio.to_thread(
+            document_store.chunk_texts, [vectors[vid]["metadata"] for vid in ids if vid in vectors]
+        )
+
+    # Path B: Fallback for records without a chunk count (Vector Query)
+    dummy_vector = [0.0] * 768
+    index = await get_index()
+    results = await index.query(
+        vector=dummy_vector,
+        top_k=1000,
+        include_metadata=True,
+        filter={"content_id": {"$eq": content_id}},
+    )
+    sorted_matches = sorted(
+        results.matches, key=lambda m: m.metadata.get("chunk_index", 0)
+    )
+    return await asyncio.to_thread(document_store.chunk_texts, [match.metadata for match in sorted_matches])
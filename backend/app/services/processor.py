@@ -1,9 +1,18 @@
-import io
+import bisect
+import hashlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 
 from youtube_transcript_api import YouTubeTranscriptApi
-from PyPDF2 import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from app.config import settings
+from app.services import pdf_extractor
+
+# Chunking parameters; part of the content fingerprint since other values give other chunks
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 250
+
 
 def extract_video_id(url: str) -> str:
     """Extract the video ID from a YouTube URL."""
@@ -19,6 +28,24 @@ def extract_video_id(url: str) -> str:
     raise ValueError(f"Could not extract video ID from URL: {url}")
 
 
+def fingerprint(source_key: str) -> str:
+    """Dedupe key of an input: the same source, chunked and embedded the same way."""
+    key = f"{source_key}|chunks={CHUNK_SIZE}/{CHUNK_OVERLAP}|model={settings.EMBEDDING_MODEL_NAME}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def pdf_fingerprint(file_bytes: bytes) -> str:
+    return fingerprint(f"pdf:{hashlib.sha256(file_bytes).hexdigest()}")
+
+
+def video_fingerprint(url: str) -> str | None:
+    """Fingerprint of a YouTube URL (by video id), or None if it has no video id."""
+    try:
+        return fingerprint(f"youtube:{extract_video_id(url)}")
+    except ValueError:
+        return None
+
+
 def get_youtube_transcript(url: str) -> str:
     """Fetch the transcript of a YouTube video."""
     from youtube_transcript_api import YouTubeTranscriptApiException
@@ -58,27 +85,89 @@ def get_youtube_title(url: str) -> str:
     return f"YouTube Video ({video_id})"
 
 
-def extract_pdf_text(file_bytes: bytes) -> tuple[str, int]:
-    """Extract text from PDF bytes. Returns (text, page_count)."""
-    reader = PdfReader(io.BytesIO(file_bytes))
-    pages = len(reader.pages)
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
-    return text.strip(), pages
+def iter_pdf_pages(file_bytes: bytes) -> Iterator[tuple[int, str]]:
+    """Yield (page_number, text) for each PDF page that has text, in order.
 
+    Large PDFs are extracted on several cores (see ``pdf_extractor``).
+    """
+    return pdf_extractor.iter_pdf_pages(file_bytes)
 
-def chunk_text(
-    text: str, chunk_size: int = 1000, chunk_overlap: int = 250
-) -> list[str]:
-    """Split text into overlapping chunks."""
-    splitter = RecursiveCharacterTextSplitter(
+
+def _make_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True,
     )
-    chunks = splitter.split_text(text)
-    return chunks
+
+
+@dataclass
+class ChunkSpan:
+    """A chunk as a span of its document's text (``text`` is only kept in memory for embedding)."""
+    start: int
+    end: int
+    page: int | None
+    text: str
+
+
+class SpanChunker:
+    """Incrementally split a stream of pages into overlapping chunk spans.
+
+    Pages are joined with newlines into one document text; every chunk is
+    emitted as (start, end, page) offsets into it. Only a window of roughly
+    ``window_chunks`` chunks is buffered: once the buffer is full it is
+    split, every chunk except the last is emitted and the buffer restarts at
+    the last chunk so overlap is preserved.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP, window_chunks: int = 8):
+        self.splitter = _make_splitter(chunk_size, chunk_overlap)
+        self.window = chunk_size * window_chunks
+        self.parts: list[str] = []
+        self.length = 0
+        self._page_starts: list[int] = []
+        self._page_numbers: list[int | None] = []
+
+    def text(self) -> str:
+        """The document text consumed so far (what the spans point into)."""
+        return "\n".join(self.parts)
+
+    def _add_page(self, page: int | None, text: str):
+        if self.parts:
+            self.length += 1  # joining newline
+        self._page_starts.append(self.length)
+        self._page_numbers.append(page)
+        self.parts.append(text)
+        self.length += len(text)
+
+    def _page_at(self, offset: int) -> int | None:
+        return self._page_numbers[bisect.bisect_right(self._page_starts, offset) - 1]
+
+    def _spans(self, buffer: str, buffer_start: int) -> list[ChunkSpan]:
+        spans = []
+        for doc in self.splitter.create_documents([buffer]):
+            start = buffer_start + doc.metadata["start_index"]
+            spans.append(ChunkSpan(start, start + len(doc.page_content), self._page_at(start), doc.page_content))
+        return spans
+
+    def iter_spans(self, pages: Iterable[tuple[int | None, str]]) -> Iterator[ChunkSpan]:
+        buffer = ""
+        buffer_start = 0  # offset of the buffer in the document text
+
+        for page, text in pages:
+            if not buffer:
+                buffer_start = self.length + (1 if self.parts else 0)
+            self._add_page(page, text)
+            buffer = f"{buffer}\n{text}" if buffer else text
+            if len(buffer) < self.window:
+                continue
+            spans = self._spans(buffer, buffer_start)
+            yield from spans[:-1]
+            buffer = buffer[spans[-1].start - buffer_start:]
+            buffer_start = spans[-1].start
+
+        if buffer.strip():
+            yield from self._spans(buffer, buffer_start)
+
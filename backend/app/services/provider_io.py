@@ -0,0 +1,81 @@
+"""Shared I/O resources for provider clients.
+
+- one keep-alive ``httpx.AsyncClient`` pool shared by every HTTP provider
+- a bounded thread pool for blocking provider calls (YouTube transcripts,
+  local model warmup), so they never block the event loop
+
+Both are created in the app lifespan (``startup``/``shutdown``) and lazily
+on first use for scripts that run outside of FastAPI.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.config import settings
+
+_http_client: httpx.AsyncClient | None = None
+_executor: ThreadPoolExecutor | None = None
+_shutdown_callbacks: list = []
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it if needed."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.PROVIDER_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE,
+            ),
+        )
+    return _http_client
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool used for blocking SDK calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PROVIDER_THREAD_POOL_SIZE,
+            thread_name_prefix="provider-io",
+        )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking provider call in the bounded thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def on_shutdown(callback):
+    """Register an async callback that closes a provider client on shutdown."""
+    if callback not in _shutdown_callbacks:
+        _shutdown_callbacks.append(callback)
+
+
+async def startup():
+    """Create the shared pools (called from the app lifespan)."""
+    get_http_client()
+    get_executor()
+
+
+async def shutdown():
+    """Close the shared pools (called from the app lifespan)."""
+    global _http_client, _executor
+    for callback in _shutdown_callbacks:
+        try:
+            await callback()
+        except Exception as e:
+            print(f"Provider client shutdown failed: {e}")
+    _shutdown_callbacks.clear()
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,259 @@
+"""Rate-limit-aware priority scheduler for provider calls.
+
+Each (provider, model) pair gets two token buckets: requests and tokens.
+Limits come from ``RATE_LIMITS`` and are corrected by the provider's
+``x-ratelimit-*`` response headers (Groq sends them on every response), so
+the buckets track the real remaining quota. A 429 blocks the pair until its
+``retry-after`` has passed.
+
+Callers wait in priority order:
+
+- ``INTERACTIVE``: chat (the default)
+- ``GENERATION``: flashcards / quizzes
+- ``BATCH``: ingestion jobs
+
+Lower priorities may not use the last ``RATE_LIMIT_RESERVE_FRACTION`` of a
+bucket, which keeps headroom for interactive requests while ingestion runs.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import re
+import time
+from contextlib import contextmanager
+
+from app.config import settings
+from app.services import metrics
+
+INTERACTIVE = 0
+GENERATION = 1
+BATCH = 2
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("call_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Run provider calls made in this block (and tasks it starts) at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse reset durations like ``"7.66s"``, ``"2m59.56s"`` or ``"120ms"`` (plain numbers are seconds)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; ``capacity`` None means "no known limit"."""
+
+    def __init__(self, per_minute: float | None = None):
+        self.capacity = per_minute
+        self.available = per_minute or 0.0
+        self.refill_per_second = (per_minute or 0.0) / 60.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.available = min(self.capacity, self.available + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float) -> float:
+        """Seconds until ``amount`` can be taken while leaving ``reserve`` of capacity untouched."""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        # Never ask for more than the bucket can ever hold
+        needed = min(amount, self.capacity * (1 - reserve)) + self.capacity * reserve
+        if self.available >= needed:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return 1.0
+        return (needed - self.available) / self.refill_per_second
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self._refill()
+            self.available -= amount
+
+    def update(self, limit: float, remaining: float, reset_seconds: float | None):
+        """Resync with the provider's view of the quota."""
+        self._refill()
+        self.capacity = limit
+        self.available = remaining
+        if reset_seconds and limit > remaining:
+            # The provider restores (limit - remaining) within reset_seconds
+            self.refill_per_second = max((limit - remaining) / reset_seconds, limit / 86400.0)
+        elif not self.refill_per_second:
+            self.refill_per_second = limit / 60.0
+
+
+class ProviderLimiter:
+    """Request + token buckets of one provider/model with a priority wait queue."""
+
+    def __init__(self, name: str, rpm: float | None = None, tpm: float | None = None):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self._waiters: list[tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self.granted = 0
+        self.waited = 0
+        self.rate_limited = 0
+
+    def _wait_time(self, priority: int, cost: float) -> float:
+        reserve = 0.0 if priority == INTERACTIVE else settings.RATE_LIMIT_RESERVE_FRACTION
+        return max(
+            self.blocked_until - time.monotonic(),
+            self.requests.wait_time(1, reserve),
+            self.tokens.wait_time(cost, reserve),
+        )
+
+    def _grant(self, cost: float):
+        self.requests.take(1)
+        self.tokens.take(cost)
+        self.granted += 1
+
+    async def acquire(self, cost: float = 0.0, priority: int | None = None):
+        """Wait for quota for one request of about ``cost`` tokens."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        priority = current_priority() if priority is None else priority
+        # Fast path: nobody of the same or a higher priority is queued
+        if (not self._waiters or self._waiters[0][0] > priority) and self._wait_time(priority, cost) <= 0:
+            self._grant(cost)
+            return
+
+        self.waited += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), cost, future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=settings.RATE_LIMIT_MAX_WAIT)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise ValueError(f"{self.name} rate limit reached. Please wait a moment and try again.")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            priority, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._wait_time(priority, cost)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._grant(cost)
+            future.set_result(None)
+
+    def settle(self, estimated: float, actual: float):
+        """Correct the token bucket once the real usage of a call is known."""
+        self.tokens.take(actual - estimated)
+
+    def update_from_headers(self, headers) -> bool:
+        """Feed ``x-ratelimit-*`` / ``retry-after`` response headers into the buckets.
+
+        Returns True if the token bucket was resynced (no ``settle`` needed).
+        """
+        synced = False
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if limit is None or remaining is None:
+                continue
+            try:
+                bucket.update(float(limit), float(remaining), parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+            except ValueError:
+                continue
+            synced = synced or kind == "tokens"
+
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        if self._waiters:
+            self._dispatch()
+        return synced
+
+    def blocked(self) -> bool:
+        """True while backing off after a 429."""
+        return self.blocked_until > time.monotonic()
+
+    def back_off(self, seconds: float | None):
+        """Hold every caller of this provider/model for a while (e.g. after a 503)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + (seconds or settings.RATE_LIMIT_DEFAULT_BACKOFF))
+
+    def rate_limited_for(self, seconds: float | None):
+        """Record a 429 and back off for ``seconds`` (its ``retry-after``, when known)."""
+        self.rate_limited += 1
+        metrics.RATE_LIMITED.inc(provider=self.name)
+        self.back_off(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(not waiter[3].done() for waiter in self._waiters),
+            "granted": self.granted,
+            "waited": self.waited,
+            "rate_limited": self.rate_limited,
+            "requests_available": round(self.requests.available, 1) if self.requests.capacity is not None else -1,
+            "tokens_available": round(self.tokens.available, 1) if self.tokens.capacity is not None else -1,
+        }
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str, model: str = "") -> ProviderLimiter:
+    name = f"{provider}:{model}" if model else provider
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limits = settings.RATE_LIMITS.get(name, {})
+        limiter = _limiters[name] = ProviderLimiter(name, limits.get("rpm"), limits.get("tpm"))
+    return limiter
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough prompt size (about 4 characters per token)."""
+    return sum(len(text) for text in texts) // 4
+
+
+def retry_after_from(error: Exception) -> float | None:
+    """``retry-after`` of a provider error carrying an HTTP response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    return parse_duration(headers.get("retry-after")) if headers is not None else None
+
+
+def stats() -> dict[str, dict]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
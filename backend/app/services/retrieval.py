@@ -0,0 +1,111 @@
+"""Hybrid retrieval for chat: BM25 + vector search fused with reciprocal rank fusion.
+
+- ``lexical_fast_path`` answers short keyword questions from the BM25 index
+  alone when the best match is clear, so the question is never embedded.
+- ``search`` runs the vector query and fuses it with the BM25 ranking
+  (``score = sum(1 / (RRF_K + rank))``), over one or several contents.
+
+Contents ingested before the lexical index existed simply use vector search.
+"""
+import asyncio
+
+from app.config import settings
+from app.services import document_store, lexical_index, vector_store
+
+
+async def _load_index(content_id: str) -> lexical_index.LexicalIndex | None:
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return None
+    # File reads are small but blocking
+    return await asyncio.to_thread(lexical_index.load, content_id)
+
+
+def _with_texts(ranked: list[tuple[tuple[str, int], float]], texts: dict[tuple[str, int], str]) -> list[dict]:
+    """Result dicts in the ``vector_store.query_similar`` format.
+
+    ``ranked`` holds ((content_id, chunk_index), score) pairs; texts that
+    are not known yet are read from the document store.
+    """
+    for content_id in dict.fromkeys(key[0] for key, _ in ranked if key not in texts):
+        chunks = document_store.get_chunks(content_id) or []
+        texts.update({(content_id, i): text for i, text in enumerate(chunks)})
+    return [
+        {"text": texts[key], "content_id": key[0], "chunk_index": key[1], "score": score}
+        for key, score in ranked
+        if key in texts
+    ]
+
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60) -> list[tuple[object, float]]:
+    scores: dict = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+async def lexical_fast_path(content_id: str, question: str, top_k: int = 5) -> list[dict] | None:
+    """Chunks for a confident keyword match, or None if vector search is needed.
+
+    Confident means: a short query, every query term found in the best chunk,
+    and that chunk scoring clearly above the runner-up.
+    """
+    if not settings.LEXICAL_FAST_PATH_ENABLED:
+        return None
+    terms = set(lexical_index.tokenize(question))
+    if not terms or len(terms) > settings.LEXICAL_FAST_PATH_MAX_TERMS:
+        return None
+    index = await _load_index(content_id)
+    if index is None:
+        return None
+
+    hits = index.search(question, top_k)
+    if not hits or hits[0][2] < len(terms):
+        return None
+    if len(hits) > 1 and hits[0][1] < settings.LEXICAL_FAST_PATH_MIN_RATIO * hits[1][1]:
+        return None
+    return await asyncio.to_thread(
+        _with_texts, [((content_id, chunk_index), score) for chunk_index, score, _ in hits], {}
+    )
+
+
+async def search(
+    content_ids: str | list[str], question: str, query_embedding: list[float], top_k: int = 5
+) -> list[dict]:
+    """Vector search fused with BM25 (plain vector search without a lexical index).
+
+    Several contents are searched with a single vector query; their BM25
+    hits are merged into one ranking by score.
+    """
+    if isinstance(content_ids, str):
+        content_ids = [content_ids]
+    indexes = await asyncio.gather(*(_load_index(content_id) for content_id in content_ids))
+    if all(index is None for index in indexes):
+        hits = await vector_store.query_similar(query_embedding, content_ids, top_k)
+        for hit in hits:
+            hit.setdefault("content_id", content_ids[0])
+        return hits
+
+    candidates = settings.RETRIEVAL_CANDIDATES
+    vector_hits = await vector_store.query_similar(query_embedding, content_ids, candidates)
+    for hit in vector_hits:
+        hit.setdefault("content_id", content_ids[0])
+    lexical_hits = sorted(
+        (
+            ((content_id, chunk_index), score)
+            for content_id, index in zip(content_ids, indexes)
+            if index is not None
+            for chunk_index, score, _ in index.search(question, candidates)
+        ),
+        key=lambda hit: hit[1],
+        reverse=True,
+    )[:candidates]
+    if not lexical_hits:
+        return vector_hits[:top_k]
+
+    fused = reciprocal_rank_fusion(
+        [[(hit["content_id"], hit["chunk_index"]) for hit in vector_hits], [key for key, _ in lexical_hits]],
+        k=settings.RRF_K,
+    )[:top_k]
+    texts = {(hit["content_id"], hit["chunk_index"]): hit["text"] for hit in vector_hits}
+    return await asyncio.to_thread(_with_texts, fused, texts)
@@ -1,9 +1,37 @@
-from supabase import create_client
+import asyncio
+from typing import TYPE_CHECKING
 
 from app.config import settings
+from app.services import content_cache, metrics, provider_io
 
-# Initialize Supabase client
-supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+# Async Supabase client: created (and the SDK imported, which keeps the app's
+# import time down) on first use; its HTTP session is reused and closed on
+# shutdown. Content cache version checks (SQLite) run in the default thread
+# pool.
+_client: "AsyncClient | None" = None
+
+
+async def get_client() -> "AsyncClient":
+    global _client
+    if _client is None:
+        from supabase import acreate_client
+
+        client = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        if _client is None:
+            _client = client
+            provider_io.on_shutdown(close_client)
+    return _client
+
+
+async def close_client():
+    """Close the HTTP session of the Supabase client."""
+    global _client
+    if _client is not None:
+        await _client.postgrest.aclose()
+        _client = None
 
 TABLE_NAME = "contents"
 
@@ -13,6 +41,8 @@ async def create_content(
     source: str,
     title: str | None = None,
     metadata: dict | None = None,
+    status: str = "processing",
+    chunks_count: int | None = None,
 ) -> dict:
     """Insert a new content record into Supabase."""
     data = {
@@ -20,11 +50,50 @@ async def create_content(
         "source": source,
         "title": title or "",
         "metadata": metadata or {},
-        "status": "processing",
+        "status": status,
     }
+    if chunks_count is not None:
+        data["chunks_count"] = chunks_count
 
-    result = supabase.table(TABLE_NAME).insert(data).execute()
-    return result.data[0]
+    query = (await get_client()).table(TABLE_NAME).insert(data)
+    with metrics.timed("supabase", "insert"):
+        result = await query.execute()
+    record = result.data[0]
+
+    cache = content_cache.get_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.write, record["id"], record)
+    return record
+
+
+async def create_contents(items: list[dict]) -> list[dict]:
+    """Insert several content records with one request (bulk imports).
+
+    Each item has ``content_type``, ``source`` and optionally ``title``,
+    ``metadata``, ``status`` and ``chunks_count``; records are returned in
+    the same order.
+    """
+    rows = []
+    for item in items:
+        row = {
+            "content_type": item["content_type"],
+            "source": item["source"],
+            "title": item.get("title") or "",
+            "metadata": item.get("metadata") or {},
+            "status": item.get("status", "processing"),
+        }
+        if item.get("chunks_count") is not None:
+            row["chunks_count"] = item["chunks_count"]
+        rows.append(row)
+
+    query = (await get_client()).table(TABLE_NAME).insert(rows)
+    with metrics.timed("supabase", "insert_many"):
+        result = await query.execute()
+
+    cache = content_cache.get_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.write_many, result.data)
+    return result.data
 
 
 async def update_content(
@@ -40,21 +109,108 @@ async def update_content(
     if error_message:
         update_data["metadata"] = {"error": error_message}
         
-    result = (
-        supabase.table(TABLE_NAME)
+    query = (
+        (await get_client()).table(TABLE_NAME)
         .update(update_data)
         .eq("id", content_id)
-        .execute()
     )
+    with metrics.timed("supabase", "update"):
+        result = await query.execute()
+
+    # Write-through: bumps the shared version so every worker drops its copy
+    cache = content_cache.get_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.write, content_id, result.data[0] if result.data else None)
     return result.data[0]
 
 
 async def get_content(content_id: str) -> dict | None:
-    """Fetch a content record by ID."""
-    result = (
-        supabase.table(TABLE_NAME)
+    """Fetch a content record by ID (served from the content cache when fresh)."""
+    cache = content_cache.get_cache()
+    version = 0
+    if cache is not None:
+        record, version = await asyncio.to_thread(cache.lookup, content_id)
+        if record is not None:
+            return record
+
+    query = (
+        (await get_client()).table(TABLE_NAME)
         .select("*")
         .eq("id", content_id)
-        .execute()
     )
-    return result.data[0] if result.data else None
+    with metrics.timed("supabase", "select"):
+        result = await query.execute()
+    if not result.data:
+        return None
+
+    if cache is not None:
+        cache.put(content_id, result.data[0], version)
+    return result.data[0]
+
+
+async def get_contents(content_ids: list[str]) -> dict[str, dict]:
+    """Fetch several content records in one query (cached ones are not re-read).
+
+    Returns a dict by id; unknown ids are left out.
+    """
+    cache = content_cache.get_cache()
+    found: dict[str, dict] = {}
+    versions: dict[str, int] = {}
+    if cache is not None:
+        found, versions = await asyncio.to_thread(cache.lookup_many, content_ids)
+
+    missing = [content_id for content_id in content_ids if content_id not in found]
+    if missing:
+        query = (
+            (await get_client()).table(TABLE_NAME)
+            .select("*")
+            .in_("id", missing)
+        )
+        with metrics.timed("supabase", "select_many"):
+            result = await query.execute()
+        for record in result.data:
+            found[record["id"]] = record
+            if cache is not None:
+                cache.put(record["id"], record, versions.get(record["id"], 0))
+    return found
+
+
+async def find_processed(fingerprints: list[str]) -> dict[str, dict]:
+    """Processed contents by input fingerprint (one query for all of them).
+
+    Used to skip ingestion of inputs that were already uploaded.
+    """
+    if not fingerprints:
+        return {}
+    query = (
+        (await get_client()).table(TABLE_NAME)
+        .select("*")
+        .in_("metadata->>fingerprint", fingerprints)
+        .eq("status", "processed")
+        .order("created_at")
+    )
+    with metrics.timed("supabase", "select_many"):
+        result = await query.execute()
+
+    found: dict[str, dict] = {}
+    for record in result.data:
+        found.setdefault((record.get("metadata") or {}).get("fingerprint"), record)
+    return found
+
+
+def vector_content_id(content: dict) -> str:
+    """Content id the vectors, document and lexical index of a content are stored under.
+
+    Deduplicated uploads reuse those of the content that was actually ingested.
+    """
+    return (content.get("metadata") or {}).get("vector_content_id") or content["id"]
+
+
+def linked_metadata(fingerprint: str | None, existing: dict | None) -> dict:
+    """Metadata fields recording an input's fingerprint and, for a duplicate, its source content."""
+    metadata = {}
+    if fingerprint:
+        metadata["fingerprint"] = fingerprint
+    if existing is not None:
+        metadata["vector_content_id"] = vector_content_id(existing)
+    return metadata
@@ -0,0 +1,107 @@
+"""Pluggable vector store.
+
+Routers talk to this module instead of a concrete backend. Every backend
+module exposes the same async functions (``upsert_chunks``, ``upsert_many``,
+``wait_for_propagation``, ``query_similar``, ``fetch`` and
+``fetch_all_chunks``) and is selected with the ``VECTOR_STORE_BACKEND``
+setting:
+
+- ``pinecone``: hosted Pinecone index (default)
+- ``local``: embedded NumPy index persisted under ``DATA_DIR``
+"""
+import asyncio
+
+from app.config import settings
+from app.services import document_store, metrics
+
+BACKENDS = {
+    "pinecone": "app.services.pinecone_service",
+    "local": "app.services.local_vector_store",
+}
+
+# Lazy load the backend so unused provider SDKs are never imported
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        import importlib
+
+        name = settings.VECTOR_STORE_BACKEND.lower()
+        if name not in BACKENDS:
+            raise ValueError(
+                f"Unknown VECTOR_STORE_BACKEND '{settings.VECTOR_STORE_BACKEND}'. "
+                f"Expected one of: {', '.join(BACKENDS)}"
+            )
+        _backend = importlib.import_module(BACKENDS[name])
+    return _backend
+
+
+def stats() -> dict:
+    """Backend memory stats (empty if the backend has none or isn't loaded yet)."""
+    if _backend is None or not hasattr(_backend, "stats"):
+        return {}
+    return _backend.stats()
+
+
+def _provider() -> str:
+    """Metrics label of the active backend."""
+    return f"vector_{settings.VECTOR_STORE_BACKEND.lower()}"
+
+
+async def upsert_chunks(
+    content_id: str,
+    chunks: list,
+    embeddings: list[list[float]],
+    start_index: int = 0,
+    wait: bool = True,
+) -> int:
+    """Upsert chunk vectors with their metadata.
+
+    ``chunks`` are ``processor.ChunkSpan``s whose text lives in the document
+    store (metadata only keeps offsets); plain strings are stored as text.
+    Documents written in several batches pass ``start_index`` and
+    ``wait=False``, then call ``wait_for_propagation`` once at the end.
+    """
+    with metrics.timed(_provider(), "upsert"):
+        return await get_backend().upsert_chunks(content_id, chunks, embeddings, start_index, wait)
+
+
+async def upsert_many(segments: list[tuple[str, int, list, list[list[float]]]], wait: bool = True) -> int:
+    """Upsert ``(content_id, start_index, chunks, embeddings)`` runs of several contents at once."""
+    with metrics.timed(_provider(), "upsert"):
+        return await get_backend().upsert_many(segments, wait)
+
+
+async def wait_for_propagation(content_ids: list[str] | None = None):
+    """Wait until previous upserts (of the given contents, default all) are visible to readers."""
+    with metrics.timed(_provider(), "wait_for_propagation"):
+        await get_backend().wait_for_propagation(content_ids)
+
+
+async def query_similar(
+    query_embedding: list[float], content_id: str | list[str], top_k: int = 5
+) -> list[dict]:
+    """Query for similar chunks within one content, or across a list of contents.
+
+    Results carry ``text``, ``chunk_index``, ``content_id`` and ``score``.
+    """
+    with metrics.timed(_provider(), "query"):
+        return await get_backend().query_similar(query_embedding, content_id, top_k)
+
+
+async def fetch(ids: list[str]) -> dict[str, dict]:
+    """Fetch vectors (values + metadata) by id."""
+    with metrics.timed(_provider(), "fetch"):
+        return await get_backend().fetch(ids)
+
+
+async def fetch_all_chunks(content_id: str, chunks_count: int | None = None) -> list[str]:
+    """Fetch all chunk texts of a content ordered by chunk index."""
+    # Sliced from the local document store: no vector reads at all
+    chunks = await asyncio.to_thread(document_store.get_chunks, content_id)
+    if chunks:
+        return chunks
+    with metrics.timed(_provider(), "fetch_all_chunks"):
+        return await get_backend().fetch_all_chunks(content_id, chunks_count)
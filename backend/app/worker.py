@@ -0,0 +1,35 @@
+"""Standalone job worker.
+
+Runs the ingestion job pool outside of the web server so heavy processing
+never competes with API requests. Start the API with
+``JOB_WORKERS_IN_PROCESS=false`` and run one or more of these:
+
+    python -m app.worker
+"""
+import asyncio
+
+from app.config import settings
+from app.routers import batch, pdf, video  # noqa: F401  (registers job handlers)
+from app.services import embedding_service, job_queue, pdf_extractor, provider_io
+
+
+async def main():
+    await provider_io.startup()
+    if settings.EMBEDDING_WARMUP:
+        # Jobs wait on the model anyway: load it before claiming any
+        await embedding_service.warmup()
+    await job_queue.start_workers()
+    print(f"Job worker started with {settings.JOB_WORKER_CONCURRENCY} concurrent jobs")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop_workers()
+        await provider_io.shutdown()
+        pdf_extractor.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,145 @@
+"""Throughput and agreement of the local embedding backends.
+
+Loads the local model with every ``EMBEDDING_BACKEND`` (``torch``, ``onnx``,
+``onnx_int8``) and encodes the same texts with each, reporting:
+
+- model load time (including the one-time int8 export)
+- throughput (texts/sec) and the speedup vs. torch
+- cosine similarity of every embedding with the torch one (mean / min)
+- retrieval agreement: overlap of each query's top 5 texts with torch's
+
+By default the texts are synthetic: a mix of short questions and full
+~1000 character chunks, like what the micro-batcher coalesces. Pass real
+ones with ``--texts file.txt`` (one per line). Needs the ONNX extra:
+``pip install "sentence-transformers[onnx]"``.
+
+Usage (from ``backend/``):
+
+    python -m benchmarks.bench_embedding_backends
+    python -m benchmarks.bench_embedding_backends --threads 4 --quantization avx512_vnni
+    python -m benchmarks.bench_embedding_backends --texts chunks.txt --backends torch,onnx_int8
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services import embedding_service
+
+WORDS = (
+    "the model learns a representation of each document chunk so that similar passages end up close "
+    "together in vector space while questions about a topic retrieve the paragraphs that explain it "
+    "energy cell protein market history theorem gradient network language climate economy river"
+).split()
+
+
+def synthetic_texts(count: int, rng: np.random.Generator) -> list[str]:
+    texts = []
+    for _ in range(count):
+        # One in three is a question, the rest are chunk-sized passages
+        length = rng.integers(6, 20) if rng.random() < 1 / 3 else rng.integers(140, 200)
+        texts.append(" ".join(rng.choice(WORDS, length)))
+    return texts
+
+
+def load(backend: str) -> float:
+    settings.EMBEDDING_BACKEND = backend
+    embedding_service._local_model = None
+    started = time.perf_counter()
+    embedding_service.get_local_model()
+    embedding_service.encode(["warmup"])
+    return time.perf_counter() - started
+
+
+def encode_all(texts: list[str], batch_size: int, repeat: int) -> tuple[np.ndarray, float]:
+    """Embeddings of ``texts`` and the best texts/sec over ``repeat`` runs."""
+    best = 0.0
+    vectors = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        # Feed the model the way the micro-batcher does
+        vectors = [
+            vector
+            for i in range(0, len(texts), batch_size)
+            for vector in embedding_service.encode(texts[i : i + batch_size])
+        ]
+        best = max(best, len(texts) / (time.perf_counter() - started))
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), best
+
+
+def top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set]:
+    return [set(np.argsort(-(vectors @ query))[:k]) for query in queries]
+
+
+def run(args) -> list[dict]:
+    settings.DATA_DIR = args.data_dir or tempfile.mkdtemp(prefix="bench-embeddings-")
+    settings.EMBEDDING_INTRA_OP_THREADS = args.threads
+    settings.EMBEDDING_QUANTIZATION = args.quantization
+    rng = np.random.default_rng(args.seed)
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][: args.count]
+    else:
+        texts = synthetic_texts(args.count, rng)
+    query_ids = rng.choice(len(texts), min(args.queries, len(texts)), replace=False)
+    print(f"{len(texts)} texts, model {settings.EMBEDDING_MODEL_NAME}, threads {args.threads or 'default'}")
+
+    # 1. torch is the reference, whether or not it is listed
+    backends = args.backends.split(",")
+    reference = None
+    rows = []
+    for backend in ["torch"] + [name for name in backends if name != "torch"]:
+        load_seconds = load(backend)
+        vectors, throughput = encode_all(texts, args.batch_size, args.repeat)
+        if reference is None:
+            reference, reference_throughput = vectors, throughput
+            reference_top = top_k(reference, reference[query_ids], 5)
+            if "torch" not in backends:
+                continue
+
+        # 2. Agreement with torch: per-vector cosine and top-5 retrieval overlap
+        cosines = np.sum(vectors * reference, axis=1)
+        overlap = np.mean([len(got & want) / 5 for got, want in zip(top_k(vectors, vectors[query_ids], 5), reference_top)])
+        rows.append(
+            {
+                "backend": backend,
+                "load_s": round(load_seconds, 2),
+                "texts_per_s": round(throughput, 1),
+                "speedup": round(throughput / reference_throughput, 2),
+                "cosine_mean": round(float(cosines.mean()), 4),
+                "cosine_min": round(float(cosines.min()), 4),
+                "top5_overlap": round(float(overlap), 4),
+            }
+        )
+    return rows
+
+
+def print_results(rows: list[dict]):
+    headers = list(rows[0])
+    print("\n" + "".join(f"{header:>14}" for header in headers))
+    for row in rows:
+        print("".join(f"{str(row[header]):>14}" for header in headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(embedding_service.BACKENDS))
+    parser.add_argument("--texts", help="Texts to embed (one per line) instead of synthetic ones")
+    parser.add_argument("--count", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=50, help="Texts used as queries for the top-5 overlap")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_MAX_SIZE, help="Texts per encode call")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_INTRA_OP_THREADS, help="Intra-op threads (0 = default)")
+    parser.add_argument("--quantization", default=settings.EMBEDDING_QUANTIZATION, help="int8 target: arm64, avx2, avx512, avx512_vnni")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="Keep exported models here (default: a temporary directory)")
+    args = parser.parse_args()
+
+    print_results(run(args))
+
+
+if __name__ == "__main__":
+    main()
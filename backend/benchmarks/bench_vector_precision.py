@@ -0,0 +1,153 @@
+"""Recall vs. memory vs. latency of the local vector store's search precisions.
+
+Writes a set of vectors to a temporary local store once, then queries it
+with every ``LOCAL_VECTOR_PRECISION`` / ``LOCAL_VECTOR_SEARCH_DIM`` /
+``LOCAL_VECTOR_RESCORE_FACTOR`` combination and reports, against exact
+float32 search:
+
+- recall@k of the returned chunks
+- search memory per vector (and the reduction vs. float32)
+- peak working memory of one partition scan
+- query latency percentiles
+
+By default the vectors are synthetic: clustered, with energy decaying over
+the dimensions like a Matryoshka-trained model (truncation only makes sense
+for such models). Pass real embeddings with ``--embeddings file.npy``.
+
+Usage (from ``backend/``):
+
+    python -m benchmarks.bench_vector_precision
+    python -m benchmarks.bench_vector_precision --contents 40 --chunks 500 --dim 768
+    python -m benchmarks.bench_vector_precision --embeddings embeddings.npy
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services import local_vector_store
+
+# (precision, search dimension as a fraction of the full one, rescore factor)
+CONFIGS = [
+    ("float32", 1, 0),
+    ("float16", 1, 0),
+    ("float16", 1, 4),
+    ("int8", 1, 0),
+    ("int8", 1, 4),
+    ("float16", 1 / 2, 4),
+    ("int8", 1 / 2, 4),
+    ("int8", 1 / 4, 4),
+    ("int8", 1 / 4, 0),
+]
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered vectors whose variance decays over the dimensions (Matryoshka-like)."""
+    decay = np.exp(-np.arange(dim) / (dim / 4)).astype(np.float32)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    members = centers[rng.integers(0, clusters, count)]
+    vectors = members + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors * decay
+
+
+def percentile(values: list[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+async def run_queries(content_ids: list[str], queries: np.ndarray, top_k: int) -> tuple[list[list[tuple]], list[float]]:
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = await local_vector_store.query_similar(query.tolist(), content_ids, top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([(hit["content_id"], hit["chunk_index"]) for hit in hits])
+    return results, latencies
+
+
+def configure(precision: str, search_dim: int, rescore: int):
+    settings.LOCAL_VECTOR_PRECISION = precision
+    settings.LOCAL_VECTOR_SEARCH_DIM = search_dim
+    settings.LOCAL_VECTOR_RESCORE_FACTOR = rescore
+    # Partitions derive their search vectors when loaded: drop the loaded ones
+    local_vector_store._partitions.clear()
+    local_vector_store.reset_peak_query_bytes()
+
+
+async def run(args) -> list[dict]:
+    settings.DATA_DIR = tempfile.mkdtemp(prefix="bench-vectors-")
+    rng = np.random.default_rng(args.seed)
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+    else:
+        vectors = synthetic_vectors(args.contents * args.chunks, args.dim, args.clusters, rng)
+    dim = vectors.shape[1]
+    sample = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = sample + 0.3 * rng.standard_normal(sample.shape).astype(np.float32) * sample.std(axis=0)
+
+    # 1. Store the vectors once (float32 on disk, whatever the search precision)
+    content_ids = []
+    for start in range(0, len(vectors), args.chunks):
+        content_id = f"bench-{start // args.chunks}"
+        rows = vectors[start : start + args.chunks]
+        await local_vector_store.upsert_many([(content_id, 0, [""] * len(rows), rows.tolist())])
+        content_ids.append(content_id)
+    print(f"{len(vectors)} vectors of {dim} dimensions in {len(content_ids)} contents, {args.queries} queries")
+
+    # 2. Exact float32 search is the reference
+    configure("float32", 0, 0)
+    exact, _ = await run_queries(content_ids, queries, args.top_k)
+
+    # 3. Every configuration against it
+    rows = []
+    for precision, fraction, rescore in CONFIGS:
+        search_dim = 0 if fraction == 1 else int(dim * fraction)
+        configure(precision, search_dim, rescore)
+        await run_queries(content_ids, queries[:5], args.top_k)  # load partitions
+        results, latencies = await run_queries(content_ids, queries, args.top_k)
+
+        recall = np.mean([len(set(got) & set(want)) / len(want) for got, want in zip(results, exact) if want])
+        stats = local_vector_store.stats()
+        rows.append(
+            {
+                "precision": precision,
+                "search_dim": search_dim or dim,
+                "rescore": rescore,
+                f"recall@{args.top_k}": round(float(recall), 4),
+                "bytes_per_vector": round(stats["search_bytes"] / stats["vectors"], 1),
+                "reduction": round(stats["float32_bytes"] / stats["search_bytes"], 2),
+                "peak_query_kb": round(stats["peak_query_bytes"] / 1024, 1),
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p95_ms": round(percentile(latencies, 95), 3),
+            }
+        )
+    return rows
+
+
+def print_results(rows: list[dict]):
+    headers = list(rows[0])
+    print("\n" + "".join(f"{header:>18}" for header in headers))
+    for row in rows:
+        print("".join(f"{str(row[header]):>18}" for header in headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contents", type=int, default=20, help="Contents (partitions) to search across")
+    parser.add_argument("--chunks", type=int, default=500, help="Vectors per content")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embeddings", help="Real embeddings (.npy, rows = vectors) instead of synthetic ones")
+    args = parser.parse_args()
+
+    print_results(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
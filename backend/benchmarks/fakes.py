@@ -0,0 +1,416 @@
+"""Local stand-ins for every external provider, with injected latency.
+
+The fakes plug in below the service modules, so the real service code
+(clients, caches, batching, pipelines) is exercised:
+
+- Groq and Hugging Face: served by an ``httpx.MockTransport`` mounted on the
+  shared provider connection pool
+- Pinecone and Supabase: in-memory replacements for the async SDK clients
+- Gemini: fake ``genai.Client`` exposing ``aio.models``
+- YouTube: fake transcript fetcher
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+
+EMBEDDING_DIMENSION = 768
+
+WORDS = (
+    "energy cell membrane protein enzyme reaction gradient molecule transport "
+    "photosynthesis respiration nucleus chromosome mitosis theory model equation "
+    "variable function derivative integral vector matrix probability history"
+).split()
+
+
+@dataclass
+class Latency:
+    """Injected latency per provider in milliseconds (+/- jitter fraction)."""
+
+    groq: float = 800.0
+    groq_token: float = 2.0  # per streamed token
+    gemini: float = 300.0
+    hf: float = 60.0
+    pinecone: float = 40.0
+    pinecone_visibility: float = 150.0  # delay before upserted vectors are readable
+    supabase: float = 50.0
+    youtube: float = 300.0
+    jitter: float = 0.2
+    overrides: dict = field(default_factory=dict)
+
+    def seconds(self, provider: str) -> float:
+        base = getattr(self, provider)
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter))) / 1000
+
+    @classmethod
+    def parse(cls, spec: str | None) -> "Latency":
+        """Parse ``"groq=800,hf=50,..."`` into a Latency."""
+        latency = cls()
+        for part in filter(None, (spec or "").split(",")):
+            name, value = part.split("=")
+            setattr(latency, name.strip(), float(value))
+        return latency
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Deterministic pseudo-embedding (same text -> same vector)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSION)]
+
+
+def fake_text(words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        n = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+
+# ── Groq + Hugging Face (HTTP) ────────────────
+
+def _flashcards_and_quiz_json() -> str:
+    return json.dumps(
+        {
+            "flashcards": [
+                {"question": f"What is concept {i}?", "answer": f"Concept {i} is ..."} for i in range(10)
+            ],
+            "questions": [
+                {
+                    "question": f"Which statement about topic {i} is true?",
+                    "options": [{"label": label, "text": f"Option {label}"} for label in "ABCD"],
+                    "correct_answer": "A",
+                }
+                for i in range(5)
+            ],
+        }
+    )
+
+
+def make_http_handler(latency: Latency):
+    """Async MockTransport handler routing by host to the fake providers."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        body = json.loads(request.content or b"{}")
+
+        if "huggingface" in host:
+            await asyncio.sleep(latency.seconds("hf"))
+            return httpx.Response(200, json=[fake_embedding(text) for text in body["inputs"]])
+
+        if "groq" in host:
+            await asyncio.sleep(latency.seconds("groq"))
+            json_mode = body.get("response_format", {}).get("type") == "json_object"
+            content = _flashcards_and_quiz_json() if json_mode else fake_text(200, seed=len(request.content))
+            usage = {"prompt_tokens": len(str(body.get("messages"))) // 4, "completion_tokens": len(content) // 4}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            # Generous quota so the benchmark measures the app, not the rate limiter
+            quota = {
+                "x-ratelimit-limit-requests": "1000000",
+                "x-ratelimit-remaining-requests": "1000000",
+                "x-ratelimit-reset-requests": "1s",
+                "x-ratelimit-limit-tokens": "100000000",
+                "x-ratelimit-remaining-tokens": "100000000",
+                "x-ratelimit-reset-tokens": "1s",
+            }
+            if body.get("stream"):
+                return httpx.Response(
+                    200,
+                    stream=_GroqStream(content, latency),
+                    headers={"content-type": "text/event-stream", **quota},
+                )
+            return httpx.Response(
+                200,
+                headers=quota,
+                json={
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                },
+            )
+
+        return httpx.Response(404, json={"error": f"No fake provider for host {host}"})
+
+    return handler
+
+
+class _GroqStream(httpx.AsyncByteStream):
+    """Streams a completion as OpenAI-style SSE chunks, one word at a time."""
+
+    def __init__(self, content: str, latency: Latency):
+        self.tokens = content.split(" ")
+        self.latency = latency
+
+    async def __aiter__(self):
+        for i, token in enumerate(self.tokens):
+            await asyncio.sleep(self.latency.seconds("groq_token"))
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "bench",
+                "choices": [{"index": 0, "delta": {"content": token if i == 0 else f" {token}"}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+
+# ── Pinecone ──────────────────────────────────
+
+class FakePineconeIndex:
+    """In-memory index with the subset of the Pinecone Index API we use."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.vectors: dict[str, dict] = {}
+
+    async def upsert(self, vectors: list[dict]):
+        await asyncio.sleep(self.latency.seconds("pinecone"))
+        # Eventually consistent like the real index: readable after a short delay
+        visible_at = time.monotonic() + self.latency.seconds("pinecone_visibility")
+        for vector in vectors:
+            self.vectors[vector["id"]] = {**vector, "visible_at": visible_at}
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def _visible(self) -> dict[str, dict]:
+        now = time.monotonic()
+        return {vid: v for vid, v in self.vectors.items() if v["visible_at"] <= now}
+
+    async def fetch(self, ids: list[str]):
+        await asyncio.sleep(self.latency.seconds("pinecone"))
+        visible = self._visible()
+        return SimpleNamespace(
+            vectors={
+                vid: SimpleNamespace(id=vid, values=visible[vid]["values"], metadata=visible[vid]["metadata"])
+                for vid in ids
+                if vid in visible
+            }
+        )
+
+    async def query(self, vector, top_k, include_metadata=True, filter=None, **kwargs):
+        await asyncio.sleep(self.latency.seconds("pinecone"))
+        matches = [v for v in self._visible().values() if _matches(v["metadata"], filter or {})]
+        scored = []
+        for v in matches:
+            score = sum(a * b for a, b in zip(vector, v["values"]))
+            scored.append(SimpleNamespace(id=v["id"], score=score, metadata=v["metadata"], values=v["values"]))
+        scored.sort(key=lambda m: -m.score)
+        return SimpleNamespace(matches=scored[:top_k])
+
+
+def _matches(metadata: dict, filter: dict) -> bool:
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if "$eq" in condition and value != condition["$eq"]:
+            return False
+        if "$in" in condition and value not in condition["$in"]:
+            return False
+    return True
+
+
+# ── Supabase ──────────────────────────────────
+
+class FakeSupabase:
+    """In-memory stand-in for the supabase client's table query builder."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.rows: dict[str, dict] = {}
+
+    def table(self, name: str) -> "_FakeQuery":
+        return _FakeQuery(self)
+
+
+class _FakeQuery:
+    def __init__(self, db: FakeSupabase):
+        self.db = db
+        self.action = "select"
+        self.data = None
+        self.filters: list = []
+        self.limit_count = None
+
+    def insert(self, data):
+        self.action, self.data = "insert", data
+        return self
+
+    def update(self, data):
+        self.action, self.data = "update", data
+        return self
+
+    def select(self, *columns):
+        self.action = "select"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, lambda v, value=value: v == value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, lambda v, values=values: v in values))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def _select_rows(self) -> list[dict]:
+        rows = []
+        for row in self.db.rows.values():
+            if all(check(_lookup(row, column)) for column, check in self.filters):
+                rows.append(row)
+        return rows[: self.limit_count] if self.limit_count else rows
+
+    async def execute(self):
+        await asyncio.sleep(self.db.latency.seconds("supabase"))
+        if self.action == "insert":
+            items = self.data if isinstance(self.data, list) else [self.data]
+            inserted = []
+            for item in items:
+                row = {
+                    "id": str(uuid.uuid4()),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "chunks_count": 0,
+                    **item,
+                }
+                self.db.rows[row["id"]] = row
+                inserted.append(dict(row))
+            return SimpleNamespace(data=inserted)
+        if self.action == "update":
+            updated = []
+            for row in self._select_rows():
+                row.update(self.data)
+                updated.append(dict(row))
+            return SimpleNamespace(data=updated)
+        return SimpleNamespace(data=[dict(row) for row in self._select_rows()])
+
+
+def _lookup(row: dict, column: str):
+    # Supports JSON paths like "metadata->>fingerprint"
+    if "->>" in column:
+        column, key = column.split("->>")
+        return (row.get(column) or {}).get(key)
+    return row.get(column)
+
+
+# ── Gemini ────────────────────────────────────
+
+class FakeGeminiClient:
+    """Fake ``genai.Client`` exposing the async ``aio.models`` calls we use."""
+
+    def __init__(self, latency: Latency):
+        self.aio = SimpleNamespace(models=_FakeGeminiModels(latency), aclose=self._aclose)
+
+    async def _aclose(self):
+        pass
+
+
+class _FakeGeminiModels:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def embed_content(self, model, contents, config=None):
+        await asyncio.sleep(self.latency.seconds("gemini"))
+        texts = [contents] if isinstance(contents, str) else contents
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_embedding(t)) for t in texts])
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self.latency.seconds("gemini"))
+        return SimpleNamespace(text=fake_text(200))
+
+
+# ── YouTube ───────────────────────────────────
+
+def make_transcript_fetcher(latency: Latency, words: int = 6000):
+    def get_youtube_transcript(url: str) -> str:
+        time.sleep(latency.seconds("youtube"))
+        return fake_text(words, seed=hash(url) & 0xFFFF)
+
+    return get_youtube_transcript
+
+
+# ── PDF ───────────────────────────────────────
+
+def make_pdf(pages: int, words_per_page: int = 400, seed: int = 0) -> bytes:
+    """Build a minimal text PDF (Helvetica, one text block per page)."""
+    objects = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # placeholder, filled once page ids are known
+    page_ids = []
+    for page in range(pages):
+        words = fake_text(words_per_page, seed=seed * 10_000 + page).split()
+        lines = [" ".join(words[i : i + 12]) for i in range(0, len(words), 12)]
+        text_ops = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(
+            "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*" for line in lines
+        ) + " ET"
+        stream = text_ops.encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+            )
+        )
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        catalog_id,
+        xref_offset,
+    )
+    return bytes(out)
+
+
+def install(latency: Latency) -> dict:
+    """Swap every provider for its fake. Returns the fake objects."""
+    from app.config import settings
+    from app.services import gemini, pinecone_service, processor, provider_io, supabase_service
+
+    # HF API is tried first when a key is configured
+    settings.HUGGINGFACE_API_KEY = "bench"
+    settings.GROQ_API_KEY = "bench"
+
+    provider_io._http_client = httpx.AsyncClient(transport=httpx.MockTransport(make_http_handler(latency)))
+    fakes = {
+        "pinecone": FakePineconeIndex(latency),
+        "supabase": FakeSupabase(latency),
+        "gemini": FakeGeminiClient(latency),
+    }
+    pinecone_service._index = fakes["pinecone"]
+    supabase_service._client = fakes["supabase"]
+    gemini._client = fakes["gemini"]
+    processor.get_youtube_transcript = make_transcript_fetcher(latency)
+    return fakes
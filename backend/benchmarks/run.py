@@ -0,0 +1,319 @@
+"""End-to-end benchmark of the API against local provider stand-ins.
+
+Runs the FastAPI app in-process (no network, no accounts needed) with every
+provider replaced by a fake with configurable latency, then reports:
+
+- ingestion throughput (chunks/sec) for PDFs and videos
+- chat, streaming chat (time to first token), flashcard and quiz latency
+  percentiles at several concurrency levels
+
+Usage (from ``backend/``):
+
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 1,8,32 --latency groq=1200,hf=80
+    python -m benchmarks.run --save-baseline bench_baseline.json
+    python -m benchmarks.run --baseline bench_baseline.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fakes
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies_ms: list[float], wall_s: float) -> dict:
+    return {
+        "requests": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 1),
+        "p95_ms": round(percentile(latencies_ms, 95), 1),
+        "p99_ms": round(percentile(latencies_ms, 99), 1),
+        "rps": round(len(latencies_ms) / wall_s, 2) if wall_s else 0.0,
+    }
+
+
+async def run_load(concurrency: int, total: int, make_request) -> dict:
+    """Run ``total`` requests with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await make_request(i)
+            except Exception as e:
+                errors += 1
+                print(f"  request {i} failed: {e}")
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result["errors"] = errors
+    return result
+
+
+async def bench_ingestion(client: httpx.AsyncClient, pdfs: int, pdf_pages: int, videos: int) -> tuple[dict, list[str]]:
+    started = time.perf_counter()
+    submitted = []
+    for i in range(pdfs):
+        pdf = fakes.make_pdf(pdf_pages, seed=i)
+        response = await client.post(
+            "/api/process-pdf", files={"file": (f"bench_{i}.pdf", pdf, "application/pdf")}
+        )
+        response.raise_for_status()
+        submitted.append(response.json())
+    for i in range(videos):
+        response = await client.post(
+            "/api/process-video", json={"youtube_url": f"https://www.youtube.com/watch?v=bench{i:06d}"}
+        )
+        response.raise_for_status()
+        submitted.append(response.json())
+
+    pending = {item["job_id"]: item["content_id"] for item in submitted}
+    failed = 0
+    while pending:
+        await asyncio.sleep(0.05)
+        for job_id in list(pending):
+            job = (await client.get(f"/api/jobs/{job_id}")).json()
+            if job["status"] in ("succeeded", "failed"):
+                failed += job["status"] == "failed"
+                pending.pop(job_id)
+    wall_s = time.perf_counter() - started
+
+    from app.services import supabase_service
+
+    content_ids = [item["content_id"] for item in submitted]
+    chunks = 0
+    for content_id in content_ids:
+        content = await supabase_service.get_content(content_id)
+        chunks += content.get("chunks_count") or 0
+
+    return {
+        "documents": len(submitted),
+        "failed": failed,
+        "chunks": chunks,
+        "wall_s": round(wall_s, 2),
+        "chunks_per_sec": round(chunks / wall_s, 1) if wall_s else 0.0,
+    }, content_ids
+
+
+class _FirstMatch(Exception):
+    pass
+
+
+async def asgi_post_until(app, path: str, payload: dict, marker: bytes):
+    """POST straight to the ASGI app and return as soon as ``marker`` is sent.
+
+    httpx's ASGITransport buffers whole responses, so it can't measure time
+    to first token of a streaming endpoint.
+    """
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent_request = False
+    status = 0
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # block until cancelled (client "disconnect")
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            if status >= 400:
+                raise RuntimeError(f"{path} returned {status}")
+        elif message["type"] == "http.response.body" and marker in message.get("body", b""):
+            raise _FirstMatch()
+
+    try:
+        await app(scope, receive, send)
+    except _FirstMatch:
+        return
+    raise RuntimeError(f"{path} finished without sending {marker!r}")
+
+
+async def bench_endpoints(app, client: httpx.AsyncClient, content_ids: list[str], levels: list[int], requests: int) -> dict:
+    results = {"chat": {}, "chat_stream_ttft": {}, "flashcards": {}, "quiz": {}}
+
+    def pick(i: int) -> str:
+        return content_ids[i % len(content_ids)]
+
+    async def chat(i: int):
+        response = await client.post("/api/chat", json={"content_id": pick(i), "message": f"Explain topic {i} in detail"})
+        response.raise_for_status()
+
+    async def chat_stream_first_token(i: int):
+        payload = {"content_id": pick(i), "message": f"Summarize section {i}"}
+        await asgi_post_until(app, "/api/chat/stream", payload, b"event: delta")
+
+    async def flashcards(i: int):
+        response = await client.post("/api/generate-flashcards", json={"content_id": pick(i), "num_cards": 1 + i % 50})
+        response.raise_for_status()
+
+    async def quiz(i: int):
+        response = await client.post("/api/generate-quiz", json={"content_id": pick(i), "num_questions": 1 + i % 20})
+        response.raise_for_status()
+
+    for level in levels:
+        print(f"  concurrency {level} ...")
+        results["chat"][f"c{level}"] = await run_load(level, requests, chat)
+        results["chat_stream_ttft"][f"c{level}"] = await run_load(level, requests, chat_stream_first_token)
+        results["flashcards"][f"c{level}"] = await run_load(level, requests, flashcards)
+        results["quiz"][f"c{level}"] = await run_load(level, requests, quiz)
+    return results
+
+
+def configure(args):
+    from app.config import settings
+
+    settings.DATA_DIR = tempfile.mkdtemp(prefix="bench_")
+    settings.VECTOR_STORE_BACKEND = args.vector_store
+    settings.JOB_WORKERS_IN_PROCESS = True
+    settings.JOB_WORKER_CONCURRENCY = args.job_workers
+    if not args.with_caches:
+        settings.EMBEDDING_CACHE_ENABLED = False
+        settings.ANSWER_CACHE_ENABLED = False
+        settings.GENERATION_CACHE_ENABLED = False
+        settings.CONTENT_CACHE_ENABLED = False
+
+
+async def run(args) -> dict:
+    configure(args)
+    latency = fakes.Latency.parse(args.latency)
+    fakes.install(latency)
+
+    from app.main import app
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = {
+        "config": {
+            "latency": {k: v for k, v in vars(latency).items() if k != "overrides"},
+            "concurrency": levels,
+            "requests_per_level": args.requests,
+            "vector_store": args.vector_store,
+            "with_caches": args.with_caches,
+        }
+    }
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            print("Benchmarking ingestion ...")
+            results["ingestion"], content_ids = await bench_ingestion(client, args.pdfs, args.pdf_pages, args.videos)
+            print("Benchmarking endpoints ...")
+            results.update(await bench_endpoints(app, client, content_ids, levels, args.requests))
+    return results
+
+
+def print_results(results: dict):
+    ingestion = results["ingestion"]
+    print(
+        f"\nIngestion: {ingestion['documents']} docs, {ingestion['chunks']} chunks in {ingestion['wall_s']}s "
+        f"-> {ingestion['chunks_per_sec']} chunks/sec ({ingestion['failed']} failed)"
+    )
+    print(f"\n{'endpoint':<18}{'conc':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>8}{'err':>5}")
+    for endpoint in ("chat", "chat_stream_ttft", "flashcards", "quiz"):
+        for level, stats in results[endpoint].items():
+            print(
+                f"{endpoint:<18}{level[1:]:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+                f"{stats['p99_ms']:>10}{stats['rps']:>8}{stats['errors']:>5}"
+            )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print metric deltas against a baseline; return the regressions."""
+    rows = [("ingestion.chunks_per_sec", baseline["ingestion"]["chunks_per_sec"], results["ingestion"]["chunks_per_sec"], True)]
+    for endpoint in ("chat", "chat_stream_ttft", "flashcards", "quiz"):
+        for level, stats in results[endpoint].items():
+            base = baseline.get(endpoint, {}).get(level)
+            if not base:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                rows.append((f"{endpoint}.{level}.{metric}", base[metric], stats[metric], False))
+            rows.append((f"{endpoint}.{level}.rps", base["rps"], stats["rps"], True))
+
+    regressions = []
+    print(f"\n{'metric':<34}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for name, before, after, higher_is_better in rows:
+        delta = (after - before) / before * 100 if before else 0.0
+        worse = -delta if higher_is_better else delta
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<34}{before:>12}{after:>12}{delta:>9.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per endpoint and level")
+    parser.add_argument("--latency", default="", help='Provider latency overrides in ms, e.g. "groq=1200,hf=80"')
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=30)
+    parser.add_argument("--videos", type=int, default=4)
+    parser.add_argument("--job-workers", type=int, default=2)
+    parser.add_argument("--vector-store", default="pinecone", choices=["pinecone", "local"])
+    parser.add_argument("--with-caches", action="store_true", help="Keep embedding / answer / generation / content caches on")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--save-baseline", help="Write results JSON as a baseline")
+    parser.add_argument("--baseline", help="Compare against a saved baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed regression in percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
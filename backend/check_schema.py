@@ -3,7 +3,7 @@ from app.services import supabase_service
 
 async def main():
     try:
-        r = supabase_service.supabase.table('contents').select('*').limit(1).execute()
+        r = await (await supabase_service.get_client()).table('contents').select('*').limit(1).execute()
         if r.data:
             print("COLUMNS:")
             for k in r.data[0].keys():
@@ -13,7 +13,7 @@ async def main():
     try:
         # Try dummy search first
         zero_vector = [0.0] * 768
-        results = pinecone_service.index.query(
+        results = await (await pinecone_service.get_index()).query(
             vector=zero_vector,
             top_k=5,
             include_metadata=True,
@@ -26,7 +26,7 @@ async def main():
         # Try direct fetch for ID _0
         first_id = f"{content_id}_0"
         print(f"Trying to fetch specific ID: {first_id}")
-        fetch_results = pinecone_service.index.fetch(ids=[first_id])
+        fetch_results = await (await pinecone_service.get_index()).fetch(ids=[first_id])
         print(f"Fetch results: {fetch_results}")
         
     except Exception as e:
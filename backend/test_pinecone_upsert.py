@@ -11,7 +11,7 @@ async def main():
         print("Wait for 2 seconds for consistency...")
         await asyncio.sleep(2)
         
-        fetch_results = pinecone_service.index.fetch(ids=[f"{content_id}_0"])
+        fetch_results = await (await pinecone_service.get_index()).fetch(ids=[f"{content_id}_0"])
         if f"{content_id}_0" in fetch_results.vectors:
             print("SUCCESS: Found the test vector!")
         else:
@@ -0,0 +1,17 @@
+from collections import OrderedDict
+
+import pytest
+
+from app.config import settings
+from app.services import document_store, lexical_index
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Every test gets its own DATA_DIR (queues, caches, stores)."""
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+    # In-memory copies of files under the previous DATA_DIR
+    monkeypatch.setattr(document_store, "_documents", OrderedDict())
+    monkeypatch.setattr(document_store, "_manifests", OrderedDict())
+    monkeypatch.setattr(lexical_index, "_indexes", OrderedDict())
+    return tmp_path
@@ -0,0 +1,50 @@
+from app.services.answer_cache import AnswerCache, CachedAnswer, content_version
+
+
+def _answer(reply: str) -> CachedAnswer:
+    return CachedAnswer(question="q", reply=reply, sources=["chunk_0"], latency_ms=100.0)
+
+
+def test_similar_question_gets_the_cached_answer():
+    cache = AnswerCache(threshold=0.95)
+    cache.store("c1", 1, [1.0, 0.0, 0.0], _answer("cached"))
+
+    assert cache.lookup("c1", 1, [0.99, 0.05, 0.0]).reply == "cached"
+    assert cache.lookup("c1", 1, [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("c2", 1, [1.0, 0.0, 0.0]) is None
+
+
+def test_new_content_version_drops_cached_answers():
+    cache = AnswerCache()
+    cache.store("c1", 1, [1.0, 0.0], _answer("old"))
+
+    assert cache.lookup("c1", 2, [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_drops_a_content():
+    cache = AnswerCache()
+    cache.store("c1", 1, [1.0, 0.0], _answer("a"))
+    cache.store("c2", 1, [1.0, 0.0], _answer("b"))
+    cache.invalidate("c1")
+
+    assert cache.lookup("c1", 1, [1.0, 0.0]) is None
+    assert cache.lookup("c2", 1, [1.0, 0.0]).reply == "b"
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_content_is_evicted_first():
+    cache = AnswerCache(max_entries=2)
+    cache.store("c1", 1, [1.0, 0.0], _answer("a"))
+    cache.store("c2", 1, [1.0, 0.0], _answer("b"))
+    cache.lookup("c1", 1, [1.0, 0.0])
+    cache.store("c3", 1, [1.0, 0.0], _answer("c"))
+
+    assert cache.lookup("c2", 1, [1.0, 0.0]) is None
+    assert cache.lookup("c1", 1, [1.0, 0.0]).reply == "a"
+    assert cache.stats()["entries"] == 2
+
+
+def test_content_version_changes_with_the_record():
+    record = {"status": "processed", "chunks_count": 4, "updated_at": "t1"}
+    assert content_version(record) != content_version({**record, "chunks_count": 5})
@@ -0,0 +1,53 @@
+import time
+
+from app.services.content_cache import ContentCache
+
+
+def _caches(data_dir):
+    """Two processes' caches sharing one version file."""
+    path = str(data_dir / "content_versions.sqlite3")
+    return ContentCache(path), ContentCache(path)
+
+
+def test_read_through_after_a_miss(data_dir):
+    cache, _ = _caches(data_dir)
+    record, version = cache.lookup("c1")
+    assert record is None and version == 0
+
+    cache.put("c1", {"id": "c1", "status": "processed"}, version)
+    assert cache.lookup("c1")[0] == {"id": "c1", "status": "processed"}
+    assert cache.stats()["hits"] == 1
+
+
+def test_write_in_another_process_invalidates_the_entry(data_dir):
+    cache, other = _caches(data_dir)
+    _, version = cache.lookup("c1")
+    cache.put("c1", {"id": "c1", "status": "processing"}, version)
+
+    other.write("c1", {"id": "c1", "status": "processed"})
+
+    record, version = cache.lookup("c1")
+    assert record is None
+    assert version == 1
+    assert cache.stats()["stale"] == 1
+    assert other.lookup("c1")[0]["status"] == "processed"
+
+
+def test_update_during_a_fetch_is_not_served(data_dir):
+    cache, other = _caches(data_dir)
+    _, version = cache.lookup("c1")
+    other.write("c1")  # the row changes while the old one is being fetched
+    cache.put("c1", {"id": "c1", "status": "processing"}, version)
+
+    assert cache.lookup("c1")[0] is None
+
+
+def test_unfinished_rows_expire_sooner(data_dir):
+    cache = ContentCache(str(data_dir / "versions.sqlite3"), processing_ttl=0.01, processed_ttl=60)
+    cache.put("a", {"id": "a", "status": "processing"}, 0)
+    cache.put("b", {"id": "b", "status": "processed"}, 0)
+    time.sleep(0.02)
+
+    records, versions = cache.lookup_many(["a", "b"])
+    assert list(records) == ["b"]
+    assert versions == {"a": 0, "b": 0}
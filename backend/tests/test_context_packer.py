@@ -0,0 +1,58 @@
+from app.config import settings
+from app.services import context_packer, document_store
+
+
+def _chunks(*texts):
+    return [{"chunk_index": i, "text": text} for i, text in enumerate(texts)]
+
+
+def test_near_duplicates_are_dropped():
+    chunks = _chunks("alpha beta gamma delta", "delta gamma beta alpha", "zeta theta iota kappa")
+    packed = context_packer.pack_ranked("c1", chunks, budget=1000)
+    assert packed.chunk_indices == [0, 2]
+
+
+def test_mmr_prefers_new_information_over_rank(monkeypatch):
+    chunks = _chunks("alpha beta gamma delta", "alpha beta gamma epsilon", "zeta theta iota kappa")
+
+    monkeypatch.setattr(settings, "CONTEXT_MMR_LAMBDA", 1.0)
+    assert context_packer.pack_ranked("c1", chunks, budget=1000).chunk_indices == [0, 1, 2]
+
+    monkeypatch.setattr(settings, "CONTEXT_MMR_LAMBDA", 0.5)
+    assert context_packer.pack_ranked("c1", chunks, budget=1000).chunk_indices == [0, 2, 1]
+
+
+def test_packing_respects_the_token_budget():
+    chunks = _chunks(*(f"topic{i} " * 50 for i in range(5)))  # ~100 tokens each
+    packed = context_packer.pack_ranked("c1", chunks, budget=250)
+
+    assert len(packed.chunks) == 2
+    assert packed.tokens <= 250
+    # The best chunk is always kept, even over budget
+    assert context_packer.pack_ranked("c1", chunks, budget=10).chunk_indices == [0]
+
+
+def test_overlapping_spans_are_sent_once():
+    text = "one two three four five six seven eight nine ten"
+    spans = [(0, 18, 1), (8, 28, 1), (40, 49, 2)]  # chunks 0 and 1 overlap on "three four"
+    document_store.save_content("c1", text, spans)
+    chunks = [{"chunk_index": i, "text": text[start:end]} for i, (start, end, _) in enumerate(spans)]
+
+    packed = context_packer.pack_sequential("c1", chunks, budget=1000)
+    assert packed.context == f"{text[0:28]}\n\n{text[40:49]}"
+
+
+def test_overlapping_texts_are_merged_without_a_document():
+    chunks = _chunks("the quick brown fox jumps", "fox jumps over the lazy dog")
+    packed = context_packer.pack_sequential("unstored", chunks, budget=1000)
+    assert packed.context == "the quick brown fox jumps over the lazy dog"
+
+
+def test_several_contents_are_grouped_under_their_labels():
+    chunks = [
+        {"content_id": "a", "chunk_index": 0, "text": "alpha beta"},
+        {"content_id": "b", "chunk_index": 0, "text": "gamma delta"},
+        {"content_id": "a", "chunk_index": 5, "text": "epsilon zeta"},
+    ]
+    packed = context_packer.pack_ranked(None, chunks, budget=1000, labels={"a": "Doc A", "b": "Doc B"})
+    assert packed.context == "[Doc A]\nalpha beta\n\nepsilon zeta\n\n[Doc B]\ngamma delta"
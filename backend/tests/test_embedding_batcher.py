@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from app.services import rate_limiter
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def _encoder(calls: list):
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    return encode
+
+
+def test_concurrent_requests_are_coalesced():
+    calls = []
+
+    async def run():
+        batcher = EmbeddingBatcher(_encoder(calls), max_batch_size=16, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.embed(["x" * i]) for i in range(1, 6)))
+
+    assert asyncio.run(run()) == [[[float(i)]] for i in range(1, 6)]
+    assert calls == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+
+
+def test_batches_never_exceed_the_maximum_size():
+    calls = []
+
+    async def run():
+        batcher = EmbeddingBatcher(_encoder(calls), max_batch_size=4, max_wait_ms=20)
+        return await asyncio.gather(batcher.embed(["a"] * 10), batcher.embed(["b"] * 3))
+
+    large, small = asyncio.run(run())
+    assert len(large) == 10 and len(small) == 3
+    assert all(len(batch) <= 4 for batch in calls)
+    assert sum(len(batch) for batch in calls) == 13
+
+
+def test_interactive_requests_go_before_ingestion():
+    calls = []
+    encode = _encoder(calls)
+
+    def slow_encode(texts):
+        time.sleep(0.05)
+        return encode(texts)
+
+    async def run():
+        batcher = EmbeddingBatcher(slow_encode, max_batch_size=4, max_wait_ms=1)
+
+        async def ingest():
+            with rate_limiter.priority(rate_limiter.BATCH):
+                return await batcher.embed(["doc"] * 4)
+
+        async def ask():
+            await asyncio.sleep(0.01)  # the first ingestion batch is running
+            return await batcher.embed(["question"])
+
+        await asyncio.gather(ingest(), ingest(), ingest(), ask())
+
+    asyncio.run(run())
+    assert calls == [["doc"] * 4, ["question"], ["doc"] * 4, ["doc"] * 4]
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.config import settings
+from app.services import embedding_cache, embedding_service
+from app.services.embedding_cache import EmbeddingCache
+
+
+def _cache(data_dir, **kwargs) -> EmbeddingCache:
+    return EmbeddingCache(str(data_dir / "embedding_cache.sqlite3"), **kwargs)
+
+
+def test_vectors_survive_a_restart(data_dir):
+    _cache(data_dir).put_many("m@torch", ["hello  world"], [[0.5, 0.25]])
+
+    cache = _cache(data_dir)
+    assert cache.get_many("m@torch", ["hello world", "other"]) == [[0.5, 0.25], None]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_backends_do_not_share_vectors(data_dir, monkeypatch):
+    cache = _cache(data_dir)
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "torch")
+    torch_namespace = embedding_service.cache_namespace()
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx_int8")
+    int8_namespace = embedding_service.cache_namespace()
+
+    cache.put_many(torch_namespace, ["text"], [[1.0, 0.0]])
+    assert torch_namespace != int8_namespace
+    assert cache.get_many(int8_namespace, ["text"]) == [None]
+
+
+def test_disk_tier_evicts_least_recently_used(data_dir):
+    cache = _cache(data_dir, memory_items=1, disk_items=10)
+    cache.put_many("m", [f"old {i}" for i in range(5)], [[float(i)] for i in range(5)])
+    cache.put_many("m", [f"new {i}" for i in range(6)], [[float(i)] for i in range(6)])
+
+    (count,) = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert count == cache._disk_count == 9
+    assert cache.evictions == 2
+    assert cache.get_many("m", ["old 0", "old 1", "old 2", "new 5"]) == [None, None, [2.0], [5.0]]
+
+
+def test_only_misses_are_computed(data_dir, monkeypatch):
+    computed = []
+
+    async def compute_embeddings(texts):
+        computed.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(embedding_cache, "_cache", None)
+    monkeypatch.setattr(embedding_service, "compute_embeddings", compute_embeddings)
+
+    async def run():
+        first = await embedding_service.get_embeddings(["a", "bb", "a "])
+        second = await embedding_service.get_embeddings(["bb", "ccc"])
+        return first, second
+
+    first, second = asyncio.run(run())
+    embedding_cache._cache._db.close()
+    assert first == [[1.0], [2.0], [1.0]]
+    assert second == [[2.0], [3.0]]
+    assert computed == [["a", "bb"], ["ccc"]]
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.services.generation_cache import GenerationCache
+
+
+def test_concurrent_requests_share_one_generation():
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "cards"
+
+    async def run():
+        cache = GenerationCache()
+        results = await asyncio.gather(*(cache.get_or_create(("c1", "flashcards"), factory) for _ in range(5)))
+        results.append(await cache.get_or_create(("c1", "flashcards"), factory))
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert results == ["cards"] * 6
+    assert len(calls) == 1
+    assert cache.stats() == {"entries": 1, "inflight": 0, "hits": 1, "misses": 1, "shared": 4}
+
+
+def test_invalidate_drops_every_result_of_a_content():
+    async def run():
+        cache = GenerationCache()
+        for key in [("c1", "flashcards", 10), ("c1", "quiz", 5), ("c2", "quiz", 5)]:
+            await cache.get_or_create(key, lambda: asyncio.sleep(0, result="generated"))
+        cache.invalidate("c1")
+        return cache
+
+    cache = asyncio.run(run())
+    assert list(cache._entries) == [("c2", "quiz", 5)]
+
+
+def test_failures_are_not_cached():
+    attempts = []
+
+    async def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("LLM unavailable")
+        return "quiz"
+
+    async def run():
+        cache = GenerationCache()
+        with pytest.raises(RuntimeError):
+            await cache.get_or_create(("c1", "quiz"), factory)
+        return await cache.get_or_create(("c1", "quiz"), factory)
+
+    assert asyncio.run(run()) == "quiz"
+    assert len(attempts) == 2
+
+
+def test_expired_results_are_regenerated():
+    values = iter(["first", "second"])
+
+    async def run():
+        cache = GenerationCache(ttl=0)
+        first = await cache.get_or_create(("c1",), lambda: asyncio.sleep(0, result=next(values)))
+        second = await cache.get_or_create(("c1",), lambda: asyncio.sleep(0, result=next(values)))
+        return first, second
+
+    assert asyncio.run(run()) == ("first", "second")
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.routers import flashcards
+from app.schemas import Flashcard, GenerateFlashcardsRequest, GenerateFlashcardsResponse
+from app.services import generation_cache, supabase_service
+
+CONTENTS = {
+    "original": {"id": "original", "status": "processed", "chunks_count": 3, "metadata": {}},
+    "duplicate": {
+        "id": "duplicate",
+        "status": "processed",
+        "chunks_count": 3,
+        "metadata": {"vector_content_id": "original"},
+    },
+}
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    async def get_content(content_id):
+        return CONTENTS.get(content_id)
+
+    async def build_flashcards(content, num_cards, mode):
+        calls.append(content["id"])
+        card = Flashcard(id=1, question="What is a cell?", answer="The unit of life.")
+        return GenerateFlashcardsResponse(content_id=content["id"], flashcards=[card], total=1)
+
+    monkeypatch.setattr(generation_cache, "_cache", None)
+    monkeypatch.setattr(supabase_service, "get_content", get_content)
+    monkeypatch.setattr(flashcards, "build_flashcards", build_flashcards)
+    return calls
+
+
+def _generate(content_id: str) -> GenerateFlashcardsResponse:
+    return asyncio.run(flashcards.generate_flashcards(GenerateFlashcardsRequest(content_id=content_id)))
+
+
+def test_linked_duplicate_shares_the_cached_generation(builds):
+    original = _generate("original")
+    duplicate = _generate("duplicate")
+
+    assert builds == ["original"]
+    assert original.content_id == "original"
+    assert duplicate.content_id == "duplicate"
+    assert duplicate.flashcards == original.flashcards
+
+
+def test_reingesting_the_source_invalidates_its_duplicates(builds):
+    _generate("duplicate")
+    generation_cache.invalidate("original")
+    _generate("duplicate")
+
+    assert builds == ["duplicate", "duplicate"]
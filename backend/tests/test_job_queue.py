@@ -0,0 +1,191 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import job_queue
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch):
+    monkeypatch.setattr(job_queue, "_db", None)
+    monkeypatch.setattr(job_queue, "_wakeup", None)
+    monkeypatch.setattr(job_queue, "_handlers", {})
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_DELAY", 10.0)
+    yield
+    if job_queue._db is not None:
+        job_queue._db.close()
+
+
+def _expire(job_id: str):
+    job_queue._execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_success_stores_progress_and_removes_blob():
+    received = []
+
+    async def handler(payload, blob):
+        received.append((payload, blob))
+        await job_queue.report_progress("working", 0.5)
+
+    async def run():
+        job_queue.register_handler("kind", handler)
+        job_id = await job_queue.enqueue("kind", {"a": 1}, blob=b"data", content_id="c1")
+        assert os.path.exists(job_queue._blob_path(job_id))
+        await job_queue._run_job(*job_queue._claim_next())
+        return job_id
+
+    job_id = asyncio.run(run())
+    job = asyncio.run(job_queue.get_job(job_id, include_payload=True))
+    assert received == [({"a": 1}, b"data")]
+    assert job["status"] == job_queue.SUCCEEDED
+    assert job["progress"] == 1
+    assert job["payload"] == {"a": 1}
+    assert not os.path.exists(job_queue._blob_path(job_id))
+
+
+def test_failed_job_is_retried_with_backoff_then_failed():
+    failures = []
+
+    async def handler(payload, blob):
+        raise RuntimeError("boom")
+
+    async def on_failure(payload, error):
+        failures.append((payload, str(error)))
+
+    async def run():
+        job_queue.register_handler("kind", handler, on_failure=on_failure)
+        job_id = await job_queue.enqueue("kind", {"n": 1}, max_attempts=2)
+
+        await job_queue._run_job(*job_queue._claim_next())
+        job = await job_queue.get_job(job_id)
+        assert job["status"] == job_queue.QUEUED
+        assert job["stage"] == "retrying"
+        assert job["error"] == "boom"
+        assert job["run_after"] >= time.time() + 9
+        assert job_queue._claim_next() is None  # backing off
+
+        job_queue._execute("UPDATE jobs SET run_after = 0 WHERE id = ?", (job_id,))
+        await job_queue._run_job(*job_queue._claim_next())
+        return await job_queue.get_job(job_id)
+
+    job = asyncio.run(run())
+    assert job["status"] == job_queue.FAILED
+    assert job["attempts"] == 2
+    assert failures == [({"n": 1}, "boom")]
+
+
+def test_expired_lease_is_reclaimed_and_stale_owner_is_ignored():
+    async def handler(payload, blob):
+        pass
+
+    async def run():
+        job_queue.register_handler("kind", handler)
+        job_id = await job_queue.enqueue("kind", {})
+        row, stale_lease = job_queue._claim_next()
+        _expire(job_id)
+
+        reclaimed, lease = job_queue._claim_next()
+        assert reclaimed["id"] == job_id
+        assert lease != stale_lease
+
+        # The worker that lost the lease can't complete the job
+        await job_queue._run_job(row, stale_lease)
+        job = await job_queue.get_job(job_id)
+        assert job["status"] == job_queue.RUNNING
+        assert job["attempts"] == 2
+
+        await job_queue._run_job(reclaimed, lease)
+        return await job_queue.get_job(job_id)
+
+    assert asyncio.run(run())["status"] == job_queue.SUCCEEDED
+
+
+def test_abandoned_job_without_attempts_left_is_not_reclaimed():
+    async def run():
+        job_id = await job_queue.enqueue("kind", {}, max_attempts=1)
+        job_queue._claim_next()
+        _expire(job_id)
+
+        assert job_queue._claim_next() is None
+        abandoned = job_queue._claim_abandoned()
+        assert [row["id"] for row, _ in abandoned] == [job_id]
+        row, lease = abandoned[0]
+        await job_queue._fail(row, lease, {}, RuntimeError("worker died"))
+        return await job_queue.get_job(job_id)
+
+    job = asyncio.run(run())
+    assert job["status"] == job_queue.FAILED
+    assert job["error"] == "worker died"
+
+
+def test_heartbeat_stops_job_whose_lease_was_taken(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.3)
+    cancelled = []
+
+    async def handler(payload, blob):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        job_queue.register_handler("kind", handler)
+        job_id = await job_queue.enqueue("kind", {})
+        running = asyncio.create_task(job_queue._run_job(*job_queue._claim_next()))
+        await asyncio.sleep(0.05)
+        job_queue._execute("UPDATE jobs SET lease_owner = 'other' WHERE id = ?", (job_id,))
+        await asyncio.wait_for(running, 2)
+        return await job_queue.get_job(job_id)
+
+    job = asyncio.run(run())
+    assert cancelled == [True]
+    assert job["status"] == job_queue.RUNNING  # left to its new owner
+
+
+def test_heartbeat_survives_transient_errors(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.3)
+    execute = job_queue._execute
+    errors = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_execute(sql, params=()):
+        if sql.startswith("UPDATE jobs SET lease_until") and errors:
+            raise errors.pop()
+        return execute(sql, params)
+
+    monkeypatch.setattr(job_queue, "_execute", flaky_execute)
+
+    async def handler(payload, blob):
+        await asyncio.sleep(0.5)
+
+    async def run():
+        job_queue.register_handler("kind", handler)
+        job_id = await job_queue.enqueue("kind", {})
+        await job_queue._run_job(*job_queue._claim_next())
+        return await job_queue.get_job(job_id)
+
+    assert asyncio.run(run())["status"] == job_queue.SUCCEEDED
+    assert not errors
+
+
+def test_shutdown_requeues_without_spending_an_attempt():
+    async def handler(payload, blob):
+        await asyncio.sleep(5)
+
+    async def run():
+        job_queue.register_handler("kind", handler)
+        job_id = await job_queue.enqueue("kind", {})
+        running = asyncio.create_task(job_queue._run_job(*job_queue._claim_next()))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        return await job_queue.get_job(job_id)
+
+    job = asyncio.run(run())
+    assert job["status"] == job_queue.QUEUED
+    assert job["attempts"] == 0
@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import local_vector_store
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    monkeypatch.setattr(local_vector_store, "_partitions", {})
+    monkeypatch.setattr(local_vector_store, "_peak_query_bytes", 0)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(300, 64)).astype(np.float32)
+
+
+def _store(vectors: np.ndarray, content_id: str = "c1"):
+    chunks = [f"chunk {i}" for i in range(len(vectors))]
+    asyncio.run(local_vector_store.upsert_chunks(content_id, chunks, vectors.tolist()))
+
+
+def _search(query: np.ndarray, top_k: int = 5) -> list[dict]:
+    return asyncio.run(local_vector_store.query_similar(query.tolist(), "c1", top_k))
+
+
+def _exact_top(vectors: np.ndarray, query: np.ndarray, top_k: int) -> tuple[list[int], np.ndarray]:
+    scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    top = np.argsort(-scores)[:top_k]
+    return top.tolist(), scores[top]
+
+
+def test_int8_search_rescores_the_shortlist_exactly(monkeypatch, vectors):
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_PRECISION", "int8")
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_RESCORE_FACTOR", 4)
+    _store(vectors)
+    query = vectors[7] + 0.1
+
+    hits = _search(query)
+    expected_rows, expected_scores = _exact_top(vectors, query, 5)
+    assert [hit["chunk_index"] for hit in hits] == expected_rows
+    assert [hit["score"] for hit in hits] == pytest.approx(expected_scores.tolist(), abs=1e-5)
+    assert hits[0]["text"] == "chunk 7"
+
+
+def test_int8_scores_without_rescoring_are_close(monkeypatch, vectors):
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_PRECISION", "int8")
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_RESCORE_FACTOR", 0)
+    _store(vectors)
+    query = vectors[42]
+
+    hits = _search(query)
+    assert hits[0]["chunk_index"] == 42
+    assert hits[0]["score"] == pytest.approx(1.0, abs=0.02)
+    exact = dict(zip(*_exact_top(vectors, query, len(vectors))))
+    for hit in hits:
+        assert hit["score"] == pytest.approx(exact[hit["chunk_index"]], abs=0.02)
+
+
+def test_truncated_search_dim_still_returns_exact_scores(monkeypatch, vectors):
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_PRECISION", "float32")
+    monkeypatch.setattr(settings, "LOCAL_VECTOR_SEARCH_DIM", 32)
+    _store(vectors)
+
+    hits = _search(vectors[3])
+    assert hits[0]["chunk_index"] == 3
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_compact_rows_are_scored_in_blocks(monkeypatch, vectors):
+    index = local_vector_store._SearchIndex(vectors, "int8", 0)
+    query = vectors[0]
+    whole = index.scores(query)
+
+    # 16 rows per block
+    monkeypatch.setattr(local_vector_store, "_SCORE_BLOCK_BYTES", 16 * 64 * 4)
+    assert index.block_rows == 16
+    np.testing.assert_allclose(index.scores(query), whole, rtol=1e-6)
+    assert index.query_bytes == len(vectors) * 4 + 16 * 64 * 4
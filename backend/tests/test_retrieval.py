@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.services import document_store, lexical_index, retrieval, vector_store
+
+CHUNKS = [
+    "Photosynthesis turns light into chemical energy.",
+    "The mitochondria produce ATP through respiration.",
+    "Osmosis moves water across a membrane.",
+    "Enzymes lower the activation energy of a reaction.",
+]
+
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = dict(retrieval.reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60))
+
+    assert fused["a"] == pytest.approx(1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused["c"] == pytest.approx(1 / 63)
+    assert fused["d"] == pytest.approx(1 / 62)
+
+
+def test_rrf_ranks_items_found_by_both_rankings_first():
+    fused = retrieval.reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "c"]], k=60)
+    assert [key for key, _ in fused][:2] == ["b", "c"]
+    assert [score for _, score in fused] == sorted((score for _, score in fused), reverse=True)
+
+
+@pytest.fixture
+def indexed_content():
+    index = lexical_index.LexicalIndex()
+    for i, text in enumerate(CHUNKS):
+        index.add(i, text)
+    lexical_index.save("c1", index)
+    text = "\n".join(CHUNKS)
+    starts = [text.index(chunk) for chunk in CHUNKS]
+    document_store.save_content("c1", text, [(start, start + len(chunk), 1) for start, chunk in zip(starts, CHUNKS)])
+    return "c1"
+
+
+def _vector_hits(*chunk_indices):
+    async def query_similar(query_embedding, content_ids, top_k):
+        return [
+            {"text": CHUNKS[i], "chunk_index": i, "content_id": "c1", "score": 1.0 - rank / 10}
+            for rank, i in enumerate(chunk_indices[:top_k])
+        ]
+
+    return query_similar
+
+
+def test_search_fuses_vector_and_lexical_rankings(monkeypatch, indexed_content):
+    # Vector search misses the exact-term chunk; BM25 finds it
+    monkeypatch.setattr(vector_store, "query_similar", _vector_hits(0, 3, 2))
+    hits = asyncio.run(retrieval.search(indexed_content, "mitochondria ATP", [0.0], top_k=3))
+
+    assert [hit["chunk_index"] for hit in hits] == [0, 1, 3]
+    assert hits[1]["text"] == CHUNKS[1]
+    assert all(hit["content_id"] == "c1" for hit in hits)
+
+
+def test_search_without_lexical_index_is_vector_search(monkeypatch):
+    monkeypatch.setattr(vector_store, "query_similar", _vector_hits(2, 0))
+    hits = asyncio.run(retrieval.search("unindexed", "osmosis", [0.0], top_k=2))
+    assert [hit["chunk_index"] for hit in hits] == [2, 0]
@@ -0,0 +1,62 @@
+import random
+
+from app.services.processor import SpanChunker
+
+
+def _pages(count: int, seed: int = 0) -> list[tuple[int, str]]:
+    rng = random.Random(seed)
+    words = "cell membrane protein enzyme gradient molecule transport theory".split()
+    pages = []
+    for page in range(1, count + 1):
+        sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(5, 15))) + "." for _ in range(40)]
+        pages.append((page, " ".join(sentences)))
+    return pages
+
+
+def test_spans_point_into_the_document_text():
+    pages = _pages(12)
+    chunker = SpanChunker(chunk_size=500, chunk_overlap=100, window_chunks=3)
+    spans = list(chunker.iter_spans(pages))
+
+    text = chunker.text()
+    assert text == "\n".join(page_text for _, page_text in pages)
+    assert spans
+    for span in spans:
+        assert text[span.start : span.end] == span.text
+        assert len(span.text) <= 500
+
+
+def test_spans_cover_the_document_in_order_with_overlap():
+    chunker = SpanChunker(chunk_size=500, chunk_overlap=100, window_chunks=3)
+    spans = list(chunker.iter_spans(_pages(12)))
+    text = chunker.text()
+
+    assert spans[0].start == 0
+    assert spans[-1].end == len(text.rstrip())
+    for previous, span in zip(spans, spans[1:]):
+        assert previous.start < span.start
+        # Consecutive chunks overlap or touch: nothing is skipped
+        assert not text[previous.end : span.start].strip()
+
+
+def test_spans_know_their_page():
+    pages = _pages(5)
+    chunker = SpanChunker(chunk_size=300, chunk_overlap=50, window_chunks=2)
+    spans = list(chunker.iter_spans(pages))
+
+    page_starts = []
+    offset = 0
+    for page, page_text in pages:
+        page_starts.append((offset, page))
+        offset += len(page_text) + 1
+    for span in spans:
+        expected = [page for start, page in page_starts if start <= span.start][-1]
+        assert span.page == expected
+    assert {span.page for span in spans} == {page for page, _ in pages}
+
+
+def test_window_size_does_not_change_the_chunks():
+    pages = _pages(8, seed=1)
+    small = [(s.start, s.end) for s in SpanChunker(500, 100, window_chunks=2).iter_spans(pages)]
+    large = [(s.start, s.end) for s in SpanChunker(500, 100, window_chunks=1000).iter_spans(pages)]
+    assert small == large
@@ -5,7 +5,7 @@ import { useParams, useRouter } from "next/navigation";
 import {
   generateFlashcards,
   generateQuiz,
-  chat,
+  chatStream,
   Flashcard,
   QuizQuestion,
 } from "@/lib/api";
@@ -121,8 +121,21 @@ export default function LearnPage() {
     setChatLoading(true);
 
     try {
-      const res = await chat(contentId, userMsg);
-      setMessages((prev) => [...prev, { role: "assistant", text: res.reply }]);
+      let started = false;
+      await chatStream(contentId, userMsg, {
+        onDelta: (delta) => {
+          if (!started) {
+            // First token: the reply bubble replaces the "Thinking..." indicator
+            started = true;
+            setMessages((prev) => [...prev, { role: "assistant", text: delta }]);
+            return;
+          }
+          setMessages((prev) => {
+            const last = prev[prev.length - 1];
+            return [...prev.slice(0, -1), { ...last, text: last.text + delta }];
+          });
+        },
+      });
     } catch (err) {
       setMessages((prev) => [
         ...prev,
@@ -240,7 +253,7 @@ export default function LearnPage() {
                       </div>
                     </div>
                   ))}
-                  {chatLoading && (
+                  {chatLoading && messages[messages.length - 1]?.role === "user" && (
                     <div className="flex justify-start">
                       <div className="px-3.5 py-2.5 rounded-2xl bg-white/5 border border-white/10 text-gray-400 text-sm rounded-bl-md">
                         <span className="animate-pulse">Thinking...</span>
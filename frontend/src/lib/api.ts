@@ -2,6 +2,7 @@ const API_BASE = "http://localhost:8000/api";
 
 export interface ProcessVideoResponse {
   content_id: string;
+  job_id?: string | null;
   title: string;
   duration: string | null;
   chunks_count: number;
@@ -11,6 +12,7 @@ export interface ProcessVideoResponse {
 
 export interface ProcessPdfResponse {
   content_id: string;
+  job_id?: string | null;
   filename: string;
   pages_count: number;
   chunks_count: number;
@@ -128,3 +130,56 @@ export async function chat(
   }
   return res.json();
 }
+
+export interface ChatStreamHandlers {
+  onSources?: (sources: string[]) => void;
+  onDelta: (text: string) => void;
+}
+
+export async function chatStream(
+  contentId: string,
+  message: string,
+  handlers: ChatStreamHandlers
+): Promise<ChatResponse> {
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ content_id: contentId, message }),
+  });
+  if (!res.ok || !res.body) {
+    const err = await res.json().catch(() => ({ detail: "Unknown error" }));
+    throw new Error(err.detail || `Error ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE frames are separated by a blank line
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === "sources") handlers.onSources?.(payload.sources);
+      else if (event === "delta") handlers.onDelta(payload.text);
+      else if (event === "error") throw new Error(payload.detail || "Chat failed");
+      else if (event === "done") return payload as ChatResponse;
+    }
+  }
+  throw new Error("Chat stream ended unexpectedly");
+}